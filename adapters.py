@@ -0,0 +1,115 @@
+from lazy_imports import LazyModule
+
+'''
+Provider adapters for the conversation of a ReasoningLLM session.
+
+ReasoningLLM.messages is one canonical log of plain {"role": "system" | "user" | "assistant", "content": str}
+dicts, the same shape as ReasoningLLM.history. The adapter of the session's model family turns it into the
+provider's wire messages just before a request is built:
+
+* gpt, qwen, deepseek, claude: the canonical dicts are sent as they are; gpt receives the system prompt as a
+  "developer" message
+* gemini: types.Content with role "user" / "model"
+* llama (OpenRouter): content as a list of {"text": ...} parts
+
+Only the families that send the system prompt as a message (system_in_log) have a system entry in the log;
+claude and gemini pass it as a request parameter, deepseek-r1 does not take one.
+
+The log only ever grows at the end or is cut back (filtered format mistakes, finished puzzle questions, the per
+sample reset of games), and entries are never changed in place, so the adapter keeps the wire messages of the
+longest prefix it has already converted and only converts what was appended since. Sessions no longer deep-copy
+their messages: a game sample resets to a shallow copy of the opening, whose conversions are reused.
+'''
+
+types = LazyModule('google.genai.types')
+
+ACKNOWLEDGEMENT = 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'
+
+
+def user_message(text):
+    return {"role": "user", "content": text}
+
+
+def assistant_message(text):
+    return {"role": "assistant", "content": text}
+
+
+class ProviderAdapter:
+    '''canonical log -> wire messages of an openai-style chat API, converted once per message'''
+    system_role = 'system'
+
+    def __init__(self, model_family, model_name):
+        self.model_family = model_family
+        self.model_name = model_name
+        self._source = []   # canonical messages the cached wire messages were converted from
+        self._wire = []
+
+    @property
+    def system_in_log(self):
+        return True
+
+    def opening(self, system_prompt, task_intro):
+        '''the canonical log a session starts with'''
+        messages = [{"role": "system", "content": system_prompt}] if self.system_in_log else []
+        return messages + [user_message(task_intro), assistant_message(ACKNOWLEDGEMENT)]
+
+    def convert(self, message):
+        if message['role'] == 'system' and self.system_role != 'system':
+            return {"role": self.system_role, "content": message['content']}
+        return message
+
+    def wire(self, messages):
+        '''wire messages for the canonical `messages`, reusing the conversion of the prefix they share with the last call'''
+        shared = 0
+        limit = min(len(messages), len(self._source))
+        while shared < limit and self._source[shared] is messages[shared]:
+            shared += 1
+        del self._source[shared:], self._wire[shared:]
+        for message in messages[shared:]:
+            self._source.append(message)
+            self._wire.append(self.convert(message))
+        return list(self._wire)
+
+
+class GPTAdapter(ProviderAdapter):
+    system_role = 'developer'
+
+
+class SystemParameterAdapter(ProviderAdapter):
+    '''claude (system= parameter) and deepseek-r1 (no system prompt): the log holds the conversation only'''
+    @property
+    def system_in_log(self):
+        return False
+
+
+class DeepSeekAdapter(ProviderAdapter):
+    @property
+    def system_in_log(self):
+        return self.model_name != 'deepseek-r1'
+
+
+class GeminiAdapter(SystemParameterAdapter):
+    def convert(self, message):
+        role = 'model' if message['role'] == 'assistant' else message['role']
+        return types.Content(role=role, parts=[types.Part.from_text(text=message['content'])])
+
+
+class LlamaAdapter(ProviderAdapter):
+    def convert(self, message):
+        return {"role": message['role'], "content": [{"text": str(message['content'])}]}
+
+
+ADAPTERS = {
+    'gpt': GPTAdapter,
+    'claude': SystemParameterAdapter,
+    'gemini': GeminiAdapter,
+    'qwen': ProviderAdapter,
+    'deepseek': DeepSeekAdapter,
+    'llama': LlamaAdapter,
+}
+
+
+def get_adapter(model_family, model_name):
+    if model_family not in ADAPTERS:
+        raise ValueError(f"Unknown model family {model_family}, expected one of {list(ADAPTERS)}")
+    return ADAPTERS[model_family](model_family, model_name)
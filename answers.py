@@ -0,0 +1,144 @@
+import os
+import ast
+import json
+import hashlib
+import logging
+import argparse
+from paths import PathManager
+from sandbox import plain
+
+'''
+Precomputed ground truth of the test samples.
+
+evaluate used to compute every expected answer during the live session: blackbox(plaintext) for encryption,
+blackbox(t) for physics (scipy solve_ivp for the simulated systems), blackbox(input) for circuit and the checkpoint
+runs of code. Test files and `_final.py` platforms rarely change, so `python answers.py` (or main.py
+--build_answers) computes them once into answers/<task>/<difficulty>/<task_id>.json:
+
+    {"version": 2, "platform_hash": <sha1>, "test_hash": <sha1>, "answers": [<answer of sample 0>, ...]}
+
+where the answer of a code sample is the list of the values asked for at its checkpoints, stored as python literals
+(repr) so that tuples, nested lists and strings come back with their exact type. A session in evaluate mode reads the file of its black-box
+and only uses it when both hashes match the files it runs with; a missing or stale store is logged and the answers
+are computed inline as before. Puzzle and game are not stored: their feedback depends on the model's moves.
+'''
+
+ANSWERS_VERSION = 2
+STORED_TASKS = ['code', 'encryption', 'physics', 'circuit']
+
+
+def file_hash(file):
+    with open(file, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _literal(value):
+    '''repr of a checkpoint value that ast.literal_eval turns back into the same value'''
+    text = repr(value)
+    if ast.literal_eval(text) != value:
+        raise ValueError(f"{text} does not round-trip as a python literal")
+    return text
+
+
+def compute_answers(task, blackbox, samples):
+    '''the expected answer of every test sample, computed the way evaluate does'''
+    if task == 'code':
+        from ckpt import checkpoint_answers
+        return [[_literal(value) for value in checkpoint_answers(blackbox, dict(zip(sample['var_names'], sample['var_values'])), sample['checkpoints'])]
+                for sample in samples]
+    if task == 'encryption':
+        return [blackbox(sample['plaintext']) for sample in samples]
+    if task == 'physics':
+        return [plain(blackbox(sample['time'])) for sample in samples]
+    if task == 'circuit':
+        return [plain(blackbox(sample['input'])) for sample in samples]
+    raise ValueError(f"No stored answers for task {task}, expected one of {STORED_TASKS}")
+
+
+class AnswerStore:
+    def __init__(self, task, answers):
+        if task == 'code':
+            answers = [[ast.literal_eval(value) for value in sample] for sample in answers]
+        self.answers = answers
+
+    def get(self, sample):
+        '''stored answer of a sample, None if there is none'''
+        return self.answers[sample] if sample < len(self.answers) else None
+
+
+def answer_file(task, difficulty, task_id, paths=None):
+    paths = paths or PathManager()
+    return paths.answer_path / task / difficulty / f'{task_id}.json'
+
+
+def _read(file):
+    try:
+        with open(file, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        return stored if stored.get('version') == ANSWERS_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+def load_answers(task, difficulty, task_id, platform_file, test_file, paths=None):
+    '''the stored answers of a black-box, None when there are none or they were computed from other files'''
+    if task not in STORED_TASKS:
+        return None
+    stored = _read(answer_file(task, difficulty, task_id, paths))
+    if stored is None:
+        logging.info(f"No stored answers for {task}/{difficulty}/{task_id}, computing them during the session")
+        return None
+    if stored['platform_hash'] != file_hash(platform_file) or stored['test_hash'] != file_hash(test_file):
+        logging.warning(f"Stored answers of {task}/{difficulty}/{task_id} are stale, computing them during the session (rebuild with python answers.py)")
+        return None
+    return AnswerStore(task, stored['answers'])
+
+
+def build_answers(entries, paths=None, refresh=False):
+    '''compute the answers of the manifest entries whose store is missing or stale; returns how many were (re)built'''
+    from worker_pool import load_platform
+    paths = paths or PathManager()
+    built = 0
+    for entry in entries:
+        if entry['task'] not in STORED_TASKS or set(entry['missing']) & {'test', 'platform'}:
+            continue
+        file = answer_file(entry['task'], entry['difficulty'], entry['task_id'], paths)
+        platform_hash, test_hash = file_hash(entry['platform_file']), file_hash(entry['test_file'])
+        stored = None if refresh else _read(file)
+        if stored is not None and stored['platform_hash'] == platform_hash and stored['test_hash'] == test_hash:
+            continue
+        try:
+            with open(entry['test_file'], 'r', encoding='utf-8') as f:
+                samples = json.load(f)
+            module = load_platform(entry['platform_file'])
+            answers = compute_answers(entry['task'], module.blackbox, samples)
+            text = json.dumps({'version': ANSWERS_VERSION, 'platform_hash': platform_hash, 'test_hash': test_hash, 'answers': answers}, ensure_ascii=False)
+        except Exception as e:
+            logging.warning(f"Could not compute the answers of {entry['task']}/{entry['difficulty']}/{entry['task_id']}: {e!r}")
+            continue
+        os.makedirs(file.parent, exist_ok=True)
+        temp_file = f"{file}.{os.getpid()}.tmp"     # several launchers may build at once
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_file, file)
+        built += 1
+    logging.info(f"Answers: {built} black-boxes (re)built")
+    return built
+
+
+def main():
+    from manifest import load_manifest
+    parser = argparse.ArgumentParser(description='Precompute the expected answers of the test samples')
+    parser.add_argument('--task', type=str, default=None, choices=STORED_TASKS, help='Only this task (default: all stored tasks).')
+    parser.add_argument('--difficulty', type=str, default=None)
+    parser.add_argument('--task_id', type=str, default=None)
+    parser.add_argument('--refresh', action='store_true', help='Recompute answers that are up to date as well.')
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    build_answers(manifest.select(args.task, args.difficulty, args.task_id), refresh=args.refresh)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from fork_reset import reset_after_fork
+
+'''
+Asyncio execution mode: one process drives hundreds of black-box sessions at once.
+
+The platform scripts are synchronous (`player.normal_output(...)` inside plain for-loops), so every
+session runs its platform loop in a worker thread. Whenever the session talks to the model,
+ReasoningLLM.normal_output hands the request to the engine, which awaits it on a single event loop
+with the async provider clients. Threads only block on a future, the network I/O itself is async and
+bounded by per-provider semaphores.
+'''
+
+_current_engine = contextvars.ContextVar('oracle_async_engine', default=None)
+
+# black-boxes of these tasks keep process-global state (ckpt counters, sys.stdout capture), so their sessions run one at a time
+SERIAL_TASKS = ['code']
+
+DEFAULT_PROVIDER_CONCURRENCY = 32
+
+# Sessions run on a pool of their own (max_sessions threads, each possibly blocked waiting for the loop), so blocking
+# calls made from coroutines on the loop must never queue behind them. They go to the offload pools instead: 'io' for
+# short calls (sqlite response cache, gemini cached content), 'rate_limit' for scheduler waits, which last until the
+# provider has quota again and would otherwise hold up the short ones.
+OFFLOAD_WORKERS = {'io': 32, 'rate_limit': 256}
+_offload_pools = {}
+_offload_lock = threading.Lock()
+
+
+def current_engine():
+    '''the engine driving the current session, None outside async mode'''
+    return _current_engine.get()
+
+
+async def offload(func, *args, pool='io'):
+    '''await func(*args) on a thread of an offload pool, never on a session thread'''
+    with _offload_lock:
+        if pool not in _offload_pools:
+            _offload_pools[pool] = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS[pool], thread_name_prefix=f'oracle-{pool}')
+        executor = _offload_pools[pool]
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args))
+
+
+@reset_after_fork
+def _reset_after_fork():
+    global _offload_lock
+    _offload_pools.clear()
+    _offload_lock = threading.Lock()
+
+
+def parse_provider_concurrency(spec):
+    '''"gpt=64,claude=16,default=32" -> {'gpt': 64, 'claude': 16, 'default': 32}'''
+    limits = {}
+    if not spec:
+        return limits
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        family, limit = item.split('=')
+        limits[family.strip()] = int(limit)
+    return limits
+
+
+class AsyncEngine:
+    def __init__(self, max_sessions=256, provider_concurrency=None):
+        self.max_sessions = max_sessions
+        self.provider_concurrency = dict(provider_concurrency or {})
+        self.default_concurrency = self.provider_concurrency.pop('default', DEFAULT_PROVIDER_CONCURRENCY)
+        self.loop = None
+        self._provider_semaphores = {}
+
+    def _semaphore(self, model_family):
+        if model_family not in self._provider_semaphores:
+            limit = self.provider_concurrency.get(model_family, self.default_concurrency)
+            self._provider_semaphores[model_family] = asyncio.Semaphore(limit)
+        return self._provider_semaphores[model_family]
+
+    async def _provider_call(self, player):
+        async with self._semaphore(player.model_family):
+            return await player._acall_model()
+
+    def call(self, player):
+        '''called from a session thread by ReasoningLLM.normal_output, blocks the thread (not the loop) until the response arrives'''
+        future = asyncio.run_coroutine_threadsafe(self._provider_call(player), self.loop)
+        return future.result()
+
+    def _in_session_thread(self, func, job):
+        '''func(*job) on a session thread, in a copy of the current context so current_engine() finds the engine'''
+        context = contextvars.copy_context()
+        return self.loop.run_in_executor(self._session_pool, functools.partial(context.run, func, *job))
+
+    async def _run_session(self, func, job, serial_lock, on_done=None):
+        async with self._session_semaphore:
+            _current_engine.set(self)
+            if serial_lock is not None:
+                async with serial_lock:
+                    result = await self._in_session_thread(func, job)
+            else:
+                result = await self._in_session_thread(func, job)
+        if on_done is not None:
+            on_done(result)
+        return result
+
+    async def run_all(self, func, jobs, task_of=None, on_done=None):
+        self.loop = asyncio.get_running_loop()
+        # not the loop's default executor: asyncio.to_thread elsewhere must not wait for a session thread
+        self._session_pool = ThreadPoolExecutor(max_workers=self.max_sessions, thread_name_prefix='oracle-session')
+        self._session_semaphore = asyncio.Semaphore(self.max_sessions)
+        serial_locks = {}
+
+        sessions = []
+        for job in jobs:
+            task = task_of(job) if task_of is not None else None
+            serial_lock = None
+            if task in SERIAL_TASKS:
+                serial_lock = serial_locks.setdefault(task, asyncio.Lock())
+            sessions.append(self._run_session(func, job, serial_lock, on_done))
+        logging.info(f"Async engine: {len(sessions)} sessions, up to {self.max_sessions} at once, provider limits {self.provider_concurrency} (default {self.default_concurrency})")
+        try:
+            return await asyncio.gather(*sessions)
+        finally:
+            self._session_pool.shutdown(wait=False)
+
+    def run(self, func, jobs, task_of=None, on_done=None):
+        '''run func(*job) for every job, returns the results in job order; on_done(result) is called as each session finishes'''
+        return asyncio.run(self.run_all(func, jobs, task_of, on_done))
@@ -1,14 +1,14 @@
 from paths import PathManager
 from dotenv import load_dotenv
-from openai import OpenAI
-from google import genai
 from google.genai import types
-from anthropic import Anthropic
 import os
 import json
 from pydantic import BaseModel
 import logging
 from typing import Union
+from response_cache import cached_completion
+from cassettes import record_exchange
+from clients import get_client
 
 load_dotenv(override=True)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,12 +27,8 @@ class Platform:
         self.platformgen_model_family = platformgen_model_family
         self.platformgen_model_name = platformgen_model_name
 
-        if self.platformgen_model_family == 'gpt':
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        elif self.platformgen_model_family == 'claude':
-            self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        elif self.platformgen_model_family == 'gemini':
-            self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        if self.platformgen_model_family in ['gpt', 'claude', 'gemini']:
+            self.client = get_client(self.platformgen_model_family)
 
         with open(self.paths.platform_path / task / 'platformgen_system_prompt') as f:
             self.platformgen_system_prompt = f.read()
@@ -41,6 +37,15 @@ class Platform:
 
     '''use LLM to generate the interface of the platform, output the code for the platform'''
     def generate(self, difficulty, task_id, version):
+        instruction = self.instruction(difficulty, task_id)
+        # temperature=0 requests, so regenerating the same platform can be served by the response cache (--response_cache)
+        request = dict(model=self.platformgen_model_name, system=self.platformgen_system_prompt, messages=[instruction], temperature=0)
+        response = cached_completion(self.platformgen_model_family, request, lambda: self._generate_response(instruction))
+        record_exchange(self.platformgen_model_family, request, response)
+        self.save(difficulty, task_id, version, response)
+
+    '''the platform generation instruction of a black-box'''
+    def instruction(self, difficulty, task_id):
         with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r', encoding='utf-8') as f:
             information = json.load(f)
         if self.task == 'game':
@@ -51,8 +56,8 @@ class Platform:
             )
         elif self.task == 'code' and 'recursion' in task_id:
             with open(self.paths.platform_path / self.task / 'request_recursion') as f:
-                self.platformgen_initial_prompt = f.read()
-            instruction = self.platformgen_initial_prompt.format(
+                recursion_prompt = f.read()
+            instruction = recursion_prompt.format(
                 algorithm=information['algorithm'],
                 description=information['description'],
             )
@@ -61,7 +66,24 @@ class Platform:
                 algorithm=information['algorithm'],
                 description=information['description'],
             )
+        return instruction
+
+    '''write the generated platform code as version `version` of the black-box'''
+    def save(self, difficulty, task_id, version, response):
+        platform_code = code_clean(response)
+
+        output_dir = self.paths.platform_path / self.task / difficulty 
+        # import_packages = 'import os \nimport sys \ncurrent_path = os.path.abspath(__file__) \noracle_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(current_path)))) \nif oracle_path not in sys.path: \n\tsys.path.insert(0, oracle_path) \nfrom ckpt import get_local_variables, check_query_validity, get_ckpt_numbers, get_function_params \nfrom eva_models import ReasoningLLM \nimport re \nimport ast \n'
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with open(output_dir / f'{task_id}_v{version}.py', 'w', encoding='utf-8') as f:
+            # f.write(import_packages)
+            f.write(platform_code)
+        logging.info(f"Platform code generated and saved to {output_dir / f'{task_id}_v{version}.py'}")
 
+ 
+    '''send the platform generation request to the platformgen model, returns the response text'''
+    def _generate_response(self, instruction):
         if self.platformgen_model_family == 'gpt':
             response = self.client.chat.completions.create(
                 model=self.platformgen_model_name,
@@ -126,18 +148,9 @@ class Platform:
                 contents=[instruction]
             )
             response = response.text
-        platform_code = code_clean(response)
+        return response
 
-        output_dir = self.paths.platform_path / self.task / difficulty 
-        # import_packages = 'import os \nimport sys \ncurrent_path = os.path.abspath(__file__) \noracle_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(current_path)))) \nif oracle_path not in sys.path: \n\tsys.path.insert(0, oracle_path) \nfrom ckpt import get_local_variables, check_query_validity, get_ckpt_numbers, get_function_params \nfrom eva_models import ReasoningLLM \nimport re \nimport ast \n'
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        with open(output_dir / f'{task_id}_v{version}.py', 'w', encoding='utf-8') as f:
-            # f.write(import_packages)
-            f.write(platform_code)
-        logging.info(f"Platform code generated and saved to {output_dir / f'{task_id}_v{version}.py'}")
 
- 
 class PolishModel:
     def __init__(self, task, model_family, model_name):
         self.paths = PathManager()
@@ -146,12 +159,8 @@ class PolishModel:
         self.model_family = model_family
         self.model_name = model_name
 
-        if self.model_family == 'gpt':
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        elif self.model_family == 'claude':
-            self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        elif self.model_family == 'gemini':
-            self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        if self.model_family in ['gpt', 'claude', 'gemini']:
+            self.client = get_client(self.model_family)
 
         with open(self.paths.platform_path / 'platformpolish_system_prompt', 'r', encoding='utf-8') as f:
             self.system_prompt = f.read()
@@ -163,7 +172,17 @@ class PolishModel:
             self.initial_prompt_logs_2 = f.read()
 
     def polish(self, task, difficulty, task_id, running_errors, version):
-        '''if there exist running errors, no log'''
+        response = self._chat(self.triage_instruction(task, difficulty, task_id, running_errors, version))
+        
+        if 'correct' in response:
+            logging.info(f"Current platform code is correct")
+            return 'correct'
+        else:
+            response = self._chat(self.fix_instruction(task, difficulty, task_id, version, response), gemini_temperature=0)
+            return self.save_fix(difficulty, task_id, version, response)
+
+    '''the first polish call: is version `version`-1 correct? If there exist running errors, no log'''
+    def triage_instruction(self, task, difficulty, task_id, running_errors, version):
         with open(self.paths.platform_path / task / difficulty / f'{task_id}_v{version-1}.py', 'r', encoding='utf-8') as f:
             current_code = f.read()
         if running_errors != '':
@@ -191,6 +210,63 @@ class PolishModel:
                 taskintro=taskintro,
                 interaction_log=interaction_log,
             )
+        return instruction
+
+    '''the second polish call: rewrite version `version`-1, given the mistake the triage call found'''
+    def fix_instruction(self, task, difficulty, task_id, version, mistake):
+        with open(self.paths.platform_path / task / difficulty / f'{task_id}_v{version-1}.py', 'r', encoding='utf-8') as f:
+            current_code = f.read()
+        if self.task == 'code' and 'recursion' in task_id:
+            with open(self.paths.platform_path / task / 'request_recursion', 'r', encoding='utf-8') as f:
+                request = f.read()
+        else:
+            with open(self.paths.platform_path / task / 'request', 'r', encoding='utf-8') as f:
+                request = f.read()
+                
+        with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r', encoding='utf-8') as f:
+            information = json.load(f)
+        if task == 'game':
+            request = request.format(
+                output_code_name=f'{task_id}_v{version-1}.py',
+                algorithm=information['algorithm'],
+                description=information['description'],
+                strategy=information['strategy']
+            )
+        else:
+            request = request.format(
+                output_code_name=f'{task_id}_v{version-1}.py',
+                algorithm=information['algorithm'],
+                description=information['description']
+            )
+        return self.initial_prompt_logs_2.format(
+            request=request,
+            mistake=mistake,
+            current_code=current_code,
+        )
+
+    '''write the rewritten platform code as version `version`, returns the code'''
+    def save_fix(self, difficulty, task_id, version, response):
+        output_dir = self.paths.platform_path / self.task / difficulty 
+        # if not os.path.exists(output_dir):
+        #     os.makedirs(output_dir)
+        with open(output_dir / f'{task_id}_v{version}.py', 'w', encoding='utf-8') as f:
+            f.write(code_clean(response))
+        logging.info(f"Platform code updated and saved to {output_dir / f'{task_id}_v{version}.py'}")
+        return code_clean(response)
+
+    '''temperature of a polish request: gpt and claude always run at 0, gemini at gemini_temperature (unset by default)'''
+    def temperature(self, gemini_temperature=None):
+        return gemini_temperature if self.model_family == 'gemini' else 0
+
+    '''send one polish instruction to the polish model, returns the response text; gpt and claude always run at
+    temperature=0, gemini only when gemini_temperature=0, and those requests can be served by the response cache'''
+    def _chat(self, instruction, gemini_temperature=None):
+        request = dict(model=self.model_name, system=self.system_prompt, messages=[instruction], temperature=self.temperature(gemini_temperature))
+        response = cached_completion(self.model_family, request, lambda: self._send(instruction, gemini_temperature))
+        record_exchange(self.model_family, request, response)
+        return response
+
+    def _send(self, instruction, gemini_temperature):
         if self.model_family == 'gpt':
             response = self.client.chat.completions.create(
                 model=self.model_name,
@@ -228,92 +304,13 @@ class PolishModel:
                 config=types.GenerateContentConfig(
                     thinking_config=types.ThinkingConfig(thinking_budget=-1),
                     system_instruction=self.system_prompt,
+                    temperature=gemini_temperature,
                 ),
                 contents=[instruction]
             )
             response = response.text
-        
-        if 'correct' in response:
-            logging.info(f"Current platform code is correct")
-            return 'correct'
-        else:
-            if self.task == 'code' and 'recursion' in task_id:
-                with open(self.paths.platform_path / task / 'request_recursion', 'r', encoding='utf-8') as f:
-                    request = f.read()
-            else:
-                with open(self.paths.platform_path / task / 'request', 'r', encoding='utf-8') as f:
-                    request = f.read()
-                    
-            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r', encoding='utf-8') as f:
-                information = json.load(f)
-            if task == 'game':
-                request = request.format(
-                    output_code_name=f'{task_id}_v{version-1}.py',
-                    algorithm=information['algorithm'],
-                    description=information['description'],
-                    strategy=information['strategy']
-                )
-            else:
-                request = request.format(
-                    output_code_name=f'{task_id}_v{version-1}.py',
-                    algorithm=information['algorithm'],
-                    description=information['description']
-                )
-            instruction = self.initial_prompt_logs_2.format(
-                request=request,
-                mistake=response,
-                current_code=current_code,
-            )
-            if self.model_family == 'gpt':
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": self.system_prompt
-                        },
-                        {
-                            "role": "user",
-                            "content": instruction
+        return response
 
-                        }
-                    ],
-                    temperature=0,
-                )
-                response = response.choices[0].message.content
-            elif self.model_family == 'claude':
-                response = self.client.messages.create(
-                    model=self.model_name,
-                    system=self.system_prompt,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": instruction
-                        }
-                    ],
-                    temperature=0,
-                    max_tokens=8192,
-                )
-                response = response.content[0].text
-            elif self.model_family == 'gemini':
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    config=types.GenerateContentConfig(
-                        thinking_config=types.ThinkingConfig(thinking_budget=-1),
-                        system_instruction=self.system_prompt,
-                        temperature=0,
-                    ),
-                    contents=[instruction]
-                )
-                response = response.text
-            output_dir = self.paths.platform_path / self.task / difficulty 
-            # if not os.path.exists(output_dir):
-            #     os.makedirs(output_dir)
-            with open(output_dir / f'{task_id}_v{version}.py', 'w', encoding='utf-8') as f:
-                f.write(code_clean(response))
-            logging.info(f"Platform code updated and saved to {output_dir / f'{task_id}_v{version}.py'}")
-            return code_clean(response)
-        
 
 class EncryptionFormat(BaseModel):
     class Encryption(BaseModel):
@@ -356,17 +353,37 @@ class TestSamplesGenerator:
         self.max_turns = max_turns
         self.paths = PathManager()
 
-        if self.model_family == 'gpt':
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        elif self.model_family == 'gemini':
-            self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        if self.model_family in ['gpt', 'gemini']:
+            self.client = get_client(self.model_family)
 
         with open(self.paths.test_path / task / 'testsamplegen_system_prompt', 'r', encoding='utf-8') as f:
             self.system_prompt = f.read()
         with open(self.paths.test_path / task / 'testsamplegen_initial_prompt', 'r', encoding='utf-8') as f:
             self.initial_prompt = f.read()
 
+    '''structured-output request to the gpt sample generator, returns the parsed samples; the raw JSON answer is recorded with --record_cassettes'''
+    def _parse(self, instruction, temperature, response_format):
+        messages = [{"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": instruction}]
+        response = self.client.beta.chat.completions.parse(
+            model=self.model_name,
+            messages=messages,
+            temperature=temperature,
+            response_format=response_format
+        )
+        message = response.choices[0].message
+        record_exchange(self.model_family, dict(model=self.model_name, messages=messages, temperature=temperature), message.content)
+        return message.parsed
+
     def generate(self, difficulty, task_id, version):
+        request = self.sample_request(difficulty, task_id, version)
+        response = None
+        if request is not None and self.model_family == 'gpt':
+            response = self._parse(**request)
+        self.save_samples(difficulty, task_id, response)
+
+    '''keyword arguments of _parse asking for the test samples of a black-box, None for tasks with fixed samples (physics)'''
+    def sample_request(self, difficulty, task_id, version):
         import inspect
         import importlib.util
         
@@ -374,18 +391,7 @@ class TestSamplesGenerator:
             num = 8
             with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
                 algorithm = json.load(f)['description']
-            if self.model_family == 'gpt':
-                response = self.client.beta.chat.completions.parse(
-                    model=self.model_name,
-                    messages=[{"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": self.initial_prompt.format(algorithm=algorithm, num=num)}],
-                    temperature=1,
-                    response_format=EncryptionFormat
-                )
-                response = response.choices[0].message.parsed
-            test_samples = [code.model_dump() for code in response.sample]
-            with open(self.paths.test_path / self.task / difficulty / f'{task_id}.json', 'w', encoding='utf-8') as f:
-                json.dump(test_samples, f, ensure_ascii=False, indent=4)
+            return dict(instruction=self.initial_prompt.format(algorithm=algorithm, num=num), temperature=1, response_format=EncryptionFormat)
             
         elif self.task == 'code':
             num1 = 5
@@ -402,15 +408,44 @@ class TestSamplesGenerator:
             # Get the function object from the module
             func = getattr(module, 'blackbox', None)
             code = inspect.getsource(func)
-            if self.model_family == 'gpt':
-                response = self.client.beta.chat.completions.parse(
-                    model=self.model_name,
-                    messages=[{"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": self.initial_prompt.format(algorithm=algorithm, code=code, num1=num1, num2=num2)}],
-                    temperature=1,
-                    response_format=CodeFormat
-                )
-                response = response.choices[0].message.parsed
+            return dict(instruction=self.initial_prompt.format(algorithm=algorithm, code=code, num1=num1, num2=num2), temperature=1, response_format=CodeFormat)
+
+        elif self.task == 'physics':
+            return None
+
+        elif self.task == 'game':
+            num = 4
+            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
+                info = json.load(f)
+                algorithm = info['algorithm']
+                description = info['description']
+                settings = info['settings']
+            return dict(instruction=self.initial_prompt.format(algorithm=algorithm, num=num, description=description, settings=settings), temperature=0, response_format=GameFormat)
+        
+        elif self.task == 'puzzle':
+            num = 6
+            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
+                info = json.load(f)
+                algorithm = info['algorithm']
+                description = info['description']
+                answer_format = info['answer_format']
+            return dict(instruction=self.initial_prompt.format(algorithm=algorithm, num=num, description=description, answer_format=answer_format), temperature=1, response_format=PuzzleFormat)
+
+        elif self.task == 'circuit':
+            num1 = 16
+            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
+                info = json.load(f)
+                input_size = info["input_size"]
+            return dict(instruction=self.initial_prompt.format(num1=num1, input_size=input_size), temperature=0.5, response_format=CircuitFormat)
+
+    '''write the test samples of a black-box to test/, from the parsed response (None for physics)'''
+    def save_samples(self, difficulty, task_id, response):
+        if self.task == 'encryption':
+            test_samples = [code.model_dump() for code in response.sample]
+            with open(self.paths.test_path / self.task / difficulty / f'{task_id}.json', 'w', encoding='utf-8') as f:
+                json.dump(test_samples, f, ensure_ascii=False, indent=4)
+            
+        elif self.task == 'code':
             test_samples = [code.model_dump() for code in response.sample]
             
             with open(self.paths.test_path / self.task / difficulty / f'{task_id}.json', 'w', encoding='utf-8') as f:
@@ -429,22 +464,6 @@ class TestSamplesGenerator:
                 json.dump(test_samples, f, ensure_ascii=False, indent=4)
 
         elif self.task == 'game':
-            num = 4
-            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
-                info = json.load(f)
-                algorithm = info['algorithm']
-                description = info['description']
-                settings = info['settings']
-
-            if self.model_family == 'gpt':
-                response = self.client.beta.chat.completions.parse(
-                    model=self.model_name,
-                    messages=[{"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": self.initial_prompt.format(algorithm=algorithm, num=num, description=description, settings=settings)}],
-                    temperature=0,
-                    response_format=GameFormat
-                )
-                response = response.choices[0].message.parsed
             test_samples = [code.model_dump()['settings'] for code in response.sample]
 
             for i in range(len(test_samples)):
@@ -460,45 +479,8 @@ class TestSamplesGenerator:
             with open(self.paths.test_path / self.task / difficulty / f'{task_id}.json', 'w', encoding='utf-8') as f:
                 json.dump(test_samples, f, ensure_ascii=False, indent=4)
         
-        elif self.task == 'puzzle':
-            num = 6
-            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
-                info = json.load(f)
-                algorithm = info['algorithm']
-                description = info['description']
-                answer_format = info['answer_format']
-
-            if self.model_family == 'gpt':
-                response = self.client.beta.chat.completions.parse(
-                    model=self.model_name,
-                    messages=[{"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": self.initial_prompt.format(algorithm=algorithm, num=num, description=description, answer_format=answer_format)}],
-                    temperature=1,
-                    response_format=PuzzleFormat
-                )
-                response = response.choices[0].message.parsed
+        elif self.task == 'puzzle' or self.task == 'circuit':
             test_samples = [code.model_dump() for code in response.sample]
 
             with open(self.paths.test_path / self.task / difficulty / f'{task_id}.json', 'w', encoding='utf-8') as f:
                 json.dump(test_samples, f, ensure_ascii=False, indent=4)
-
-        elif self.task == 'circuit':
-            num1 = 16
-            with open(self.paths.task_path / self.task / difficulty / f'{task_id}.json', 'r') as f:
-                info = json.load(f)
-                input_size = info["input_size"]
-
-            if self.model_family == 'gpt':
-                response = self.client.beta.chat.completions.parse(
-                    model=self.model_name,
-                    messages=[{"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": self.initial_prompt.format(num1=num1, input_size=input_size)}],
-                    temperature=0.5,
-                    response_format=CircuitFormat
-                )
-                response = response.choices[0].message.parsed
-            
-            test_samples = [code.model_dump() for code in response.sample]
-
-            with open(self.paths.test_path / self.task / difficulty / f'{task_id}.json', 'w', encoding='utf-8') as f:
-                json.dump(test_samples, f, ensure_ascii=False, indent=4)
\ No newline at end of file
@@ -0,0 +1,235 @@
+import time
+import json
+import logging
+from clients import get_client
+from lazy_imports import LazyModule
+from response_cache import get_response_cache, is_deterministic
+from cassettes import record_exchange
+
+'''
+Batch mode for the offline generation steps (main.py --batch).
+
+Test sample generation, platform generation and the two polish calls are independent across the black-boxes of a
+task folder, but used to run one request at a time. With --batch, main.py collects the requests of one step for
+every black-box into a BatchRun, which submits them through the provider's batch API in one go:
+
+* gpt: a JSONL file of /v1/chat/completions requests, uploaded and run with client.batches
+* claude: client.messages.batches
+* gemini: client.batches with inline requests
+
+and then polls the batch every --batch_poll_seconds until it has ended. The answers are written back into test/
+and platforms/ by the same code as the sequential path (TestSamplesGenerator.save_samples, Platform.save,
+PolishModel.save_fix). Each request is built like its synchronous counterpart in auto_generation.py, so the response
+cache answers deterministic requests before anything is submitted, and cassettes record the batch answers under the
+same keys as sequential ones.
+
+Requests that fail inside a batch are logged and left out of the answers; their black-boxes stay incomplete and are
+skipped by step 3 like any other black-box whose generation failed. The stand-in server (standin.py) implements
+all three batch APIs, so the flow runs offline with --provider_base_url.
+'''
+
+DEFAULT_POLL_SECONDS = 30
+PLATFORM_MAX_TOKENS = 8192   # claude max_tokens of platform generation and polishing
+
+
+openai_pydantic = LazyModule('openai.lib._pydantic')
+
+
+class BatchRequestError(Exception):
+    pass
+
+
+def _json_schema_format(response_format):
+    '''response_format of a chat completions body for a pydantic model (client.beta.chat.completions.parse builds it from the class)'''
+    return {'type': 'json_schema', 'json_schema': {'name': response_format.__name__, 'strict': True,
+                                                   'schema': openai_pydantic.to_strict_json_schema(response_format)}}
+
+
+class OpenAIBatch:
+    endpoint = '/v1/chat/completions'
+
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+
+    def body(self, item):
+        body = {'model': self.model_name, 'messages': [{'role': 'system', 'content': item['system']}, {'role': 'user', 'content': item['instruction']}]}
+        if item['temperature'] is not None:
+            body['temperature'] = item['temperature']
+        if item['response_format'] is not None:
+            body['response_format'] = _json_schema_format(item['response_format'])
+        return body
+
+    def submit(self, items):
+        lines = [json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': self.endpoint, 'body': self.body(item)}, ensure_ascii=False)
+                 for custom_id, item in items.items()]
+        file = self.client.files.create(file=('oracle_batch.jsonl', '\n'.join(lines).encode('utf-8')), purpose='batch')
+        return self.client.batches.create(input_file_id=file.id, endpoint=self.endpoint, completion_window='24h').id
+
+    def status(self, batch_id):
+        '''(ended, status text)'''
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status in ['completed', 'failed', 'expired', 'cancelled'], batch.status
+
+    def results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        answers = {}
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get('response') or {}
+                if response.get('status_code') == 200:
+                    answers[entry['custom_id']] = response['body']['choices'][0]['message']['content']
+                else:
+                    answers[entry['custom_id']] = BatchRequestError(entry.get('error') or response.get('body'))
+        return answers
+
+
+class AnthropicBatch:
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+
+    def params(self, item):
+        params = {'model': self.model_name, 'system': item['system'], 'messages': [{'role': 'user', 'content': item['instruction']}],
+                  'max_tokens': PLATFORM_MAX_TOKENS}
+        if item['temperature'] is not None:
+            params['temperature'] = item['temperature']
+        return params
+
+    def submit(self, items):
+        requests = [{'custom_id': custom_id, 'params': self.params(item)} for custom_id, item in items.items()]
+        return self.client.messages.batches.create(requests=requests).id
+
+    def status(self, batch_id):
+        batch = self.client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return batch.processing_status == 'ended', f"{batch.processing_status} ({counts.succeeded} succeeded, {counts.errored} errored, {counts.processing} processing)"
+
+    def results(self, batch_id):
+        answers = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == 'succeeded':
+                answers[entry.custom_id] = ''.join(block.text for block in entry.result.message.content if block.type == 'text')
+            else:
+                answers[entry.custom_id] = BatchRequestError(getattr(entry.result, 'error', None) or entry.result.type)
+        return answers
+
+
+class GeminiBatch:
+    ENDED = ['SUCCEEDED', 'FAILED', 'CANCELLED', 'EXPIRED']
+
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+        self.custom_ids = []    # inline responses come back in the order of the requests
+
+    def request(self, item):
+        config = {'system_instruction': item['system'], 'thinking_config': {'thinking_budget': -1}}
+        if item['temperature'] is not None:
+            config['temperature'] = item['temperature']
+        return {'contents': [{'role': 'user', 'parts': [{'text': item['instruction']}]}], 'config': config}
+
+    def submit(self, items):
+        self.custom_ids = list(items)
+        job = self.client.batches.create(model=self.model_name, src=[self.request(item) for item in items.values()],
+                                         config={'display_name': f'oracle-generation-{int(time.time())}'})
+        return job.name
+
+    def _state(self, job):
+        return getattr(job.state, 'name', str(job.state))
+
+    def status(self, batch_id):
+        state = self._state(self.client.batches.get(name=batch_id))
+        return any(state.endswith(ended) for ended in self.ENDED), state
+
+    def results(self, batch_id):
+        job = self.client.batches.get(name=batch_id)
+        responses = (job.dest.inlined_responses if job.dest is not None else None) or []
+        answers = {}
+        for custom_id, inlined in zip(self.custom_ids, responses):
+            if inlined.error is not None or inlined.response is None:
+                answers[custom_id] = BatchRequestError(inlined.error)
+            else:
+                answers[custom_id] = inlined.response.text
+        return answers
+
+
+BATCH_APIS = {'gpt': OpenAIBatch, 'claude': AnthropicBatch, 'gemini': GeminiBatch}
+
+
+class BatchRun:
+    '''the requests of one generation step for one model, answered through the provider's batch API'''
+    def __init__(self, model_family, model_name, poll_seconds=DEFAULT_POLL_SECONDS):
+        if model_family not in BATCH_APIS:
+            raise ValueError(f"No batch API for model family {model_family}, expected one of {list(BATCH_APIS)}")
+        self.model_family = model_family
+        self.model_name = model_name
+        self.poll_seconds = poll_seconds
+        self.items = {}     # key -> request
+
+    def add(self, key, system, instruction, temperature=None, response_format=None):
+        '''queue one single-turn request; response_format (a pydantic model) asks for structured output, answered parsed'''
+        self.items[key] = {'system': system, 'instruction': instruction, 'temperature': temperature, 'response_format': response_format}
+
+    def _exchange(self, item):
+        '''the request as its synchronous counterpart keys it in the response cache and the cassettes'''
+        if item['response_format'] is not None:     # TestSamplesGenerator._parse
+            return dict(model=self.model_name, messages=[{"role": "system", "content": item['system']}, {"role": "user", "content": item['instruction']}],
+                        temperature=item['temperature'])
+        return dict(model=self.model_name, system=item['system'], messages=[item['instruction']], temperature=item['temperature'])
+
+    def _answer(self, item, text):
+        return item['response_format'].model_validate_json(text) if item['response_format'] is not None else text
+
+    def run(self):
+        '''key -> response text (or parsed response) of every request that was answered'''
+        if not self.items:
+            return {}
+        answers, pending = {}, {}
+        cache = get_response_cache()
+        for key, item in self.items.items():
+            exchange = self._exchange(item)
+            value = None
+            if cache is not None and item['response_format'] is None and is_deterministic(exchange):
+                value = cache.get(cache.key(self.model_family, exchange))
+            if value is not None:
+                answers[key] = self._answer(item, value)
+            else:
+                pending[f'request-{len(pending)}'] = (key, item)
+        if answers:
+            logging.info(f"Batch ({self.model_family}, {self.model_name}): {len(answers)} of {len(self.items)} requests answered by the response cache")
+        if not pending:
+            return answers
+
+        api = BATCH_APIS[self.model_family](get_client(self.model_family), self.model_name)
+        batch_id = api.submit({custom_id: item for custom_id, (_, item) in pending.items()})
+        logging.info(f"Batch {batch_id} ({self.model_family}, {self.model_name}): submitted {len(pending)} requests")
+        start = time.monotonic()
+        while True:
+            ended, status = api.status(batch_id)
+            if ended:
+                break
+            logging.info(f"Batch {batch_id}: {status} after {time.monotonic() - start:.0f}s")
+            time.sleep(self.poll_seconds)
+        logging.info(f"Batch {batch_id}: {status} after {time.monotonic() - start:.0f}s")
+
+        results = api.results(batch_id)
+        for custom_id, (key, item) in pending.items():
+            text = results.get(custom_id, BatchRequestError('no result'))
+            if isinstance(text, Exception):
+                logging.warning(f"Batch {batch_id}: request for {key} failed: {text}")
+                continue
+            exchange = self._exchange(item)
+            if cache is not None and item['response_format'] is None and is_deterministic(exchange):
+                cache.put(cache.key(self.model_family, exchange), self.model_family, text)
+            record_exchange(self.model_family, exchange, text)
+            try:
+                answers[key] = self._answer(item, text)
+            except ValueError as e:     # structured output that does not match its model
+                logging.warning(f"Batch {batch_id}: answer for {key} could not be parsed: {e}")
+        return answers
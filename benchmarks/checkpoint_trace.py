@@ -0,0 +1,109 @@
+'''
+Ground-truth benchmark of the code task on the recursive black-boxes.
+
+    * printed: what evaluate originally did, one blackbox run per checkpoint question with its stdout captured and the
+      printed "name=..., value=..., type=..." text parsed back with a regex
+    * snapshot: one blackbox run per question, typed snapshots of the locals (ckpt.capture_snapshot)
+    * trace: one traced run per sample that answers all of its questions (ckpt.trace_checkpoints)
+
+No LLM API is called. The answers of the three modes are checked to grade the same (str() without spaces, as
+evaluate compares them) and the time spent computing them is compared.
+
+    python benchmarks/checkpoint_trace.py --repeats 5
+'''
+import os
+import re
+import sys
+import ast
+import json
+import time
+import argparse
+from io import StringIO
+from contextlib import redirect_stdout
+
+oracle_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if oracle_path not in sys.path:
+    sys.path.insert(0, oracle_path)
+from paths import PathManager
+from worker_pool import load_platform
+from ckpt import trace_checkpoints, capture_snapshot, set_current_debug_target, reset_debugger_state
+
+BLACKBOXES = [('easy', 'fib_recursion'), ('easy', 'quicksort_recursion'), ('hard', 'mergesort_recursion')]
+TYPE_MAPPING = {'int': int, 'float': float, 'list': ast.literal_eval, 'dict': ast.literal_eval, 'str': lambda s: s.strip("'\"")}
+PATTERN = re.compile(r"(\w+)\s*=\s*(\{.*?\}|\[.*?\]|'.*?'|\".*?\"|[^,]*)")
+
+
+def load_samples(paths, difficulty, task_id):
+    with open(paths.test_path / 'code' / difficulty / f'{task_id}.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def questions(samples):
+    for sample in samples:
+        inputs = dict(zip(sample['var_names'], sample['var_values']))
+        yield inputs, sample['checkpoints']
+
+
+def printed_value(blackbox, inputs, idx, iter, var):
+    '''the original ground truth: capture what get_local_variables prints and parse it back'''
+    output = StringIO()
+    set_current_debug_target(blackbox, 'original_n')
+    reset_debugger_state()
+    with redirect_stdout(output):
+        blackbox(**json.loads(json.dumps(inputs)), idx=idx, iter=iter)
+    values = {}
+    for item in ast.literal_eval(output.getvalue()):
+        parts = {key.strip(): val.strip() for key, val in PATTERN.findall(item)}
+        values[parts['name']] = TYPE_MAPPING.get(parts.get('type', 'str'), lambda val: val)(parts.get('value', ''))
+    return values.get(var)
+
+
+def printed(blackbox, samples):
+    return [printed_value(blackbox, inputs, idx, iter, var) for inputs, checkpoints in questions(samples) for idx, iter, var in checkpoints]
+
+
+def snapshot(blackbox, samples):
+    return [capture_snapshot(blackbox, inputs, idx, iter).get(var) for inputs, checkpoints in questions(samples) for idx, iter, var in checkpoints]
+
+
+def traced(blackbox, samples):
+    answers = []
+    for inputs, checkpoints in questions(samples):
+        trace = trace_checkpoints(blackbox, inputs, {(idx, iter) for idx, iter, _ in checkpoints})
+        answers.extend(trace.lookup(idx, iter).get(var) for idx, iter, var in checkpoints)
+    return answers
+
+
+def graded(answers):
+    return [str(answer).replace(" ", "") for answer in answers]
+
+
+def best_of(repeats, func, *args):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare printed, snapshot and traced ground truth of the code task')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per mode, the best one is reported.')
+    args = parser.parse_args()
+
+    paths = PathManager()
+    print(f"{'blackbox':<22}{'questions':>10}{'printed (ms)':>14}{'snapshot (ms)':>15}{'trace (ms)':>12}{'speed-up':>10}")
+    for difficulty, task_id in BLACKBOXES:
+        module = load_platform(paths.platform_path / 'code' / difficulty / f'{task_id}_final.py')
+        samples = load_samples(paths, difficulty, task_id)
+        baseline, expected = best_of(args.repeats, printed, module.blackbox, samples)
+        per_question, snapshots = best_of(args.repeats, snapshot, module.blackbox, samples)
+        trace, answers = best_of(args.repeats, traced, module.blackbox, samples)
+        if graded(snapshots) != graded(expected) or graded(answers) != graded(expected):
+            raise AssertionError(f"{task_id}: snapshot answers grade differently from the printed ones")
+        print(f"{task_id:<22}{len(expected):>10}{baseline * 1000:>14.1f}{per_question * 1000:>15.1f}{trace * 1000:>12.1f}{baseline / trace:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
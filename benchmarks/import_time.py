@@ -0,0 +1,110 @@
+'''
+Import-time benchmark for eva_models, to keep its start-up cost tracked across versions.
+
+Every sample runs in a fresh interpreter and measures
+    * import:  `import eva_models`
+    * session: building a ReasoningLLM for one model family, including its (lazily created) client
+Cold samples point PYTHONPYCACHEPREFIX at an empty directory so no bytecode cache can be reused; warm samples run
+with the normal, already populated cache. Results are appended as one JSON line per run to --output (default
+logs/import_time.jsonl, outside version control), and the script exits with status 1 when the warm median exceeds
+--budget_ms.
+
+    python benchmarks/import_time.py --family gpt --repeats 10 --budget_ms 300
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+oracle_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# an API model name per family, only used to build the client, no request is sent
+FAMILY_MODELS = {
+    'gpt': 'gpt-4.1-2025-04-14',
+    'claude': 'claude-3-7-sonnet-20250219',
+    'gemini': 'gemini-2.5-flash',
+    'qwen': 'qwen3-32b',
+    'deepseek': 'deepseek-chat',
+    'llama': 'meta-llama/llama-4-scout',
+}
+
+SNIPPET = '''
+import sys, time, json
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import eva_models
+imported = time.perf_counter()
+player = eva_models.ReasoningLLM(sys.argv[2], sys.argv[3], 'encryption', 'normal', 1, 'easy', 'simple_substitution', False, 'evaluate')
+player.client
+built = time.perf_counter()
+loaded = sorted(m for m in ('openai', 'anthropic', 'google.genai', 'requests', 'httpx') if m in sys.modules)
+print(json.dumps({'import_ms': (imported - start) * 1000, 'session_ms': (built - imported) * 1000, 'sdks': loaded}))
+'''
+
+
+def sample(family, cold):
+    env = dict(os.environ)
+    if cold:
+        env['PYTHONPYCACHEPREFIX'] = tempfile.mkdtemp(prefix='oracle_pycache_')
+    result = subprocess.run(
+        [sys.executable, '-c', SNIPPET, oracle_path, family, FAMILY_MODELS[family]],
+        capture_output=True, text=True, env=env, cwd=oracle_path, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summary(samples, key):
+    values = [s[key] for s in samples]
+    return {'median': round(statistics.median(values), 1), 'min': round(min(values), 1), 'max': round(max(values), 1)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=oracle_path).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure eva_models import and session start-up time')
+    parser.add_argument('--family', type=str, default='gpt', choices=list(FAMILY_MODELS))
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--budget_ms', type=float, default=None, help='fail if the warm median of import + session exceeds this')
+    parser.add_argument('--output', type=str, default=os.path.join(oracle_path, 'logs', 'import_time.jsonl'), help='JSON lines file the run is appended to.')
+    args = parser.parse_args()
+
+    sample(args.family, cold=False)    # populate the bytecode cache before the warm samples
+    cold = [sample(args.family, cold=True) for _ in range(args.repeats)]
+    warm = [sample(args.family, cold=False) for _ in range(args.repeats)]
+
+    record = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'family': args.family,
+        'repeats': args.repeats,
+        'cold_import_ms': summary(cold, 'import_ms'),
+        'cold_session_ms': summary(cold, 'session_ms'),
+        'warm_import_ms': summary(warm, 'import_ms'),
+        'warm_session_ms': summary(warm, 'session_ms'),
+        'sdks_loaded': warm[-1]['sdks'],
+    }
+    print(json.dumps(record, indent=4))
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+    warm_total = record['warm_import_ms']['median'] + record['warm_session_ms']['median']
+    if args.budget_ms is not None and warm_total > args.budget_ms:
+        print(f"Start-up budget exceeded: {warm_total:.1f} ms > {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
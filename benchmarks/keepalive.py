@@ -0,0 +1,80 @@
+'''
+Keep-alive benchmark for the OpenRouter (llama) path: a bare requests.post per turn vs. the pooled session of clients.py.
+
+A local HTTP/1.1 server answers with an OpenRouter-shaped response, so the numbers isolate connection set-up. Against
+the real endpoint each cold request additionally pays the TLS handshake, which makes the gap larger. Pass --url to
+time a real endpoint instead (the request body is then sent as-is and needs OPENROUTER_API_KEY).
+
+    python benchmarks/keepalive.py --turns 200
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+oracle_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if oracle_path not in sys.path:
+    sys.path.insert(0, oracle_path)
+from clients import requests, openrouter_session, open_connections
+
+RESPONSE = json.dumps({'choices': [{'message': {'content': 'ok'}}], 'usage': {'total_tokens': 1}}).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'    # keep connections open unless the client closes them
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench(post, url, turns, headers):
+    body = json.dumps({'model': 'meta-llama/llama-4-scout', 'messages': [{'role': 'user', 'content': 'hi'}]})
+    latencies = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        post(url, data=body, headers=headers).json()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summary(latencies):
+    return f"mean {statistics.mean(latencies) * 1000:.2f} ms, p50 {statistics.median(latencies) * 1000:.2f} ms, total {sum(latencies):.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-turn latency with and without connection reuse')
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--url', type=str, default=None, help='endpoint to time, default: a local stand-in server')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+    headers = {'Authorization': f"Bearer {os.getenv('OPENROUTER_API_KEY')}", 'Content-Type': 'application/json'}
+
+    bare = bench(requests.post, url, args.turns, headers)
+    session = openrouter_session()
+    pooled = bench(session.post, url, args.turns, headers)
+    print(f"requests.post:    {summary(bare)} ({args.turns} connections)")
+    print(f"pooled session:   {summary(pooled)} ({open_connections(session)} connections)")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+'''
+Startup-cost benchmark: one fresh interpreter per session vs. long-lived workers.
+
+Both modes load the same platform file (which imports eva_models and the provider SDKs) without
+calling any LLM API, so the numbers isolate interpreter start-up and import time.
+
+    python benchmarks/startup_cost.py --platform platforms/encryption/easy/simple_substitution_final.py --sessions 20 --processes 4
+'''
+import os
+import sys
+import time
+import argparse
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+oracle_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if oracle_path not in sys.path:
+    sys.path.insert(0, oracle_path)
+from worker_pool import init_worker, load_platform
+
+LOAD_SNIPPET = "import sys; sys.path.insert(0, sys.argv[1]); from worker_pool import load_platform; load_platform(sys.argv[2])"
+
+
+def load_only(platform_file):
+    start = time.perf_counter()
+    load_platform(platform_file)
+    return time.perf_counter() - start
+
+
+def bench_subprocess(platform_file, sessions, processes):
+    '''every session pays interpreter start-up plus all imports'''
+    def spawn(_):
+        subprocess.run([sys.executable, '-c', LOAD_SNIPPET, oracle_path, platform_file], check=True)
+    start = time.perf_counter()
+    with ThreadPool(processes) as pool:
+        pool.map(spawn, range(sessions))
+    return time.perf_counter() - start
+
+
+def bench_worker(platform_file, sessions, processes):
+    '''imports are paid once per worker, then every session only executes the platform file'''
+    start = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(processes, initializer=init_worker) as pool:
+        per_session = pool.map(load_only, [platform_file] * sessions)
+    return time.perf_counter() - start, per_session
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare subprocess and worker start-up cost')
+    parser.add_argument('--platform', type=str, default=os.path.join('platforms', 'encryption', 'easy', 'simple_substitution_final.py'))
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    platform_file = os.path.abspath(args.platform)
+    subprocess_total = bench_subprocess(platform_file, args.sessions, args.processes)
+    worker_total, per_session = bench_worker(platform_file, args.sessions, args.processes)
+
+    print(f"platform: {args.platform}, sessions: {args.sessions}, processes: {args.processes}")
+    print(f"{'mode':<12}{'total (s)':>12}{'per session (ms)':>20}")
+    print(f"{'subprocess':<12}{subprocess_total:>12.2f}{subprocess_total / args.sessions * 1000:>20.1f}")
+    print(f"{'worker':<12}{worker_total:>12.2f}{worker_total / args.sessions * 1000:>20.1f}")
+    print(f"worker in-process load only: {sum(per_session) / len(per_session) * 1000:.1f} ms per session")
+    print(f"speed-up: {subprocess_total / worker_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import json
+import glob
+import socket
+import hashlib
+import threading
+from response_cache import canonicalize
+
+'''
+Record/replay cassettes of provider exchanges.
+
+With ORACLE_RECORD_CASSETTES set (main.py --record_cassettes <dir>), every answered request of ReasoningLLM,
+Platform, PolishModel and TestSamplesGenerator is appended to <dir>/<host>-<pid>.jsonl, one file per process so
+concurrent sessions never share a file. The stand-in server of standin.py replays them.
+
+A cassette is keyed on the model and the texts of the conversation (system prompt first, then every message),
+which read the same in the keyword arguments given to an SDK and in the JSON body it puts on the wire. Roles and
+sampling parameters are left out, so a recording made through one SDK is found again when the stand-in receives
+the same conversation through the wire format of that provider.
+'''
+
+CASSETTE_ENV = 'ORACLE_RECORD_CASSETTES'
+
+_lock = threading.Lock()
+
+
+def _text(value):
+    '''the text of a message, system prompt or content part, in any of the providers' shapes'''
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return ''.join(_text(item) for item in value)
+    if isinstance(value, dict):
+        for key in ('content', 'parts', 'text'):
+            if key in value:
+                return _text(value[key])
+        return ''
+    return str(value)
+
+
+def conversation_texts(request):
+    '''system prompt and message texts of an SDK request (keyword arguments) or of a request body on the wire'''
+    request = canonicalize(request)
+    config = request.get('config') or {}
+    system = request.get('system') or config.get('system_instruction') or request.get('systemInstruction')
+    messages = request.get('messages') or request.get('input') or request.get('contents') or []
+    if isinstance(messages, str):
+        messages = [messages]
+    texts = [_text(message) for message in messages]
+    return [_text(system)] + texts if system else texts
+
+
+def cassette_key(model, request):
+    canonical = json.dumps({'model': model, 'texts': conversation_texts(request)}, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def record_exchange(model_family, request, response, thoughts=()):
+    '''append one answered request to this process's cassette, when recording is on'''
+    directory = os.getenv(CASSETTE_ENV)
+    if not directory:
+        return
+    model = canonicalize(request).get('model')
+    entry = {'model_family': model_family, 'model': model, 'key': cassette_key(model, request),
+             'response': response, 'thoughts': list(thoughts)}
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    with _lock:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{socket.gethostname()}-{os.getpid()}.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def load_cassettes(path):
+    '''key -> recorded exchanges, from a cassette file or a folder of them'''
+    files = sorted(glob.glob(os.path.join(path, '*.jsonl'))) if os.path.isdir(path) else [path]
+    cassettes = {}
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    cassettes.setdefault(entry['key'], []).append(entry)
+    return cassettes
@@ -25,15 +25,40 @@ def get_local_variables(query_idx):
         get_local_variables.max_visits[query_idx],
         get_local_variables.counters[query_idx]
     )
+
+    if _TRACE is not None:
+        _TRACE.record(query_idx, current_count, local_vars)
+        return
     
     if query_idx == target_query_idx and current_count == query_iter:
-        x = []
-        for var_name, var_value in local_vars.items():
-            if not var_name.startswith('__') and var_name != 'idx' and var_name != 'iter':
-                x.append(f"name={var_name}, value={var_value}, type={type(var_value).__name__}")
-        print(str(x))
+        print(str(format_locals(local_vars)))
+
+def _is_blackbox_local(var_name):
+    return not var_name.startswith('__') and var_name != 'idx' and var_name != 'iter'
+
+def format_locals(local_vars):
+    """Text of the locals as the player sees them: "name=..., value=..., type=..." per variable."""
+    x = []
+    for var_name, var_value in local_vars.items():
+        if _is_blackbox_local(var_name):
+            x.append(f"name={var_name}, value={var_value}, type={type(var_value).__name__}")
+    return x
+
+def snapshot_locals(local_vars):
+    """name -> value of the locals, deep-copied so that later changes (e.g. an in-place sort) do not reach the snapshot."""
+    import copy
+    snapshot = {}
+    for var_name, var_value in local_vars.items():
+        if _is_blackbox_local(var_name):
+            try:
+                snapshot[var_name] = copy.deepcopy(var_value)
+            except Exception:
+                snapshot[var_name] = var_value
+    return snapshot
 
 def check_query_validity(idx, iter):
+    if _TRACE is not None:     # a trace visits every checkpoint, there is no single query to check
+        return
     if idx not in get_local_variables.max_visits:
         print(f"Checkpoint {idx} does not exist or cannot be queried at current state")
     else:
@@ -104,6 +129,70 @@ def reset_debugger_state():
     _DEBUGGED_FUNCTION_MARKER_ATTR_NAME = None
 
 
+'''Ground truth of the code task'''
+
+'''
+    The answer to "what is var at checkpoint (idx, iter) for these inputs" is the value var has when
+    get_local_variables is visited for the iter-th time at checkpoint idx. While a trace is active,
+    get_local_variables does not print: it hands a snapshot of the typed locals (snapshot_locals) to the trace, so
+    grading compares real values instead of re-parsing the printed text. Only the interaction phase, whose output is
+    shown to the player, renders locals as text (format_locals).
+    trace_checkpoints runs the blackbox once and keeps the snapshots of the visits asked for, so all questions of a
+    sample are answered from one execution; main.py --no_checkpoint_trace runs the blackbox once per question instead.
+'''
+CHECKPOINT_TRACE_ENV = 'ORACLE_CHECKPOINT_TRACE'
+_TRACE = None
+
+def checkpoint_trace_enabled():
+    import os
+    return os.getenv(CHECKPOINT_TRACE_ENV, '1') != '0'
+
+class CheckpointTrace:
+    def __init__(self, wanted=None):
+        self.wanted = wanted    # (idx, iter) pairs to keep, None for every visit
+        self.visits = {}        # (idx, iter) -> snapshot of the locals
+
+    def record(self, query_idx, count, local_vars):
+        if self.wanted is None or (query_idx, count) in self.wanted:
+            self.visits[(query_idx, count)] = snapshot_locals(local_vars)
+
+    def lookup(self, idx, iter):
+        return self.visits.get((idx, iter))
+
+def trace_checkpoints(blackbox, inputs, wanted=None):
+    """Run the blackbox once and record every checkpoint visit (or only the `wanted` ones)."""
+    import copy
+    global _TRACE
+    trace = CheckpointTrace(wanted)
+    set_current_debug_target(blackbox, 'original_n')
+    reset_debugger_state()
+    _TRACE = trace
+    try:
+        with redirect_stdout(StringIO()):   # whatever else the blackbox prints is not part of the answer
+            blackbox(**copy.deepcopy(inputs), idx=0, iter=0)     # blackboxes may sort their input in place
+    finally:
+        _TRACE = None
+    return trace
+
+def capture_snapshot(blackbox, inputs, idx, iter):
+    """The typed locals at checkpoint (idx, iter) of one run, None if that visit never happens."""
+    return trace_checkpoints(blackbox, inputs, {(idx, iter)}).lookup(idx, iter)
+
+def checkpoint_answers(blackbox, inputs, checkpoints):
+    """The value asked for by every [idx, iter, var] checkpoint question of one sample (None if var is not a local there)."""
+    if checkpoint_trace_enabled():
+        trace = trace_checkpoints(blackbox, inputs, {(idx, iter) for idx, iter, _ in checkpoints})
+        snapshots = [trace.lookup(idx, iter) for idx, iter, _ in checkpoints]
+    else:
+        snapshots = [capture_snapshot(blackbox, inputs, idx, iter) for idx, iter, _ in checkpoints]
+    answers = []
+    for (idx, iter, var_name), snapshot in zip(checkpoints, snapshots):
+        if snapshot is None:
+            raise ValueError(f"Checkpoint ({idx}, {iter}) is never reached with inputs {inputs}")
+        answers.append(snapshot.get(var_name))
+    return answers
+
+
 '''Circuit Rule Inference'''
 
 '''
@@ -0,0 +1,226 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from lazy_imports import LazyModule
+from fork_reset import reset_after_fork
+from key_pool import API_KEY_ENVS, get_pool
+
+'''
+Provider clients shared by every session of a process.
+
+A ReasoningLLM used to build its own SDK client, so every session (and, for llama, every single turn through a bare
+requests.post) paid a fresh TCP + TLS handshake. Clients now live here, one per model family and process, each
+with a keep-alive connection pool, so sessions in worker/async mode reuse warm connections. Async clients are bound
+to an event loop and are kept per loop. The registry is cleared in forked children, which must not share sockets
+with their parent.
+
+Every request is timed, split into cold requests (first request of a client, or one that had to open a new
+connection) and warm ones, so the effect of pooling is visible in latency_summary().
+
+With ORACLE_PROVIDER_BASE_URL set (main.py --provider_base_url), every client talks to that URL instead of the
+real provider, e.g. the local stand-in server of standin.py.
+
+There is one client per endpoint (API key and base URL) of a family's key pool (key_pool.py); get_client without an
+endpoint picks the next one of the pool.
+'''
+
+openai = LazyModule('openai')
+anthropic = LazyModule('anthropic')
+genai = LazyModule('google.genai')
+genai_types = LazyModule('google.genai.types')
+requests = LazyModule('requests')
+httpx = LazyModule('httpx')
+
+QWEN_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+BASE_URL_ENV = 'ORACLE_PROVIDER_BASE_URL'
+
+POOL_CONNECTIONS = 64      # keep-alive connections per client, roughly the number of concurrent sessions per provider
+KEEPALIVE_EXPIRY = 120     # seconds an idle connection is kept open
+REQUEST_TIMEOUT = 600      # thinking models can take minutes to answer
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()    # event loop -> {(model_family, endpoint name): client}
+_lock = threading.RLock()    # reentrant: gemini's async client is built from its sync client
+
+
+def _http_client():
+    '''pooled httpx client for the SDKs built on httpx (openai, anthropic)'''
+    return httpx.Client(
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=POOL_CONNECTIONS, max_keepalive_connections=POOL_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY)
+    )
+
+
+def _async_http_client():
+    return httpx.AsyncClient(
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=POOL_CONNECTIONS, max_keepalive_connections=POOL_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY)
+    )
+
+
+def openrouter_session():
+    '''requests.Session with a keep-alive pool for OpenRouter (llama)'''
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_CONNECTIONS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _standin_url():
+    url = os.getenv(BASE_URL_ENV)
+    return url.rstrip('/') if url else None
+
+
+def _api_key(name):
+    '''the API key in $name; a stand-in server accepts any key, so one is made up when it is not set'''
+    return os.getenv(name) or ('stand-in' if _standin_url() else None)
+
+
+def _openai_base_url(default=None):
+    return _standin_url() + '/v1' if _standin_url() else default
+
+
+def _anthropic_kwargs(default=None):
+    base_url = _standin_url() or default
+    return {'base_url': base_url} if base_url else {}
+
+
+def _genai_kwargs():
+    if not _standin_url():
+        return {}
+    return {'http_options': genai_types.HttpOptions(base_url=_standin_url())}
+
+
+def openrouter_url():
+    '''chat completions endpoint of OpenRouter (llama)'''
+    return _standin_url() + '/api/v1/chat/completions' if _standin_url() else OPENROUTER_URL
+
+
+def _endpoint_key(endpoint):
+    return endpoint.api_key or _api_key(API_KEY_ENVS[endpoint.model_family])
+
+
+def _build_client(model_family, endpoint):
+    key = _endpoint_key(endpoint)
+    if model_family == 'gpt':
+        return openai.OpenAI(api_key=key, base_url=_openai_base_url(endpoint.base_url), http_client=_http_client())
+    elif model_family == 'claude':
+        return anthropic.Anthropic(api_key=key, http_client=_http_client(), **_anthropic_kwargs(endpoint.base_url))
+    elif model_family == 'gemini':
+        return genai.Client(api_key=key, **_genai_kwargs())
+    elif model_family == 'qwen':
+        return openai.OpenAI(api_key=key, base_url=_openai_base_url(endpoint.base_url or QWEN_BASE_URL), http_client=_http_client())
+    elif model_family == 'deepseek':
+        return openai.OpenAI(api_key=key, base_url=_openai_base_url(endpoint.base_url or DEEPSEEK_BASE_URL), http_client=_http_client())
+    elif model_family == 'llama':
+        return openrouter_session()
+    raise ValueError(f"Unknown model family: {model_family}")
+
+
+def _build_async_client(model_family, endpoint):
+    key = _endpoint_key(endpoint)
+    if model_family == 'gpt':
+        return openai.AsyncOpenAI(api_key=key, base_url=_openai_base_url(endpoint.base_url), http_client=_async_http_client())
+    elif model_family == 'claude':
+        return anthropic.AsyncAnthropic(api_key=key, http_client=_async_http_client(), **_anthropic_kwargs(endpoint.base_url))
+    elif model_family == 'gemini':
+        return get_client('gemini', endpoint).aio
+    elif model_family == 'qwen':
+        return openai.AsyncOpenAI(api_key=key, base_url=_openai_base_url(endpoint.base_url or QWEN_BASE_URL), http_client=_async_http_client())
+    elif model_family == 'deepseek':
+        return openai.AsyncOpenAI(api_key=key, base_url=_openai_base_url(endpoint.base_url or DEEPSEEK_BASE_URL), http_client=_async_http_client())
+    elif model_family == 'llama':
+        return _async_http_client()
+    raise ValueError(f"Unknown model family: {model_family}")
+
+
+def get_client(model_family, endpoint=None):
+    '''the process-wide client of a model family for `endpoint`, by default the next endpoint of the family's key pool'''
+    endpoint = endpoint or get_pool(model_family).pick()
+    with _lock:
+        if (model_family, endpoint.name) not in _clients:
+            _clients[(model_family, endpoint.name)] = _build_client(model_family, endpoint)
+        return _clients[(model_family, endpoint.name)]
+
+
+def get_async_client(model_family, endpoint=None):
+    '''the async client of a model family and endpoint for the running event loop'''
+    endpoint = endpoint or get_pool(model_family).pick()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        if (model_family, endpoint.name) not in clients:
+            clients[(model_family, endpoint.name)] = _build_async_client(model_family, endpoint)
+        return clients[(model_family, endpoint.name)]
+
+
+@reset_after_fork
+def _reset_after_fork():
+    global _lock
+    _clients.clear()
+    _async_clients.clear()
+    _lock = threading.RLock()
+    _latencies.clear()
+    _seen_clients.clear()
+
+
+def open_connections(client):
+    '''connections a requests.Session has opened so far, None for other clients'''
+    adapters = getattr(client, 'adapters', None)
+    if not adapters:
+        return None
+    total = 0
+    for adapter in adapters.values():
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                total += pool.num_connections
+    return total
+
+
+_latencies = {}     # model_family -> {'cold': [...], 'warm': [...]}
+_seen_clients = set()
+
+
+def record_latency(model_family, client, seconds, new_connections=None):
+    '''time one request; it is cold if it is the first of its client or opened a new connection'''
+    with _lock:
+        cold = id(client) not in _seen_clients or bool(new_connections)
+        _seen_clients.add(id(client))
+        _latencies.setdefault(model_family, {'cold': [], 'warm': []})['cold' if cold else 'warm'].append(seconds)
+    return cold
+
+
+def _summary(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {'n': len(values), 'mean_ms': round(sum(values) / len(values) * 1000, 1),
+            'p50_ms': round(values[len(values) // 2] * 1000, 1), 'p95_ms': round(values[int(len(values) * 0.95)] * 1000, 1)}
+
+
+def latency_summary():
+    '''per model family: latency of cold and warm requests made by this process'''
+    with _lock:
+        return {family: {'cold': _summary(latencies['cold']), 'warm': _summary(latencies['warm'])} for family, latencies in _latencies.items()}
+
+
+@contextmanager
+def timed_request(model_family, client):
+    '''time one request of `client` into the latency metrics; yields a dict that gets 'seconds' and 'cold' on success'''
+    timing = {}
+    connections = open_connections(client)
+    start = time.perf_counter()
+    yield timing
+    timing['seconds'] = time.perf_counter() - start
+    after = open_connections(client)
+    new_connections = after - connections if after is not None and connections is not None else None
+    timing['cold'] = record_latency(model_family, client, timing['seconds'], new_connections)
+    logging.debug(f"{model_family} request: {timing['seconds'] * 1000:.0f} ms ({'cold' if timing['cold'] else 'warm'})")
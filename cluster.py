@@ -0,0 +1,225 @@
+import os
+import csv
+import time
+import logging
+import threading
+from multiprocessing.managers import BaseManager
+from job_queue import JobQueue
+from durations import DurationStore
+from paths import PathManager
+from rate_limiter import RateLimitScheduler, ADDRESS_ENV, AUTHKEY_ENV
+from eva_models import append_result_rows
+
+'''
+Multi-node evaluation: one coordinator, any number of worker hosts.
+
+The coordinator (main.py --coordinator HOST:PORT) enumerates the grid into its job queue and serves it over TCP.
+Workers (main.py --join HOST:PORT --shard i/N) lease jobs from it, run them with their local executor and send
+the history and result rows of every finished job back, so the coordinator ends up with the single results/ and
+history/ tree. Workers keep their own copies under --output_root.
+
+    * shards are deterministic: job_queue.shard_key hashes (model, thinking, black-box, run), and a worker on shard i
+      of N takes those jobs first before helping with the rest
+    * leases, retries and resuming a killed grid come from the job queue, a worker that dies just lets its leases expire
+    * the coordinator also serves the rate-limit scheduler, so provider quotas are shared by the whole cluster
+
+If all hosts share a filesystem, a plain --job_queue on that filesystem works as well: every launcher drains the same
+SQLite file and writes straight into the shared results/ and history/.
+'''
+
+CLUSTER_POLL_SECONDS = 10
+
+
+class Coordinator:
+    def __init__(self, queue_path, settings):
+        self.queue = JobQueue(queue_path)
+        self.settings = settings
+        self.paths = PathManager()
+        self.durations = DurationStore()
+        self.done = set()
+        self.lock = threading.Lock()
+
+    def lease_seconds(self):
+        return self.queue.lease_seconds
+
+    def claim(self, owner, shard=0, num_shards=1):
+        jobs = self.queue.claim(owner, shard=shard, num_shards=num_shards)
+        for job in jobs:
+            job.update(self.settings)
+        return jobs
+
+    def renew(self, owner):
+        self.queue.renew(owner)
+
+    def complete(self, job_id, owner, return_code, error='', outputs=None):
+        '''record the outcome and, for a successful job, write the history and result rows it sent back'''
+        status = self.queue.complete(job_id, owner, return_code, error)
+        if status == 'done' and outputs:
+            with self.lock:
+                # a job whose lease expired may be finished by two workers, only keep the first copy
+                if job_id in self.done:
+                    return status
+                self.done.add(job_id)
+            for relative_path, history in outputs.get('history', {}).items():
+                history_file = self.paths.history_path / relative_path
+                os.makedirs(os.path.dirname(history_file), exist_ok=True)
+                with open(history_file, 'w', encoding='utf-8') as f:
+                    f.write(history)
+            for relative_path, rows in outputs.get('results', {}).items():
+                append_result_rows(self.paths.result_path / relative_path, rows)
+            if outputs.get('session'):
+                session = outputs['session']
+                self.durations.record(session['model_name'], session['thinking_mode'], session['task'], session['difficulty'],
+                                      session['task_id'], session['seconds'])
+        logging.info(f"Job {job_id} from {owner}: {status}")
+        return status
+
+    def reclaim_wait(self):
+        return self.queue.reclaim_wait()
+
+    def fail_exhausted(self):
+        return self.queue.fail_exhausted()
+
+    def counts(self):
+        return self.queue.counts()
+
+
+_coordinator = None
+_scheduler = None
+
+
+def _init_coordinator(queue_path, settings, limits):
+    global _coordinator, _scheduler
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    _coordinator = Coordinator(queue_path, settings)
+    _scheduler = RateLimitScheduler(limits)
+
+
+def _get_coordinator():
+    return _coordinator
+
+
+def _get_scheduler():
+    return _scheduler
+
+
+class ClusterManager(BaseManager):
+    pass
+
+
+# `get_scheduler` is the typeid rate_limiter.SchedulerManager asks for, so workers use this server as their scheduler too
+ClusterManager.register('get_coordinator', callable=_get_coordinator)
+ClusterManager.register('get_scheduler', callable=_get_scheduler)
+
+
+def parse_address(address):
+    '''"host:port" -> (host, port)'''
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def parse_shard(spec):
+    '''"2/8" -> (2, 8), shards are numbered from 0'''
+    if spec is None:
+        return 0, 1
+    shard, num_shards = (int(part) for part in spec.split('/'))
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"Invalid shard {spec}, expected i/N with 0 <= i < N")
+    return shard, num_shards
+
+
+def start_coordinator(address, authkey, queue_path, settings, limits=None):
+    '''serve the job queue and the rate-limit scheduler on `address`; returns the started manager'''
+    manager = ClusterManager(address=parse_address(address), authkey=authkey.encode('utf-8'))
+    manager.start(initializer=_init_coordinator, initargs=(queue_path, settings, limits))
+    host, port = manager.address
+    # sessions started on the coordinator host share the same scheduler
+    os.environ[ADDRESS_ENV] = f"{host}:{port}"
+    os.environ[AUTHKEY_ENV] = authkey.encode('utf-8').hex()
+    logging.info(f"Coordinator serving {queue_path} on {host}:{port}")
+    return manager
+
+
+def wait_for_cluster(manager, poll_seconds=CLUSTER_POLL_SECONDS):
+    '''block until no job is pending or running any more'''
+    coordinator = manager.get_coordinator()
+    while True:
+        coordinator.fail_exhausted()    # a worker that died on a job's last attempt leaves it running until its lease expires
+        counts = coordinator.counts()
+        logging.info(f"Cluster progress: {counts}")
+        if not counts.get('pending') and not counts.get('running'):
+            return counts
+        time.sleep(poll_seconds)
+
+
+class RemoteQueue:
+    '''
+    The worker side: the JobQueue interface drain_job_queue expects, backed by the coordinator.
+    `result_dir_name(job)` gives the folder name the platform uses for the model (api name, plus _thinking).
+    '''
+    def __init__(self, address, authkey, result_dir_name, shard=0, num_shards=1):
+        self.path = address
+        self.shard = shard
+        self.num_shards = num_shards
+        self.result_dir_name = result_dir_name
+        self.paths = PathManager()
+        self.jobs = {}
+        self.local = threading.local()
+        self.address = parse_address(address)
+        self.authkey = authkey.encode('utf-8')
+        self.lease_seconds = self._coordinator().lease_seconds()
+
+    def _coordinator(self):
+        '''one connection per thread, proxies must not be shared between threads'''
+        if getattr(self.local, 'coordinator', None) is None:
+            manager = ClusterManager(address=self.address, authkey=self.authkey)
+            manager.connect()
+            self.local.coordinator = manager.get_coordinator()
+        return self.local.coordinator
+
+    def claim(self, owner, limit=1):
+        jobs = self._coordinator().claim(owner, self.shard, self.num_shards)
+        for job in jobs:
+            self.jobs[job['id']] = dict(job, claimed_at=time.time())
+        return jobs
+
+    def renew(self, owner):
+        self._coordinator().renew(owner)
+
+    def job_outputs(self, job):
+        '''history file and result rows this job left under the local output root'''
+        name = self.result_dir_name(job)
+        job_dir = os.path.join(job['task'], job['difficulty'], job['task_id'])
+        outputs = {'history': {}, 'results': {}}
+        # the model name without _thinking is the api name the duration store is keyed by
+        outputs['session'] = {'model_name': name.replace('_thinking', ''), 'thinking_mode': job['thinking_mode'], 'task': job['task'],
+                              'difficulty': job['difficulty'], 'task_id': job['task_id'], 'seconds': time.time() - job['claimed_at']}
+        history_file = os.path.join(job_dir, job['model_family'], name, f"run_{job['run']}.json")
+        if os.path.exists(self.paths.history_path / history_file):
+            with open(self.paths.history_path / history_file, 'r', encoding='utf-8') as f:
+                outputs['history'][history_file] = f.read()
+        result_file = os.path.join(job_dir, name, 'result.csv')
+        if os.path.exists(self.paths.result_path / result_file):
+            with open(self.paths.result_path / result_file, 'r', newline='', encoding='utf-8') as f:
+                rows = [row for row in csv.reader(f) if len(row) > 4 and row[4] == f"run_{job['run']}"]
+            if rows:
+                outputs['results'][result_file] = rows[-1:]    # a retried job appends once per attempt, keep the latest
+        return outputs
+
+    def complete(self, job_id, owner, return_code, error=''):
+        job = self.jobs.pop(job_id)
+        outputs = self.job_outputs(job) if return_code == 0 else None
+        return self._coordinator().complete(job_id, owner, return_code, error, outputs)
+
+    def reclaim_wait(self):
+        return self._coordinator().reclaim_wait()
+
+    def counts(self):
+        return self._coordinator().counts()
+
+
+def join_cluster(address, authkey):
+    '''route this host's rate limiting through the coordinator'''
+    host, port = parse_address(address)
+    os.environ[ADDRESS_ENV] = f"{host}:{port}"
+    os.environ[AUTHKEY_ENV] = authkey.encode('utf-8').hex()
@@ -0,0 +1,129 @@
+import os
+import logging
+from functools import lru_cache
+
+'''
+Token-aware context management for the evaluation phase.
+
+ReasoningLLM.evaluate appends a question, the answer(s) and a "Let's move to next question." / "Ok." exchange to
+self.messages for every test sample, so with large test files every request resends all earlier Q&A. The
+ContextManager decides which messages are actually sent; self.messages and self.history are left untouched.
+
+Policies (main.py --context_policy, ORACLE_CONTEXT_POLICY):
+
+* full           send everything (the default, identical to earlier runs)
+* collapse_eval  drop completed evaluation questions from the request
+* budget         like full until the request exceeds --context_budget tokens, then drop the oldest completed
+                 evaluation questions until it fits
+
+Whatever the policy, the exploration transcript is never dropped, and neither is the first evaluation question:
+it carries the last exploration feedback of the session, which evaluate() merges into that question. Tasks that
+reset their messages per sample (puzzle, game) have no completed questions to drop.
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated at ~4 characters per token.
+'''
+
+CONTEXT_POLICY_ENV = 'ORACLE_CONTEXT_POLICY'
+CONTEXT_BUDGET_ENV = 'ORACLE_CONTEXT_BUDGET'
+POLICIES = ['full', 'collapse_eval', 'budget']
+DEFAULT_BUDGET = 100000
+
+NEXT_QUESTION = "Let's move to next question."
+
+
+def _load_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:   # not installed, or the encoding cannot be downloaded
+        return None
+
+
+_encoding = None
+_encoding_loaded = False
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text):
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding = _load_encoding()
+        _encoding_loaded = True
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def message_text(message):
+    '''the text of a message in any family's shape (gemini Content, llama content parts, plain dicts)'''
+    if hasattr(message, 'parts'):
+        return ''.join(part.text or '' for part in message.parts or [])
+    content = message.get('content') if isinstance(message, dict) else message
+    if isinstance(content, list):
+        return ''.join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content)
+    return '' if content is None else str(content)
+
+
+def message_role(message):
+    return getattr(message, 'role', None) if not isinstance(message, dict) else message.get('role')
+
+
+class ContextManager:
+    def __init__(self, policy='full', budget=DEFAULT_BUDGET):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown context policy {policy}, expected one of {POLICIES}")
+        self.policy = policy
+        self.budget = budget
+        self.eval_start = None      # index in self.messages of the first evaluation question
+        self.dropped_tokens = 0     # tokens left out of requests so far
+        self._warned = False
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv(CONTEXT_POLICY_ENV, 'full'), int(os.getenv(CONTEXT_BUDGET_ENV, DEFAULT_BUDGET)))
+
+    def start_evaluation(self, messages):
+        '''called before the first evaluation question is appended; everything before it is exploration'''
+        if self.eval_start is None:
+            self.eval_start = len(messages)
+
+    def completed_questions(self, messages):
+        '''(start, end) ranges of finished evaluation questions after the first one, oldest first'''
+        if self.eval_start is None:
+            return []
+        ranges = []
+        start = self.eval_start
+        for i in range(self.eval_start, len(messages) - 1):
+            if message_role(messages[i]) == 'user' and message_text(messages[i]).rstrip().endswith(NEXT_QUESTION) \
+                    and message_role(messages[i + 1]) in ['assistant', 'model'] and message_text(messages[i + 1]).strip() == 'Ok.':
+                ranges.append((start, i + 2))
+                start = i + 2
+        return ranges[1:]
+
+    def window(self, messages):
+        '''the messages to send for the current request'''
+        if self.policy == 'full':
+            return messages
+        questions = self.completed_questions(messages)
+        if not questions:
+            return messages
+        if self.policy == 'budget':
+            total = sum(count_tokens(message_text(message)) for message in messages)
+            if total <= self.budget:
+                return messages
+            drop = []
+            for start, end in questions:
+                drop.append((start, end))
+                total -= sum(count_tokens(message_text(message)) for message in messages[start:end])
+                if total <= self.budget:
+                    break
+            if total > self.budget and not self._warned:
+                logging.warning(f"Context still over the {self.budget} token budget ({total}) after dropping past evaluation questions; exploration is kept in full")
+                self._warned = True
+        else:
+            drop = questions
+        dropped = set()
+        for start, end in drop:
+            dropped.update(range(start, end))
+        self.dropped_tokens += sum(count_tokens(message_text(messages[i])) for i in dropped)
+        return [message for i, message in enumerate(messages) if i not in dropped]
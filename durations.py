@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import logging
+from contextlib import contextmanager
+from paths import PathManager
+
+'''
+Historical session durations, used to start the longest jobs first.
+
+A grid is finished when its slowest worker is, so jobs are handed out longest-first (LPT): the long thinking-model and
+hard-task sessions start right away and the short ones fill the gaps at the end. Every successful session records its
+wall-clock time per (model, thinking, task, difficulty, task_id); a job that never ran is estimated from the average of
+the same task/difficulty/thinking combination, and failing that from DIFFICULTY_SECONDS and THINKING_FACTOR.
+'''
+
+DIFFICULTY_SECONDS = {'baseline': 30, 'easy': 60, 'medium': 150, 'hard': 400}
+DEFAULT_SECONDS = 150
+THINKING_FACTOR = 4
+SMOOTHING = 0.3     # weight of the newest duration in the moving average
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS durations (
+    model_name TEXT NOT NULL,
+    thinking_mode INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (model_name, thinking_mode, task, difficulty, task_id)
+);
+'''
+
+
+def fallback_seconds(difficulty, thinking_mode):
+    return DIFFICULTY_SECONDS.get(difficulty, DEFAULT_SECONDS) * (THINKING_FACTOR if thinking_mode else 1)
+
+
+class DurationStore:
+    def __init__(self, path=None):
+        self.path = str(path or PathManager().logs_path / 'durations.db')
+        self._estimates = None
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=60000')
+            yield conn
+        finally:
+            conn.close()
+
+    def record(self, model_name, thinking_mode, task, difficulty, task_id, seconds):
+        key = (model_name, int(bool(thinking_mode)), task, difficulty, task_id)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO durations VALUES (?, ?, ?, ?, ?, 1, ?) ON CONFLICT (model_name, thinking_mode, task, difficulty, task_id) DO UPDATE SET '
+                    'runs = runs + 1, seconds = seconds * ? + excluded.seconds * ?',
+                    key + (seconds, 1 - SMOOTHING, SMOOTHING)
+                )
+        except sqlite3.Error as e:   # ordering is an optimisation, never fail a session over it
+            logging.warning(f"Could not record the duration of {task}/{difficulty}/{task_id}: {e}")
+
+    def _load(self):
+        exact, grouped = {}, {}
+        with self._connect() as conn:
+            for model_name, thinking_mode, task, difficulty, task_id, runs, seconds in conn.execute('SELECT * FROM durations'):
+                exact[(model_name, thinking_mode, task, difficulty, task_id)] = seconds
+                grouped.setdefault((thinking_mode, task, difficulty), []).append(seconds)
+        return exact, {key: sum(values) / len(values) for key, values in grouped.items()}
+
+    def estimate(self, model_name, thinking_mode, task, difficulty, task_id):
+        '''expected seconds of one session; the table is read once per store'''
+        if self._estimates is None:
+            self._estimates = self._load()
+        exact, grouped = self._estimates
+        thinking_mode = int(bool(thinking_mode))
+        if (model_name, thinking_mode, task, difficulty, task_id) in exact:
+            return exact[(model_name, thinking_mode, task, difficulty, task_id)]
+        if (thinking_mode, task, difficulty) in grouped:
+            return grouped[(thinking_mode, task, difficulty)]
+        return fallback_seconds(difficulty, thinking_mode)
+
+    def longest_first(self, jobs, key):
+        '''jobs sorted by descending estimate; key(job) -> (model_name, thinking_mode, task, difficulty, task_id)'''
+        return sorted(jobs, key=lambda job: -self.estimate(*key(job)))
@@ -3,24 +3,56 @@ import importlib.util
 import sys
 import logging
 import os
-import random
-from openai import OpenAI
-from google import genai
-from google.genai import types
-from anthropic import Anthropic
 from dotenv import load_dotenv
 import json
 from paths import PathManager
 import copy
-from io import StringIO
 import ast
 import time
+import uuid
+import asyncio
 import csv
-import requests
-from ckpt import set_current_debug_target, reset_debugger_state
+from lazy_imports import LazyModule
+from ckpt import checkpoint_answers
+from answers import load_answers
+from sandbox import run_solution, SolutionError
+from sample_fork import game_sample_workers, map_samples
+from worker_pool import load_platform
+from async_engine import current_engine, offload
+from rate_limiter import get_scheduler, is_rate_limited, retry_after, RateLimited
+from clients import get_client, get_async_client, timed_request, openrouter_url, REQUEST_TIMEOUT
+from key_pool import get_pool, is_key_error, NoUsableEndpoint
+from response_cache import cached_completion, acached_completion
+from cassettes import record_exchange
+from context_window import ContextManager
+from adapters import get_adapter, user_message, assistant_message
+from resilience import call_with_deadline, acall_with_deadline, call_deadline, call_retries, hedge_delay, record_call_latency, is_transient, backoff
+from prompt_cache import prompt_cache_enabled, anthropic_breakpoints, openai_cache_key, GeminiPrefixCache, split_input_tokens
+from streaming import StreamCollector, stream_completion, astream_completion, streaming_enabled, early_stop_enabled, EARLY_STOP_PREDICATES
+
+# provider SDKs are imported on first use (clients.py), so a session only pays for the SDK of its own model family
+types = LazyModule('google.genai.types')
 
 load_dotenv(override=True)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAX_RATE_LIMIT_RETRIES = 8
+RESULT_HEADER = ['difficulty', 'task_id', 'model_family', 'model_name', 'run_times', 'max_turns', 'failure_num', 'num_correct', 'total_samples', 'accuracy']
+
+def append_result_rows(result_file, rows):
+    '''append rows to a result.csv, writing the header first if the file is new'''
+    # several runs of the same black-box may finish at the same time (--workers, cluster), so both steps must tolerate a concurrent writer
+    os.makedirs(os.path.dirname(result_file), exist_ok=True)
+    if not os.path.exists(result_file):
+        try:
+            with open(result_file, "x", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(RESULT_HEADER)
+        except FileExistsError:
+            pass
+    with open(result_file, 'a', newline="", encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
     
 def dynamic_import(module_path, module_name):
     if not os.path.exists(module_path):
@@ -50,6 +82,7 @@ class ReasoningLLM:
         self.eva_mode = eva_mode
         self.eva_nums = n_runs
         self.mode = mode  # generate or evaluate
+        self.session_id = uuid.uuid4().hex  # used by the rate-limit scheduler to share quota fairly between sessions
 
         with open(self.paths.task_path / task / 'player_system_prompt') as f:
             self.system_prompt = f.read()  # system prompt for each task
@@ -67,56 +100,33 @@ class ReasoningLLM:
                     description=information['description'],
                 )
 
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.claude_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        self.qwen_client = OpenAI(api_key=os.getenv("ALIBABA_API_KEY"), base_url="https://dashscope.aliyuncs.com/compatible-mode/v1")
-        self.deepseek_client = OpenAI(api_key=os.getenv("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com")
-        openrouter = os.getenv("OPENROUTER_API_KEY")
-        self.headers = {
-                "Authorization": f"Bearer {openrouter}",
+        self.turn_latencies = []    # (seconds, cold) of every request of this session
+        self.turn_streams = []      # time to first token, tokens/sec and early stop of every streamed turn (--stream)
+        self.evaluating = False     # set by evaluate(); answers are never cut short by an early stop while scoring
+        self.turn_prompt_tokens = []    # (cached, uncached) input tokens of every request the provider reported them for
+        self.gemini_prompt_cache = None
+        self.call_events = []       # retries and hedges of the current call, kept in the history metadata of its answer
+        self.context = ContextManager.from_env()    # which messages are sent once evaluation questions pile up (--context_policy)
+        self.key_pool = get_pool(model_family)
+        self.endpoint = self.key_pool.pick()    # kept for the whole session so provider prompt caches stay warm, replaced when its key fails
+
+        # self.messages is the canonical conversation sent to the model, converted to the provider's format by self.adapter (see adapters.py)
+        self.adapter = get_adapter(model_family, model_name)
+        self.messages = self.adapter.opening(self.system_prompt, self.task_intro)
+        self.history = [dict(message) for message in self.messages]     # self.history output the complete interaction history, while self.messages filter some error messages
+
+    '''clients are shared by all sessions of the process that use the same endpoint (see clients.py) and built on the first request'''
+    @property
+    def client(self):
+        return get_client(self.model_family, self.endpoint)
+
+    @property
+    def headers(self):
+        return {
+                "Authorization": f"Bearer {self.endpoint.api_key or os.getenv('OPENROUTER_API_KEY')}",
                 "Content-Type": "application/json"
             }
 
-        if model_family == 'gpt':
-            self.client = self.openai_client
-            self.messages = [{"role": "developer", "content": self.system_prompt},
-                             {"role": "user", "content": self.task_intro},
-                             {"role": "assistant", "content": 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'}]
-            self.history =  copy.deepcopy(self.messages)     # self.history output the complete interaction history, while self.messages filter some error messages
-        elif model_family == 'claude':
-            self.client = self.claude_client
-            self.messages = [{"role": "user", "content": self.task_intro},
-                             {"role": "assistant", "content": 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'}]
-            self.history =  copy.deepcopy(self.messages)
-        elif model_family == 'gemini':
-            self.client = self.gemini_client
-            self.messages = [types.Content(role="user", parts=[types.Part.from_text(text=self.task_intro)]),
-                             types.Content(role="model", parts=[types.Part.from_text(text='I understand the rules. I will not output any unrelated text! Let us start the interaction.')])]
-            self.history =  [{"role": "user", "content": self.task_intro},
-                             {"role": "assistant", "content": 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'}]
-        elif model_family == 'qwen':
-            self.client = self.qwen_client
-            self.messages = [{"role": "system", "content": self.system_prompt},
-                             {"role": "user", "content": self.task_intro},
-                             {"role": "assistant", "content": 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'}]
-            self.history =  copy.deepcopy(self.messages)
-        elif model_family == 'deepseek':
-            self.client = self.deepseek_client
-            if self.model_name == 'deepseek-r1':
-                self.messages = [{"role": "user", "content": self.task_intro},
-                                {"role": "assistant", "content": 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'}]
-            else:
-                self.messages = [{"role": "system", "content": self.system_prompt},
-                                {"role": "user", "content": self.task_intro},
-                                {"role": "assistant", "content": 'I understand the rules. I will not output any unrelated text! Let us start the interaction.'}]
-            self.history =  copy.deepcopy(self.messages)
-        elif model_family == 'llama':
-            self.messages = [{"role": "system", "content": [{"text": self.system_prompt}]},
-                             {"role": "user", "content": [{"text": self.task_intro}]},
-                             {"role": "assistant", "content": [{"text": "I understand the rules. I will not output any unrelated text! Let us start the interaction."}]}]
-            self.history =  copy.deepcopy(self.messages)
-
     def save_result(self, output_dir, result):
         if self.mode == 'generate':
             pass
@@ -126,19 +136,9 @@ class ReasoningLLM:
             else:
                 name = self.model_name
 
-            if not os.path.exists(os.path.join(output_dir, self.task, self.difficulty, self.task_id, name)):
-                os.makedirs(os.path.join(output_dir, self.task, self.difficulty, self.task_id, name))
-                
-            if not os.path.exists(os.path.join(output_dir, self.task, self.difficulty, self.task_id, name, 'result.csv')):
-                header = ['difficulty', 'task_id', 'model_family', 'model_name', 'run_times', 'max_turns', 'failure_num', 'num_correct', 'total_samples', 'accuracy']
-                with open(os.path.join(output_dir, self.task, self.difficulty, self.task_id, name, 'result.csv'), "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(header)
-
-            with open(os.path.join(output_dir, self.task, self.difficulty, self.task_id, name, 'result.csv'), 'a', newline="", encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerows(result)
-                logging.info(f"Results saved to {os.path.join(output_dir, self.task, self.difficulty, self.task_id, name, 'result.csv')}")
+            result_file = os.path.join(output_dir, self.task, self.difficulty, self.task_id, name, 'result.csv')
+            append_result_rows(result_file, result)
+            logging.info(f"Results saved to {result_file}")
 
     def save_history(self, output_dir, version):
         if self.mode == 'generate':
@@ -153,160 +153,177 @@ class ReasoningLLM:
             logging.info("Saving evaluation history...")
 
             if self.thinking_mode:
-                if not os.path.exists(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name+'_thinking')):
-                    os.makedirs(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name+'_thinking'))
+                os.makedirs(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name+'_thinking'), exist_ok=True)
                 with open(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name+'_thinking', f'run_{version}.json'), 'w', encoding='utf-8') as f:
                     json.dump(self.history, f, ensure_ascii=False, indent=4)
             else:
-                if not os.path.exists(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name)):
-                    os.makedirs(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name))
+                os.makedirs(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name), exist_ok=True)
                 with open(os.path.join(output_dir, self.task, self.difficulty, self.task_id, self.model_family, self.model_name, f'run_{version}.json'), 'w', encoding='utf-8') as f:
                     json.dump(self.history, f, ensure_ascii=False, indent=4)
 
-    def normal_output(self, input):
+            if self.turn_latencies:
+                cold = [seconds for seconds, is_cold in self.turn_latencies if is_cold]
+                warm = [seconds for seconds, is_cold in self.turn_latencies if not is_cold]
+                logging.info(f"Session latency: {len(self.turn_latencies)} requests, {len(cold)} cold ({sum(cold) / max(len(cold), 1):.2f}s on average), "
+                             f"{len(warm)} warm ({sum(warm) / max(len(warm), 1):.2f}s on average)")
+            if self.context.dropped_tokens:
+                logging.info(f"Session context ({self.context.policy}): {self.context.dropped_tokens} tokens of past evaluation questions left out of requests")
+            if self.turn_prompt_tokens:
+                cached = sum(tokens for tokens, _ in self.turn_prompt_tokens)
+                total = cached + sum(tokens for _, tokens in self.turn_prompt_tokens)
+                logging.info(f"Session prompt cache: {cached} of {total} input tokens cached ({cached / max(total, 1):.0%}) over {len(self.turn_prompt_tokens)} requests")
+            if self.turn_streams:
+                ttfts = [turn['ttft'] for turn in self.turn_streams if turn['ttft'] is not None]
+                rates = [turn['tokens_per_sec'] for turn in self.turn_streams if turn['tokens_per_sec'] is not None]
+                logging.info(f"Session streaming: {len(self.turn_streams)} turns, time to first token {sum(ttfts) / max(len(ttfts), 1):.2f}s, "
+                             f"{sum(rates) / max(len(rates), 1):.1f} tokens/s on average, {sum(turn['early_stop'] for turn in self.turn_streams)} stopped early")
+
+    def _log_exchange(self, user_text, assistant_text):
+        '''append a scripted user / assistant exchange to both self.messages and self.history'''
+        for message in [user_message(user_text), assistant_message(assistant_text)]:
+            self.messages.append(message)
+            self.history.append(dict(message))
+
+    '''a copy of the session that plays one test sample on its own (see sample_fork.py), starting from `messages`: own conversation, adapter, history and per-call state, same client, endpoint and rate-limit session'''
+    def fork(self, messages):
+        fork = copy.copy(self)
+        fork.messages = list(messages)     # shallow: log entries are never changed in place
+        fork.history = []
+        fork.call_events = []
+        fork.turn_latencies, fork.turn_streams, fork.turn_prompt_tokens = [], [], []
+        fork.adapter = get_adapter(self.model_family, self.model_name)     # the adapter caches the wire messages of the last request
+        fork.context = copy.copy(self.context)
+        fork.context.dropped_tokens = 0
+        fork.gemini_prompt_cache = None     # cached content is rewritten as the conversation grows, so it is not shared between threads
+        return fork
+
+    '''append the history and request statistics of a finished fork to this session'''
+    def merge_fork(self, fork):
+        self.history.extend(fork.history)
+        self.turn_latencies.extend(fork.turn_latencies)
+        self.turn_streams.extend(fork.turn_streams)
+        self.turn_prompt_tokens.extend(fork.turn_prompt_tokens)
+        self.context.dropped_tokens += fork.context.dropped_tokens
+
+    '''the wire messages the context policy sends (see context_window.py)'''
+    def _context_messages(self):
+        if self.evaluating:
+            self.context.start_evaluation(self.messages[:-1])     # the newest message is the first evaluation question
+        return self.context.window(self.adapter.wire(self.messages))
+
+    '''keyword arguments of the provider request for the current self.messages'''
+    def _request_kwargs(self):
+        messages = self._context_messages()
         if self.model_family == 'gpt':
-            self.messages.append({"role": "user", "content": str(input)})
-            self.history.append({"role": "user", "content": str(input)})
             if 'gpt' in self.model_name:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    temperature=0,
-                    max_tokens=500,
-                )
-                response = response.choices[0].message.content
+                return dict(model=self.model_name, messages=messages, temperature=0, max_tokens=500)
             else:   # for o-series models
-                response = self.client.responses.create(
-                    model=self.model_name,
-                    input=self.messages,
-                    reasoning={"effort": "medium"},
-                )
-                response = response.output_text
-            self.messages.append({"role": "assistant", "content": response})
-            self.history.append({"role": "assistant", "content": response})
+                return dict(model=self.model_name, input=messages, reasoning={"effort": "medium"})
 
         elif self.model_family == 'claude':
             if self.thinking_mode == False:
-                self.messages.append({"role": "user", "content": str(input)})
-                self.history.append({"role": "user", "content": str(input)})
-                response = self.client.messages.create(
-                    model=self.model_name,
-                    system = self.system_prompt,
-                    messages=self.messages,
+                return dict(model=self.model_name, system=self.system_prompt, messages=messages, temperature=0, max_tokens=500)
+            else:
+                return dict(model=self.model_name, system=self.system_prompt, messages=messages, max_tokens=20500,
+                            thinking={"type": "enabled", "budget_tokens": 20000})
+
+        elif self.model_family == 'gemini':
+            if '2.5' in self.model_name:
+                if self.thinking_mode:
+                    config = types.GenerateContentConfig(
+                        thinking_config=types.ThinkingConfig(thinking_budget=-1, include_thoughts=True),
+                        system_instruction=self.system_prompt,
+                    )
+                else:
+                    config = types.GenerateContentConfig(
+                        thinking_config=types.ThinkingConfig(thinking_budget=0),
+                        system_instruction=self.system_prompt,
+                        temperature=1,
+                    )
+            else:
+                config = types.GenerateContentConfig(
+                    system_instruction=self.system_prompt,
                     temperature=0,
-                    max_tokens=500
+                    max_output_tokens=500,
                 )
+            return dict(model=self.model_name, config=config, contents=messages)
+
+        elif self.model_family == 'qwen':
+            # no reasoning 
+            if self.thinking_mode == False:
+                return dict(model=self.model_name, messages=messages, extra_body={"enable_thinking": False}, temperature=0, max_tokens=500)
+            # reasoning
+            else:
+                return dict(model=self.model_name, messages=messages, extra_body={"enable_thinking": True, "thinking_budget": 20000},
+                            stream=True, max_tokens=500)
+
+        elif self.model_family == 'deepseek':
+            if 'reasoner' in self.model_name:
+                return dict(model=self.model_name, messages=messages)  # max_tokens=2200
+            else:
+                return dict(model=self.model_name, messages=messages, temperature=0, max_tokens=500)
+
+        elif self.model_family == 'llama':
+            return {
+                "model": self.model_name,
+                "messages": messages,
+                "provider":{
+                    "order": [
+                        'lambda/fp8'
+                    ]
+                },
+                "max_tokens": 500,
+                "temperature": 0
+            }
+
+    '''turn the provider response into (response text, list of thinking texts to record in self.history)'''
+    def _parse_response(self, response):
+        if isinstance(response, StreamCollector):
+            if self.model_family == 'claude' or (self.model_family == 'gemini' and '2.5' in self.model_name):
+                return response.result(empty_response=f'{self.model_family} did not return any response')
+            return response.result()
+        thoughts = []
+        if self.model_family == 'gpt':
+            if 'gpt' in self.model_name:
+                response_content = response.choices[0].message.content
+            else:
+                response_content = response.output_text
+
+        elif self.model_family == 'claude':
+            response_content = 'claude did not return any response'
+            if self.thinking_mode == False:
                 if response.content and len(response.content) > 0:
-                    response = response.content[0].text
-                else:
-                    response = 'claude did not return any response'
-                self.messages.append({"role": "assistant", "content": response})
-                self.history.append({"role": "assistant", "content": response})
+                    response_content = response.content[0].text
             else:
-                self.messages.append({"role": "user", "content": str(input)})
-                self.history.append({"role": "user", "content": str(input)})
-                response = self.client.messages.create(
-                    model=self.model_name,
-                    system = self.system_prompt,
-                    messages=self.messages,
-                    max_tokens=20500,
-                    thinking={
-                        "type": "enabled",
-                        "budget_tokens": 20000,
-                    }
-                )
                 thinking_content = ''
-                response_content = 'claude did not return any response'
-
                 for block in response.content:
                     if block.type == 'thinking':
                         thinking_content = block.thinking
                     elif block.type == 'text':
                         response_content = block.text
-                self.messages.append({"role": "assistant", "content": response_content})
                 if thinking_content != '':
-                    self.history.append({"role": "thinking_assistant", "content": thinking_content})
-                self.history.append({"role": "assistant", "content": response_content})
-                response = response_content 
+                    thoughts.append(thinking_content)
 
         elif self.model_family == 'gemini':
-            self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text=str(input))]))
-            self.history.append({"role": "user", "content": str(input)})
-            if '2.5' in self.model_name:
-                if self.thinking_mode:
-                    response = self.client.models.generate_content(
-                        model=self.model_name,
-                        config=types.GenerateContentConfig(
-                            thinking_config=types.ThinkingConfig(thinking_budget=-1, include_thoughts=True),
-                            system_instruction=self.system_prompt,
-                        ),
-                        contents=self.messages
-                    )
-                    response_content = 'gemini did not return any response'
-                    for part in response.candidates[0].content.parts:
-                        if not part.text:
-                            continue
-                        if part.thought:
-                            thinking_content = part.text
-                            self.history.append({"role": "thinking_assistant", "content": thinking_content})
-                        else:
-                            response_content = part.text
-                    self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text=response_content)]))
-                    self.history.append({"role": "assistant", "content": response_content})
-                    response = response_content
-                else:
-                    response = self.client.models.generate_content(
-                        model=self.model_name,
-                        config=types.GenerateContentConfig(
-                            thinking_config=types.ThinkingConfig(thinking_budget=0),
-                            system_instruction=self.system_prompt,
-                            temperature=1,
-                        ),
-                        contents=self.messages
-                    )
-                    response = response.text
-                    if response is None:
-                        response = 'gemini did not return any response'
-                    self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text=response)]))
-                    self.history.append({"role": "assistant", "content": response})
+            if '2.5' in self.model_name and self.thinking_mode:
+                response_content = 'gemini did not return any response'
+                for part in response.candidates[0].content.parts:
+                    if not part.text:
+                        continue
+                    if part.thought:
+                        thoughts.append(part.text)
+                    else:
+                        response_content = part.text
             else:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self.system_prompt,
-                        temperature=0,
-                        max_output_tokens=500,
-                    ),
-                    contents=self.messages
-                )
-                response = response.text
-                self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text=response)]))
-                self.history.append({"role": "assistant", "content": response})
+                response_content = response.text
+                if response_content is None and '2.5' in self.model_name:
+                    response_content = 'gemini did not return any response'
 
         elif self.model_family == 'qwen':
-            self.messages.append({"role": "user", "content": str(input)})
-            self.history.append({"role": "user", "content": str(input)})
-            # no reasoning 
             if self.thinking_mode == False:
-                response = self.client.chat.completions.create(
-                        model=self.model_name,
-                        messages=self.messages,
-                        extra_body={"enable_thinking": False},
-                        temperature=0,
-                        max_tokens=500,
-                    )
-                response = response.choices[0].message.content
-                self.messages.append({"role": "assistant", "content": response})
-                self.history.append({"role": "assistant", "content": response})
-            # reasoning
+                response_content = response.choices[0].message.content
             else:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    extra_body={"enable_thinking": True, "thinking_budget": 20000},
-                    stream=True,
-                    max_tokens=500,
-                )
+                # response is the list of streamed chunks
                 reasoning_content = ""
                 response_content = ""
                 for chunk in response:
@@ -315,66 +332,332 @@ class ReasoningLLM:
                         reasoning_content += delta.reasoning_content
                     if hasattr(delta, "content") and delta.content:
                         response_content += delta.content
-
-                self.messages.append({"role": "assistant", "content": response_content})
-                self.history.append({"role": "thinking_assistant", "content": reasoning_content})
-                self.history.append({"role": "assistant", "content": response_content})
-                response = response_content
+                thoughts.append(reasoning_content)
 
         elif self.model_family == 'deepseek':
-            self.messages.append({"role": "user", "content": str(input)})
-            self.history.append({"role": "user", "content": str(input)})
             if 'reasoner' in self.model_name:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    # max_tokens=2200,
-                )
-                reasoning_content = response.choices[0].message.reasoning_content
-                response = response.choices[0].message.content
-                self.history.append({"role": "thinking_assistant", "content": reasoning_content})
-                self.messages.append({"role": "assistant", "content": response})
-                self.history.append({"role": "assistant", "content": response})
+                thoughts.append(response.choices[0].message.reasoning_content)
+            response_content = response.choices[0].message.content
+
+        elif self.model_family == 'llama':
+            response_content = response['choices'][0]['message']['content']
+
+        return response_content, thoughts
+
+    def _send_request(self, request):
+        if self.model_family == 'gpt':
+            if 'gpt' in self.model_name:
+                response = self.client.chat.completions.create(**request)
             else:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    temperature=0,
-                    max_tokens=500,
-                )
-                response = response.choices[0].message.content
-                self.messages.append({"role": "assistant", "content": response})
-                self.history.append({"role": "assistant", "content": response})
+                response = self.client.responses.create(**request)
+        elif self.model_family == 'claude':
+            response = self.client.messages.create(**request)
+        elif self.model_family == 'gemini':
+            response = self.client.models.generate_content(**request)
+        elif self.model_family == 'qwen':
+            response = self.client.chat.completions.create(**request)
+            if request.get('stream'):
+                response = [chunk for chunk in response]
+        elif self.model_family == 'deepseek':
+            response = self.client.chat.completions.create(**request)
+        elif self.model_family == 'llama':
+            response = self.client.post(openrouter_url(), data=json.dumps(request), headers=self.headers, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 429:
+                raise RateLimited(f"OpenRouter rate limited {self.model_name}", retry_after(response))
+            if response.status_code >= 500:
+                response.raise_for_status()     # transient, retried by _call_provider
+            response = response.json()
+        return response
 
+    '''predicate that ends a streamed answer early (--early_stop), None when the whole answer is needed'''
+    def _early_stop(self):
+        if not early_stop_enabled() or self.evaluating:
+            return None
+        return EARLY_STOP_PREDICATES.get(self.task)
+
+    '''name of the early-stop predicate that may cut the answer, None when the whole answer is requested'''
+    def _stop_policy(self):
+        stop = self._early_stop() if streaming_enabled() else None
+        return stop.__name__ if stop is not None else None
+
+    def _stream_request(self, request):
+        collector = stream_completion(self.model_family, self.model_name, self.client, request, self.headers, self._early_stop())
+        self._record_stream(collector)
+        return collector
+
+    async def _astream_request(self, request):
+        collector = await astream_completion(self.model_family, self.model_name, self.async_client, request, self.headers, self._early_stop())
+        self._record_stream(collector)
+        return collector
+
+    def _record_stream(self, collector):
+        metrics = collector.metrics()
+        self.turn_streams.append(metrics)
+        logging.debug(f"{self.model_family} stream: first token after {metrics['ttft']}s, {metrics['output_tokens']} tokens in {metrics['seconds']:.2f}s"
+                      f"{', stopped early' if metrics['early_stop'] else ''}")
+
+    async def _asend_request(self, request):
+        client = self.async_client
+        if self.model_family == 'gpt':
+            if 'gpt' in self.model_name:
+                response = await client.chat.completions.create(**request)
+            else:
+                response = await client.responses.create(**request)
+        elif self.model_family == 'claude':
+            response = await client.messages.create(**request)
+        elif self.model_family == 'gemini':
+            response = await client.models.generate_content(**request)
+        elif self.model_family == 'qwen':
+            response = await client.chat.completions.create(**request)
+            if request.get('stream'):
+                response = [chunk async for chunk in response]
+        elif self.model_family == 'deepseek':
+            response = await client.chat.completions.create(**request)
         elif self.model_family == 'llama':
-            self.messages.append({"role": "user", "content": [{"text": str(input)}]})
-            self.history.append({"role": "user", "content": str(input)})
-            payload = {
-                "model": self.model_name,
-                "messages": self.messages,
-                "provider":{
-                    "order": [
-                        'lambda/fp8'
-                    ]
-                },
-                "max_tokens": 500,
-                "temperature": 0
-            }
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", data=json.dumps(payload), headers=self.headers)
+            response = await client.post(openrouter_url(), content=json.dumps(request), headers=self.headers)
+            if response.status_code == 429:
+                raise RateLimited(f"OpenRouter rate limited {self.model_name}", retry_after(response))
+            if response.status_code >= 500:
+                response.raise_for_status()     # transient, retried by _call_provider
             response = response.json()
-            response = response['choices'][0]['message']['content']
-            self.messages.append({"role": "assistant", "content": [{"text": str(response)}]})
+        return response
+
+    '''rough token count of the next request (prompt + completion budget), used to reserve tokens-per-minute quota'''
+    def _estimate_tokens(self, request):
+        text_length = 0
+        for message in self.messages:
+            text_length += len(str(message['content']))
+        text_length += len(self.system_prompt)
+        return text_length // 4 + request.get('max_tokens', 1000)
+
+    '''total tokens the provider reports for a response, None if unknown (e.g. streamed qwen responses)'''
+    def _token_usage(self, response):
+        if isinstance(response, StreamCollector):
+            return response.total_tokens
+        if self.model_family == 'llama':
+            return (response.get('usage') or {}).get('total_tokens')
+        if isinstance(response, list):
+            return None
+        if self.model_family == 'claude':
+            usage = getattr(response, 'usage', None)
+            return usage.input_tokens + usage.output_tokens if usage is not None else None
+        if self.model_family == 'gemini':
+            return getattr(getattr(response, 'usage_metadata', None), 'total_token_count', None)
+        return getattr(getattr(response, 'usage', None), 'total_tokens', None)
+
+    def _call_model(self):
+        '''send self.messages to the provider, returns (response text, thinking texts); deterministic requests may be answered by the response cache, every exchange is recorded with --record_cassettes'''
+        request = self._request_kwargs()
+        self.call_events = []
+        response, thoughts = cached_completion(self.model_family, request, lambda: list(self._call_provider(request)), self._stop_policy())
+        record_exchange(self.model_family, request, response, thoughts)
+        return response, thoughts
+
+    def _call_provider(self, request):
+        '''send the request through the rate-limit scheduler, within the call deadline and retrying transient failures (see resilience.py)'''
+        scheduler = get_scheduler()
+        estimated_tokens = self._estimate_tokens(request)
+        plain_request, request = request, self._prompt_cached(request)
+        send = (lambda: self._stream_request(request)) if streaming_enabled() else (lambda: self._send_request(request))
+        acquire = lambda: scheduler.acquire(self.model_family, self.session_id, estimated_tokens)
+        rate_limited = failures = 0
+        while True:
+            acquire()
+            try:
+                with timed_request(self.model_family, self.client) as timing:
+                    response = call_with_deadline(send, call_deadline(), hedge_delay(self.model_name), self.call_events, acquire)
+                self.turn_latencies.append((timing['seconds'], timing['cold']))
+            except Exception as e:
+                if self._switch_endpoint(e):
+                    request = self._prompt_cached(plain_request)    # gemini cached content belongs to the old key
+                    continue
+                delay = self._retry_wait(e, rate_limited, failures)
+                if delay is None:
+                    raise
+                if is_rate_limited(e):
+                    rate_limited += 1
+                    scheduler.on_rate_limited(self.model_family, retry_after(e))
+                else:
+                    failures += 1
+                    time.sleep(delay)
+                continue
+            self.key_pool.report_success(self.endpoint)
+            record_call_latency(self.model_name, timing['seconds'])
+            scheduler.record(self.model_family, estimated_tokens, self._token_usage(response))
+            self._record_prompt_tokens(response)
+            return self._parse_response(response)
+
+    async def _acall_model(self):
+        request = self._request_kwargs()
+        self.call_events = []
+        response, thoughts = await acached_completion(self.model_family, request, lambda: self._acall_provider(request), self._stop_policy())
+        record_exchange(self.model_family, request, response, thoughts)
+        return response, thoughts
+
+    async def _acall_provider(self, request):
+        scheduler = get_scheduler()
+        estimated_tokens = self._estimate_tokens(request)
+        plain_request = request
+        request = await self._aprompt_cached(plain_request)
+        send = (lambda: self._astream_request(request)) if streaming_enabled() else (lambda: self._asend_request(request))
+        # the scheduler blocks while waiting for quota, keep that off the event loop and off the session threads
+        acquire = lambda: offload(scheduler.acquire, self.model_family, self.session_id, estimated_tokens, pool='rate_limit')
+        rate_limited = failures = 0
+        while True:
+            await acquire()
+            try:
+                with timed_request(self.model_family, self.async_client) as timing:
+                    response = await acall_with_deadline(send, call_deadline(), hedge_delay(self.model_name), self.call_events, acquire)
+                self.turn_latencies.append((timing['seconds'], timing['cold']))
+            except Exception as e:
+                if self._switch_endpoint(e):
+                    request = await self._aprompt_cached(plain_request)
+                    continue
+                delay = self._retry_wait(e, rate_limited, failures)
+                if delay is None:
+                    raise
+                if is_rate_limited(e):
+                    rate_limited += 1
+                    scheduler.on_rate_limited(self.model_family, retry_after(e))
+                else:
+                    failures += 1
+                    await asyncio.sleep(delay)
+                continue
+            self.key_pool.report_success(self.endpoint)
+            record_call_latency(self.model_name, timing['seconds'])
+            scheduler.record(self.model_family, estimated_tokens, self._token_usage(response))
+            self._record_prompt_tokens(response)
+            return self._parse_response(response)
+
+    '''seconds to wait before retrying a failed call (0 for rate limits, the scheduler waits), None when it must not be retried; the decision is kept in self.call_events'''
+    def _retry_wait(self, error, rate_limited, failures):
+        if is_rate_limited(error) and rate_limited < MAX_RATE_LIMIT_RETRIES:
+            self.call_events.append({'event': 'rate_limited', 'retry': rate_limited + 1})
+            return 0
+        if not is_rate_limited(error) and is_transient(error) and failures < call_retries():
+            wait = backoff(failures + 1)
+            self.call_events.append({'event': 'retry', 'retry': failures + 1, 'error': repr(error)[:300], 'wait_seconds': round(wait, 2)})
+            logging.warning(f"{self.model_family} call failed ({error!r}), retry {failures + 1}/{call_retries()} in {wait:.1f}s")
+            return wait
+        self.call_events.append({'event': 'failed', 'error': repr(error)[:300]})
+        return None
+
+    '''report a failed call to the key pool (see key_pool.py); True when the key of the session's endpoint was removed and the session moved on to the next endpoint'''
+    def _switch_endpoint(self, error):
+        if not is_key_error(error):
+            if is_transient(error):
+                self.key_pool.report_failure(self.endpoint, error)     # benches the endpoint for new sessions after repeated failures
+            return False
+        self.key_pool.report_failure(self.endpoint, error)
+        removed = self.endpoint
+        try:
+            self.endpoint = self.key_pool.pick()
+        except NoUsableEndpoint as e:
+            self.call_events.append({'event': 'failed', 'error': repr(error)[:300]})
+            raise e from error
+        self.gemini_prompt_cache = None
+        self.call_events.append({'event': 'key_removed', 'endpoint': removed.name, 'next': self.endpoint.name, 'error': repr(error)[:300]})
+        return True
+
+    '''the request as sent, rewritten for provider prompt caching (see prompt_cache.py); the response cache and cassettes key on the plain request'''
+    def _prompt_cached(self, request):
+        if not prompt_cache_enabled():
+            return request
+        if self.model_family == 'claude':
+            return anthropic_breakpoints(request)
+        if self.model_family == 'gpt':
+            return openai_cache_key(request)
+        if self.model_family == 'gemini':
+            if self.gemini_prompt_cache is None:
+                self.gemini_prompt_cache = GeminiPrefixCache(self.model_name, self.client)
+            return self.gemini_prompt_cache.apply(request)
+        return request
+
+    async def _aprompt_cached(self, request):
+        # creating gemini cached content is a blocking call
+        return await offload(self._prompt_cached, request) if self.model_family == 'gemini' else self._prompt_cached(request)
+
+    def _record_prompt_tokens(self, response):
+        if isinstance(response, StreamCollector):
+            usage = response.input_usage
+        elif self.model_family == 'llama':
+            usage = response.get('usage')
+        elif isinstance(response, list):    # streamed qwen chunks, no usage requested
+            usage = None
+        elif self.model_family == 'gemini':
+            usage = getattr(response, 'usage_metadata', None)
+        else:
+            usage = getattr(response, 'usage', None)
+        split = split_input_tokens(self.model_family, usage)
+        if split is not None:
+            self.turn_prompt_tokens.append(split)
+
+    '''async clients are only built when a session actually runs on an event loop'''
+    @property
+    def async_client(self):
+        return get_async_client(self.model_family, self.endpoint)
+
+    def _record_response(self, response, thoughts):
+        for thinking_content in thoughts:
+            self.history.append({"role": "thinking_assistant", "content": thinking_content})
+        self.messages.append(assistant_message(response))
+        if self.call_events:
+            self.history.append({"role": "assistant", "content": response, "metadata": {"call_events": self.call_events}})
+        else:
             self.history.append({"role": "assistant", "content": response})
 
+    def normal_output(self, input):
+        self.messages.append(user_message(str(input)))
+        self.history.append({"role": "user", "content": str(input)})
+
+        engine = current_engine()
+        if engine is not None:
+            # running inside the async engine: the request is awaited on the engine's event loop
+            response, thoughts = engine.call(self)
+        else:
+            response, thoughts = self._call_model()
+        self._record_response(response, thoughts)
+
+        '''If mistake happens, filter them in self.messages'''
+        if self.has_format_mistake(str(input)):
+            del self.messages[-3:-1]
+
+        return response
+
+    async def anormal_output(self, input):
+        self.messages.append(user_message(str(input)))
+        self.history.append({"role": "user", "content": str(input)})
+
+        response, thoughts = await self._acall_model()
+        self._record_response(response, thoughts)
+
         '''If mistake happens, filter them in self.messages'''
         if self.has_format_mistake(str(input)):
             del self.messages[-3:-1]
 
         return response
     
+    '''one game test sample from the current conversation: max_turns exploration games, then failure_num+1 scored games; returns the score of every scored game'''
+    def _play_game_sample(self, platform_module, settings, failure_num, max_turns):
+        for j in range(max_turns):
+            logging.info(f"Exploration Round {j+1}/{max_turns}")
+            model_input = f"***Exploration Round <{j+1}/{max_turns}> Start***\n"
+            model_output = f"Ok. I'm ready to play the game. This is round {j+1} of the exploration phase."
+            self._log_exchange(model_input, model_output)
+            platform_module.platform(settings, self)
+        logging.info(f"Exploration Phase Ends, Now We Will Start the Evaluation Phase.")
+        scores = []
+        for k in range(failure_num+1):
+            model_input = f"********Evaluation Phase Starts, We Will Play the Game for {failure_num+1} Time. Now is the {k} time. The highest score Will Be Recorded.**********\n"
+            model_output = self.normal_output(model_input)
+            scores.append(platform_module.platform(settings, self))
+        return scores
+
     '''When the player is ready for evaluation, use this function'''
     def evaluate(self, failure_num, version, max_turns=20):
-        with open(self.paths.test_path / self.task / self.difficulty / f"{self.task_id}.json", 'r', encoding='utf-8') as f:
+        self.evaluating = True
+        test_file = self.paths.test_path / self.task / self.difficulty / f"{self.task_id}.json"
+        with open(test_file, 'r', encoding='utf-8') as f:
             samples = json.load(f)
         # random.shuffle(samples)  # shuffle the samples for evaluation
         try:
@@ -386,6 +669,10 @@ class ReasoningLLM:
                 platform_module = dynamic_import(self.paths.platform_path / self.task / self.difficulty, f"{self.task_id}_final")
         except (FileNotFoundError, ImportError) as e:
             print(e)
+        # expected answers precomputed by answers.py, only used while they match the final platform and the test file
+        answers = None
+        if self.mode == 'evaluate':
+            answers = load_answers(self.task, self.difficulty, self.task_id, self.paths.platform_path / self.task / self.difficulty / f"{self.task_id}_final.py", test_file)
         
         if self.task == 'code':
             num_ckpts = 0   # number of checkpoints
@@ -407,57 +694,17 @@ class ReasoningLLM:
                         self.messages.pop()
                         self.history.pop()
                         self.history.pop()
-                        if self.model_family == 'gemini':
-                            model_input = model_input.parts[0].text + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: When the input variables of the blackbox are {name_value_pairs[i]}, what's the value for {samples[i]['checkpoints'][j][2]} at checkpoint ({samples[i]['checkpoints'][j][0]}, {samples[i]['checkpoints'][j][1]})?"
-                        elif self.model_family == 'llama':
-                            model_input = model_input["content"][0]['text'] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: When the input variables of the blackbox are {name_value_pairs[i]}, what's the value for {samples[i]['checkpoints'][j][2]} at checkpoint ({samples[i]['checkpoints'][j][0]}, {samples[i]['checkpoints'][j][1]})?"
-                        else:
-                            model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: When the input variables of the blackbox are {name_value_pairs[i]}, what's the value for {samples[i]['checkpoints'][j][2]} at checkpoint ({samples[i]['checkpoints'][j][0]}, {samples[i]['checkpoints'][j][1]})?"
+                        model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: When the input variables of the blackbox are {name_value_pairs[i]}, what's the value for {samples[i]['checkpoints'][j][2]} at checkpoint ({samples[i]['checkpoints'][j][0]}, {samples[i]['checkpoints'][j][1]})?"
                     else:
                         model_input = f"Answer the question: When the input variables of the blackbox are {name_value_pairs[i]}, what's the value for {samples[i]['checkpoints'][j][2]} at checkpoint ({samples[i]['checkpoints'][j][0]}, {samples[i]['checkpoints'][j][1]})?"
                     model_output = self.normal_output(model_input)
                     model_output = model_output.rstrip('\n')
                     
-                    # use StringIO to capture the output of the blackbox function
-                    output = StringIO()
-                    original_stdout = sys.stdout
-                    sys.stdout = output
-                    set_current_debug_target(platform_module.blackbox, 'original_n')
-                    reset_debugger_state()
-                    platform_module.blackbox(
-                        **name_value_pairs[i], 
-                        idx=samples[i]["checkpoints"][j][0], 
-                        iter=samples[i]["checkpoints"][j][1], 
-                    )
-                    sys.stdout = original_stdout
-                    truth = output.getvalue()
-                    truth = ast.literal_eval(truth)  # convert the output to the expected type
-
-                    type_mapping = {
-                        'int': int,
-                        'float': float,
-                        'list': ast.literal_eval,
-                        'dict': ast.literal_eval, 
-                        'str': lambda s: s.strip("'\"") 
-                    }
-                    result_dict = {}
-                    pattern = re.compile(r"(\w+)\s*=\s*(\{.*?\}|\[.*?\]|'.*?'|\".*?\"|[^,]*)")
-                    for item in truth:
-                        pairs = pattern.findall(item)
-                        parts = {key.strip(): val.strip() for key, val in pairs}
-        
-                        name = parts['name']
-                        value_str = parts.get('value', '')
-                        type_str = parts.get('type', 'str')
-                        convert_func = type_mapping.get(type_str, lambda val: val)
-                        converted_value = convert_func(value_str)
-                        
-                        result_dict[name] = converted_value
-
-                    query_var=samples[i]["checkpoints"][j][2]
-                    truth = result_dict.get(query_var, None)
-
-                    name_value_pairs = copy.deepcopy(name_value_pairs_copy)     # reset the name_value_pairs
+                    if j == 0:
+                        # the typed value asked for at every checkpoint of the sample, from one traced run (see ckpt.py)
+                        truths = self._truth(answers, i, lambda: checkpoint_answers(platform_module.blackbox, name_value_pairs_copy[i], samples[i]["checkpoints"]))
+                    truth = truths[j]
+
                     num_try = 0
                     answer = True
                     while str(truth).replace(" ", "") != model_output.replace(" ", ""):    # exclude the influence of format
@@ -469,29 +716,9 @@ class ReasoningLLM:
                     
                     if answer == True:
                         num_correct += 1
-                        if self.model_family == 'gemini':
-                            self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is correct. Let's move to next question.")]))
-                            self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                        elif self.model_family == 'llama':
-                            self.messages.append({"role": "user", "content": [{"text": "Your answer is correct. Let's move to next question."}]})
-                            self.messages.append({"role": "assistant", "content": [{"text":"Ok."}]})
-                        else:
-                            self.messages.append({"role": "user", "content": "Your answer is correct. Let's move to next question."})
-                            self.messages.append({"role": "assistant", "content": "Ok."})
-                        self.history.append({"role": "user", "content": "Your answer is correct. Let's move to next question."})
-                        self.history.append({"role": "assistant", "content": "Ok."})
+                        self._log_exchange("Your answer is correct. Let's move to next question.", "Ok.")
                     else:  
-                        if self.model_family == 'gemini':
-                            self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is wrong. Let's move to next question.")]))
-                            self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                        elif self.model_family == 'llama':
-                            self.messages.append({"role": "user", "content": [{"text": "Your answer is wrong. Let's move to next question."}]})
-                            self.messages.append({"role": "assistant", "content": [{"text":"Ok."}]})
-                        else:
-                            self.messages.append({"role": "user", "content": "Your answer is wrong. Let's move to next question."})
-                            self.messages.append({"role": "assistant", "content": "Ok."})
-                        self.history.append({"role": "user", "content": "Your answer is wrong. Let's move to next question."})
-                        self.history.append({"role": "assistant", "content": "Ok."})
+                        self._log_exchange("Your answer is wrong. Let's move to next question.", "Ok.")
 
             if self.mode == 'evaluate':
                 if self.thinking_mode:
@@ -512,12 +739,7 @@ class ReasoningLLM:
                     self.messages.pop()
                     self.history.pop()
                     self.history.pop()
-                    if self.model_family == 'gemini':
-                        model_input = model_input.parts[0].text + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What's the output of the blackbox when the input plaintext is '{plaintext}'?"
-                    elif self.model_family == 'llama':
-                        model_input = model_input["content"][0]['text'] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What's the output of the blackbox when the input plaintext is '{plaintext}'?"
-                    else:
-                        model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What's the output of the blackbox when the input plaintext is '{plaintext}'?"
+                    model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What's the output of the blackbox when the input plaintext is '{plaintext}'?"
                 else:
                     model_input = f"Answer the question: What's the output of the blackbox when the input plaintext is '{plaintext}'?"
                 logging.info(f"Evaluation Stage Model Input: {model_input}")
@@ -534,7 +756,7 @@ class ReasoningLLM:
                         break
 
                 logging.info(f"Evaluation Stage Model Output: {model_output}")
-                truth = platform_module.blackbox(plaintext)
+                truth = self._truth(answers, i, lambda: platform_module.blackbox(plaintext))
 
                 num_try = 0
                 answer = True
@@ -546,29 +768,9 @@ class ReasoningLLM:
                     model_output = self.normal_output("Your answer is wrong. Please try again. DO NOT output any other text, ONLY output the answer.")
                 if answer == True:
                     num_correct += 1
-                    if self.model_family == 'gemini':
-                        self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is correct. Let's move to next question.")]))
-                        self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                    elif self.model_family == 'llama':
-                        self.messages.append({"role": "user", "content": [{"text": "Your answer is correct. Let's move to next question."}]})
-                        self.messages.append({"role": "assistant", "content": [{"text":"Ok."}]})
-                    else:
-                        self.messages.append({"role": "user", "content": "Your answer is correct. Let's move to next question."})
-                        self.messages.append({"role": "assistant", "content": "Ok."})
-                    self.history.append({"role": "user", "content": "Your answer is correct. Let's move to next question."})
-                    self.history.append({"role": "assistant", "content": "Ok."})
+                    self._log_exchange("Your answer is correct. Let's move to next question.", "Ok.")
                 else:  
-                    if self.model_family == 'gemini':
-                        self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is wrong. Let's move to next question.")]))
-                        self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                    elif self.model_family == 'llama':
-                        self.messages.append({"role": "user", "content": [{"text": "Your answer is wrong. Let's move to next question."}]})
-                        self.messages.append({"role": "assistant", "content": [{"text":"Ok."}]})
-                    else:
-                        self.messages.append({"role": "user", "content": "Your answer is wrong. Let's move to next question."})
-                        self.messages.append({"role": "assistant", "content": "Ok."})
-                    self.history.append({"role": "user", "content": "Your answer is wrong. Let's move to next question."})
-                    self.history.append({"role": "assistant", "content": "Ok."})
+                    self._log_exchange("Your answer is wrong. Let's move to next question.", "Ok.")
 
             if self.mode == 'evaluate':
                 if self.thinking_mode:
@@ -618,23 +820,9 @@ class ReasoningLLM:
                     model_output = self.normal_output("Your answer is wrong. Please try again. DO NOT output any other text, ONLY output the answer.")
                 if answer == True:
                     num_correct += 1
-                    if self.model_family == 'gemini':
-                        self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is correct.")]))
-                        self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                    else:
-                        self.messages.append({"role": "user", "content": "Your answer is correct."})
-                        self.messages.append({"role": "assistant", "content": "Ok."})
-                    self.history.append({"role": "user", "content": "Your answer is correct."})
-                    self.history.append({"role": "assistant", "content": "Ok."})
+                    self._log_exchange("Your answer is correct.", "Ok.")
                 else:  
-                    if self.model_family == 'gemini':
-                        self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is wrong.")]))
-                        self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                    else:
-                        self.messages.append({"role": "user", "content": "Your answer is wrong."})
-                        self.messages.append({"role": "assistant", "content": "Ok."})
-                    self.history.append({"role": "user", "content": "Your answer is wrong."})
-                    self.history.append({"role": "assistant", "content": "Ok."})
+                    self._log_exchange("Your answer is wrong.", "Ok.")
 
                 self.messages = self.messages[:end_point]  
 
@@ -648,33 +836,29 @@ class ReasoningLLM:
             active_samples = len(samples) if self.mode == 'evaluate' else 1
             sum_score = [[0] * (failure_num+1) for _ in range(active_samples)]
             max_score = []
-            initial_messages = copy.deepcopy(self.messages)
+            initial_messages = list(self.messages)
 
             model_input = f"********Exploration Phase Starts, We wll Play the Game for {max_turns} Times. Your Actions Will Not Be Recorded, and Your Score Does Not Matter.**********\n"
             model_output = self.normal_output(model_input)
-            
+
+            workers = game_sample_workers()
+            if workers > 1 and active_samples > 1:
+                # samples are independent: play them concurrently on forks of the session, each against its own copy of the platform
+                forks = [self.fork(initial_messages) for _ in range(active_samples)]
+                scores = map_samples(lambda i: forks[i]._play_game_sample(load_platform(platform_module.__file__), samples[i], failure_num, max_turns),
+                                     range(active_samples), workers)
+                for fork in forks:
+                    self.merge_fork(fork)
+            else:
+                scores = []
+                for i in range(active_samples):
+                    self.messages = list(initial_messages)     # shallow: log entries are never changed in place
+                    scores.append(self._play_game_sample(platform_module, samples[i], failure_num, max_turns))
+
             for i in range(active_samples):
-                self.messages = copy.deepcopy(initial_messages)                
                 settings = samples[i]
-
-                for j in range(max_turns):
-                    logging.info(f"Exploration Round {j+1}/{max_turns}")
-                    model_input = f"***Exploration Round <{j+1}/{max_turns}> Start***\n"
-                    model_output = f"Ok. I'm ready to play the game. This is round {j+1} of the exploration phase."
-                    if self.model_family == 'gemini':
-                        self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text=model_input)]))
-                        self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text=model_output)]))
-                    else:
-                        self.messages.append({"role": "user", "content": model_input})
-                        self.messages.append({"role": "assistant", "content": model_output})
-                    self.history.append({"role": "user", "content": model_input})
-                    self.history.append({"role": "assistant", "content": model_output})
-                    platform_module.platform(settings, self)
-                logging.info(f"Exploration Phase Ends, Now We Will Start the Evaluation Phase.")
                 for k in range(failure_num+1):
-                    model_input = f"********Evaluation Phase Starts, We Will Play the Game for {failure_num+1} Time. Now is the {k} time. The highest score Will Be Recorded.**********\n"
-                    model_output = self.normal_output(model_input)
-                    sum_score[i][k] += platform_module.platform(settings, self)
+                    sum_score[i][k] += scores[i][k]
                 best_score = [max(score) for score in sum_score]
 
                 if 'rps' in self.task_id:
@@ -733,12 +917,7 @@ class ReasoningLLM:
                         self.messages.pop()
                         self.history.pop()
                         self.history.pop()
-                        if self.model_family == 'gemini':
-                            model_input = model_input.parts[0].text + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What is the coordinate of each object at time {t}?"
-                        elif self.model_family == 'llama':
-                            model_input = model_input["content"][0]['text'] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What is the coordinate of each object at time {t}?"
-                        else:
-                            model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What is the coordinate of each object at time {t}?"
+                        model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n Now answer the question: What is the coordinate of each object at time {t}?"
                     else:
                         model_input = f"Answer the question: What is the coordinate of each object at time {t}?"
                     logging.info(f"Evaluation Stage Model Input: {model_input}")
@@ -763,7 +942,7 @@ class ReasoningLLM:
                     else:
                         format = True
 
-                    truth = platform_module.blackbox(t)
+                    truth = self._truth(answers, i, lambda: platform_module.blackbox(t))
                     num_try = 0
                     answer = True
                     if format != False:
@@ -776,29 +955,9 @@ class ReasoningLLM:
                             model_output = self.normal_output(f"Your answer for object{idx} is wrong. Please try again. DO NOT output any other text, ONLY output the answer.")
                     if answer == True and format == True:
                         num_correct += 1
-                        if self.model_family == 'gemini':
-                            self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is correct. Let's move to next question.")]))
-                            self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                        elif self.model_family == 'llama':
-                            self.messages.append({"role": "user", "content": [{"text": "Your answer is right. Let's move to next question."}]})
-                            self.messages.append({"role": "assistant", "content": [{"text":"Ok."}]})
-                        else:
-                            self.messages.append({"role": "user", "content": "Your answer is correct. Let's move to next question."})
-                            self.messages.append({"role": "assistant", "content": "Ok."})
-                        self.history.append({"role": "user", "content": "Your answer is correct. Let's move to next question."})
-                        self.history.append({"role": "assistant", "content": "Ok."})
+                        self._log_exchange("Your answer is correct. Let's move to next question.", "Ok.")
                     else:  
-                        if self.model_family == 'gemini':
-                            self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text="Your answer is wrong. Let's move to next question.")]))
-                            self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                        elif self.model_family == 'llama':
-                            self.messages.append({"role": "user", "content": [{"text": "Your answer is wrong. Let's move to next question."}]})
-                            self.messages.append({"role": "assistant", "content": [{"text":"Ok."}]})
-                        else:
-                            self.messages.append({"role": "user", "content": "Your answer is wrong. Let's move to next question."})
-                            self.messages.append({"role": "assistant", "content": "Ok."})
-                        self.history.append({"role": "user", "content": "Your answer is wrong. Let's move to next question."})
-                        self.history.append({"role": "assistant", "content": "Ok."})   
+                        self._log_exchange("Your answer is wrong. Let's move to next question.", "Ok.")
 
             else:
                 '''let llm write function to simulate the mechanical system'''
@@ -810,12 +969,10 @@ class ReasoningLLM:
                 self.messages.pop()
                 self.history.pop()
                 self.history.pop()
-                if self.model_family == 'gemini':
-                    model_input = model_input.parts[0].text + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Question********\n Now output runnable python code to simulate the mechanical system"
-                else:
-                    model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Question********\n Now output runnable python code to simulate the mechanical system"
+                model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Question********\n Now output runnable python code to simulate the mechanical system"
                 model_output = self.normal_output(model_input)
-                scope = {} 
+                sample_times = [samples[i]['time'] for i in range(active_samples)]
+                truths = {}     # sample -> expected coordinates, simulated once for all tries
                 
                 for trys in range(failure_num + 1):
                     times = 0
@@ -828,9 +985,12 @@ class ReasoningLLM:
                         try:
                             if 'python' in model_output:
                                 model_output = re.findall(r"```python\n(.*?)```", model_output, re.DOTALL)[0]
-                            exec(model_output, scope, scope)
-                            test_res = scope['solution'](1)
-                            if test_res is None:
+                            # the model's code runs in a sandboxed child process, solution(1) and every sample time in one batch (see sandbox.py)
+                            attempt = run_solution(model_output, [1] + sample_times)
+                            if attempt.error is not None or attempt.call_error(0) is not None:
+                                raise SolutionError(attempt.error or attempt.call_error(0))
+                            run = attempt
+                            if run.value(0) is None:
                                 model_input = f"The output code must **return the coordinates of each object**. Please try again. DO NOT output any other text, ONLY output the code."
                                 model_output = self.normal_output(model_input)
                                 self.messages.pop()
@@ -845,16 +1005,23 @@ class ReasoningLLM:
                     if flag:
                         num_correct = 0
                         continue
-                    solution = scope.get('solution')
+                    seconds = run.seconds()
+                    logging.info(f"Solution: {len(seconds)} calls in {sum(seconds):.3f}s, slowest {max(seconds):.3f}s")
                     ans = ''
                     answer = [True for i in range(active_samples)]
                     for i in range(active_samples):
                         t = samples[i]['time']
-                        truth = platform_module.blackbox(t)
-                        if solution(t) is None:
+                        if i not in truths:
+                            truths[i] = self._truth(answers, i, lambda: platform_module.blackbox(t))
+                        truth = truths[i]
+                        if run.call_error(i + 1) is not None:
+                            answer[i] = False
+                            ans += f"Your code raised an error at time {t}: {run.call_error(i + 1)}. "
+                            continue
+                        if run.value(i + 1) is None:
                             ans += f"Your answer for time {t} is wrong."
                             continue
-                        res = check(solution(t), truth)
+                        res = check(run.value(i + 1), truth)
                         for j in range(len(res)):
                             if res[j] == False:
                                 answer[i] = False
@@ -865,8 +1032,8 @@ class ReasoningLLM:
                             ans += f"The answer is correct. \n"
                     num_correct = sum(answer)
                     if trys == failure_num:
-                        self.messages.append({"role": "user", "content": f"{ans}"})
-                        self.history.append({"role": "user", "content": f"{ans}"})
+                        self.messages.append(user_message(f"{ans}"))
+                        self.history.append(user_message(f"{ans}"))
                     else:
                         model_input = f"{ans} . You have a chance to try again. DO NOT output any other text, ONLY output runnable code."
                         model_output = self.normal_output(model_input)
@@ -888,15 +1055,13 @@ class ReasoningLLM:
                     self.messages.pop()
                     self.history.pop()
                     self.history.pop()
-                    if self.model_family == 'gemini':
-                        model_input = model_input.parts[0].text + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n"
-                    else:
-                        model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n"
+                    model_input = model_input["content"] + f"\n********Evaluation Starts, You Have {failure_num+1} Chances for Answering Each Question********\n"
                     model_input += "The output format is described in the Evaluation section previosly. For example:\n[0, 1, 0, 1]\n"
                 input = samples[n-1]["input"]
 
                 model_input += f"In this turn, given the input {input}, answer the output of the gates in the format we dicussed without any text else."
 
+                real_circuit_gates = self._truth(answers, n-1, lambda: platform_module.blackbox(input))
                 num_try = 0
                 while num_try < failure_num + 1:
                     num_try += 1
@@ -912,7 +1077,6 @@ class ReasoningLLM:
 
                     model_output = output_clear(model_output)
 
-                    real_circuit_gates = platform_module.blackbox(input)
                     try:
                         circuit_gates = json.loads(model_output)
                         if real_circuit_gates != circuit_gates:
@@ -925,14 +1089,7 @@ class ReasoningLLM:
                     except Exception as e:
                         model_input = "Please strictly follow the format. Output a 0/1 list without anything else. For example:\n[0, 1, 0, 1]\n"
                 
-                if self.model_family == 'gemini':
-                    self.messages.append(types.Content(role="user", parts=[types.Part.from_text(text=f"{model_input} Let's move to next question.")]))
-                    self.messages.append(types.Content(role="model", parts=[types.Part.from_text(text="Ok.")]))
-                else:
-                    self.messages.append({"role": "user", "content": f"{model_input} Let's move to next question."})
-                    self.messages.append({"role": "assistant", "content": "Ok."})
-                self.history.append({"role": "user", "content": f"{model_input} Let's move to next question."})
-                self.history.append({"role": "assistant", "content": "Ok."})
+                self._log_exchange(f"{model_input} Let's move to next question.", "Ok.")
                 if n == 1 and self.mode == 'generate':
                     break
             
@@ -942,6 +1099,11 @@ class ReasoningLLM:
                 else:
                     self.save_result(self.paths.result_path, [[self.difficulty, self.task_id, self.model_family, self.model_name, 'run_'+str(version), max_turns, failure_num, num_correct, circuit_test_num, num_correct/circuit_test_num]])  
 
+    '''expected answer of test sample `sample`: the stored one (see answers.py) when there is one, otherwise computed now'''
+    def _truth(self, answers, sample, compute):
+        stored = answers.get(sample) if answers is not None else None
+        return stored if stored is not None else compute()
+
     '''check if LLM make mistakes in output format.'''
     def has_format_mistake(self, input):
         if 'invalid' in input.lower() or 'error' in input.lower() or 'mistake' in input.lower():
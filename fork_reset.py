@@ -0,0 +1,24 @@
+import os
+
+'''
+Per-process state that must not be inherited by a forked child (multiprocessing workers, --executor worker): locks that
+another thread of the parent may have held at the fork, pooled client connections and executor threads that only
+exist in the parent. A module registers the function that rebuilds its state with @reset_after_fork; the functions
+run in registration order in every child.
+'''
+
+_resets = []
+
+
+def reset_after_fork(func):
+    '''run func() in the child after every os.fork; returns func, so it can be used as a decorator'''
+    _resets.append(func)
+    return func
+
+
+def _after_fork_in_child():
+    for func in _resets:
+        func()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
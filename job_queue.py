@@ -0,0 +1,209 @@
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+
+'''
+Durable job table for benchmark grids.
+
+One row per (model, thinking, task, difficulty, task_id, run, k, max_turns). Launchers claim pending jobs with a
+lease and renew it while the session runs; a job whose launcher died becomes claimable again once its lease
+expires. Several launchers (even on different machines sharing the file) can drain the same queue, and a killed
+grid resumes exactly where it stopped when main.py is started again with the same --job_queue.
+
+Every job also gets a deterministic shard key (a hash of model, black-box and run), so a launcher told to work on
+shard i of N always picks the same slice of the grid first (see cluster.py).
+'''
+
+JOB_KEY = ['model_name', 'thinking_mode', 'task', 'difficulty', 'task_id', 'run', 'k', 'max_turns']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_family TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    thinking_mode INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    k INTEGER NOT NULL,
+    max_turns INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    enqueued_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    return_code INTEGER,
+    last_error TEXT,
+    shard_key INTEGER NOT NULL DEFAULT 0,
+    priority REAL NOT NULL DEFAULT 0,
+    UNIQUE (model_name, thinking_mode, task, difficulty, task_id, run, k, max_turns)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+'''
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+CLAIM_POLL_SECONDS = 10     # longest a launcher with nothing to claim sleeps before looking again
+
+
+def shard_key(job):
+    '''stable across machines and python processes, unlike hash()'''
+    key = f"{job['model_name']}/{int(bool(job['thinking_mode']))}/{job['task']}/{job['difficulty']}/{job['task_id']}/{int(job['run'])}"
+    return int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def launcher_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # queues created by older versions
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(jobs)')]
+            if 'shard_key' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN shard_key INTEGER NOT NULL DEFAULT 0')
+            if 'priority' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN priority REAL NOT NULL DEFAULT 0')
+
+    @contextmanager
+    def _connect(self):
+        '''one short-lived connection per operation, so the queue can be used from any thread or process'''
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=60000')
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')   # take the write lock up front so two launchers never claim the same job
+            try:
+                yield conn
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def enqueue(self, jobs):
+        '''
+        insert jobs (dicts with model_family + JOB_KEY fields, optionally a priority such as the expected duration),
+        existing jobs are left untouched; returns the number added
+        '''
+        now = time.time()
+        added = 0
+        with self._transaction() as conn:
+            for job in jobs:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO jobs (model_family, model_name, thinking_mode, task, difficulty, task_id, run, k, max_turns, enqueued_at, shard_key, priority) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job['model_family'], job['model_name'], int(bool(job['thinking_mode'])), job['task'], job['difficulty'],
+                     job['task_id'], int(job['run']), int(job['k']), int(job['max_turns']), now, shard_key(job), job.get('priority', 0))
+                )
+                added += cursor.rowcount
+        return added
+
+    def claim(self, owner, limit=1, shard=0, num_shards=1):
+        '''
+        lease up to `limit` runnable jobs: pending ones, or running ones whose lease has expired.
+        Jobs of the launcher's own shard come first; once it is empty, jobs of other shards are taken too,
+        so a dead launcher never leaves part of the grid behind. Within that, higher priority (longer) jobs go first.
+        '''
+        now = time.time()
+        with self._transaction() as conn:
+            self._fail_exhausted(conn, now)
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'pending' OR (status = 'running' AND lease_expires < ?)) AND attempts < ? "
+                "ORDER BY shard_key % ? != ?, priority DESC, id LIMIT ?",
+                (now, self.max_attempts, num_shards, shard, limit)
+            ).fetchall()
+            for row in rows:
+                if row['status'] == 'running':
+                    logging.warning(f"Reclaiming job {row['id']} from {row['lease_owner']}, its lease expired")
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+                    (owner, now + self.lease_seconds, now, row['id'])
+                )
+        return [dict(row) for row in rows]
+
+    def _fail_exhausted(self, conn, now):
+        '''a running job whose lease expired on its last attempt is never reclaimed, so it is marked failed instead'''
+        rows = conn.execute(
+            "SELECT id, attempts, lease_owner, last_error FROM jobs WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, self.max_attempts)
+        ).fetchall()
+        for row in rows:
+            error = f"Lease of {row['lease_owner']} expired during attempt {row['attempts']}/{self.max_attempts}"
+            logging.warning(f"Job {row['id']} failed: {error}")
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, finished_at = ?, last_error = ? WHERE id = ?",
+                (now, f"{error}\n{row['last_error']}" if row['last_error'] else error, row['id'])
+            )
+        return len(rows)
+
+    def fail_exhausted(self):
+        '''mark the jobs whose launcher died on their last attempt as failed; returns how many'''
+        with self._transaction() as conn:
+            return self._fail_exhausted(conn, time.time())
+
+    def reclaim_wait(self):
+        '''
+        seconds until the earliest lease of a running job that has attempts left expires, None when no running job can
+        become claimable again. Such jobs belong to a killed launcher (a restarted one has a new owner) or are still
+        running and may fail and go back to pending.
+        '''
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(lease_expires) AS expires FROM jobs WHERE status = 'running' AND attempts < ?", (self.max_attempts,)
+            ).fetchone()
+        return None if row['expires'] is None else max(row['expires'] - time.time(), 0)
+
+    def renew(self, owner):
+        '''extend the leases of every job `owner` is running'''
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND lease_owner = ?",
+                (time.time() + self.lease_seconds, owner)
+            )
+
+    def complete(self, job_id, owner, return_code, error=''):
+        '''record the outcome; a failed job goes back to pending until it used up max_attempts'''
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT attempts, started_at, lease_owner FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row['lease_owner'] != owner:
+                logging.warning(f"Job {job_id} finished on {owner} but is now leased by {row['lease_owner']}, recording anyway")
+            if return_code == 0:
+                status = 'done'
+            elif row['attempts'] >= self.max_attempts:
+                status = 'failed'
+            else:
+                status = 'pending'
+            conn.execute(
+                'UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, finished_at = ?, duration = ?, return_code = ?, last_error = ? WHERE id = ?',
+                (status, now, now - row['started_at'], return_code, error[-4000:] if error else error, job_id)
+            )
+        return status
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
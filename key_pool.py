@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from fork_reset import reset_after_fork
+
+'''
+API key pools and weighted endpoint routing per provider.
+
+Every model family used to read exactly one key from .env, which caps an --eva_model_family all grid at the quota of
+a single account. A family now has a pool of endpoints (an API key, optionally with its own base URL) that sessions
+are spread over by smooth weighted round-robin. A session keeps its endpoint, so provider prompt caches (which are
+per account) keep working, and moves on only when its endpoint fails:
+
+* auth and quota errors (401/402/403, insufficient_quota, a too low credit balance, an invalid key) remove the
+  endpoint from the pool of this process for good
+* FAILURES_BEFORE_COOLDOWN transient failures in a row bench it for COOLDOWN_SECONDS
+
+Pools come from main.py --key_pools pools.json (ORACLE_KEY_POOLS), e.g. qwen over DashScope and a local
+OpenAI-compatible server:
+
+    {"qwen": [{"api_key_env": "ALIBABA_API_KEY", "weight": 3},
+              {"base_url": "http://localhost:8000/v1", "api_key": "EMPTY", "weight": 1}],
+     "gpt": [{"api_key_env": "OPENAI_API_KEY"}, {"api_key_env": "OPENAI_API_KEY_2"}]}
+
+Families without an entry use the comma-separated keys of OPENAI_API_KEYS (ANTHROPIC_API_KEYS, ...) or the single
+OPENAI_API_KEY as before. base_url is honoured by the families on OpenAI-compatible or Anthropic clients (gpt, qwen,
+deepseek, claude); gemini and llama pool keys only. Pool state is per process. The rate-limit scheduler still
+counts a family as a whole, so raise its quota with --rate_limits to what the pool adds up to.
+'''
+
+KEY_POOLS_ENV = 'ORACLE_KEY_POOLS'
+API_KEY_ENVS = {'gpt': 'OPENAI_API_KEY', 'claude': 'ANTHROPIC_API_KEY', 'gemini': 'GEMINI_API_KEY',
+                'qwen': 'ALIBABA_API_KEY', 'deepseek': 'DEEPSEEK_API_KEY', 'llama': 'OPENROUTER_API_KEY'}
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN_SECONDS = 60
+KEY_ERROR_MARKERS = ['insufficient_quota', 'credit balance', 'insufficient balance', 'api_key_invalid', 'api key not valid',
+                     'invalid_api_key', 'invalid x-api-key', 'permission_denied']
+
+
+class NoUsableEndpoint(Exception):
+    pass
+
+
+def is_key_error(error):
+    '''the key itself is unusable (auth, billing or quota exhausted), as opposed to a rate limit or a transient failure'''
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None) or getattr(error, 'code', None)
+    if status in [401, 402, 403]:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in KEY_ERROR_MARKERS)
+
+
+class Endpoint:
+    def __init__(self, model_family, api_key=None, base_url=None, weight=1):
+        self.model_family = model_family
+        self.api_key = api_key      # None: the client falls back to the family's usual key (or the stand-in's)
+        self.base_url = base_url    # None: the family's default endpoint
+        self.weight = weight
+        self.removed = None         # reason the endpoint was taken out of the pool
+        self.failures = 0           # transient failures in a row
+        self.cooldown_until = 0
+        self.requests = 0
+
+    @property
+    def name(self):
+        key = (f'...{self.api_key[-4:]}' if len(self.api_key) > 8 else 'key') if self.api_key else 'default key'
+        return f"{self.model_family}@{self.base_url or 'default'} ({key})"
+
+    def __repr__(self):
+        return f'<Endpoint {self.name}>'
+
+
+class KeyPool:
+    def __init__(self, model_family, endpoints):
+        self.model_family = model_family
+        self.endpoints = endpoints
+        total = sum(endpoint.weight for endpoint in endpoints)
+        # smooth weighted round-robin; a random start keeps one-session processes from all taking the heaviest endpoint
+        self._current = {id(endpoint): random.uniform(0, total) for endpoint in endpoints}
+        self._lock = threading.Lock()
+
+    def pick(self):
+        '''the next endpoint by weight, skipping removed ones and those cooling down (unless every endpoint is)'''
+        with self._lock:
+            usable = [endpoint for endpoint in self.endpoints if endpoint.removed is None]
+            if not usable:
+                raise NoUsableEndpoint(f"Every {self.model_family} endpoint was removed: " + '; '.join(f'{e.name}: {e.removed}' for e in self.endpoints))
+            now = time.time()
+            ready = [endpoint for endpoint in usable if endpoint.cooldown_until <= now]
+            if not ready:
+                return min(usable, key=lambda endpoint: endpoint.cooldown_until)
+            total = sum(endpoint.weight for endpoint in ready)
+            for endpoint in ready:
+                self._current[id(endpoint)] += endpoint.weight
+            chosen = max(ready, key=lambda endpoint: self._current[id(endpoint)])
+            self._current[id(chosen)] -= total
+            return chosen
+
+    def report_success(self, endpoint):
+        with self._lock:
+            endpoint.failures = 0
+            endpoint.requests += 1
+
+    def report_failure(self, endpoint, error):
+        '''record a failed request; returns True when the endpoint was removed and the caller should pick another one'''
+        with self._lock:
+            if is_key_error(error):
+                if endpoint.removed is None:
+                    endpoint.removed = repr(error)[:200]
+                    logging.warning(f"Removing {endpoint.name} from the key pool: {endpoint.removed}")
+                return True
+            endpoint.failures += 1
+            if endpoint.failures >= FAILURES_BEFORE_COOLDOWN:
+                endpoint.cooldown_until = time.time() + COOLDOWN_SECONDS
+                endpoint.failures = 0
+                logging.warning(f"{endpoint.name} failed {FAILURES_BEFORE_COOLDOWN} times in a row, benched for {COOLDOWN_SECONDS}s")
+            return False
+
+    def stats(self):
+        return [{'endpoint': endpoint.name, 'weight': endpoint.weight, 'requests': endpoint.requests, 'removed': endpoint.removed}
+                for endpoint in self.endpoints]
+
+
+def _env_keys(model_family):
+    env = API_KEY_ENVS[model_family]
+    keys = os.getenv(env + 'S') or os.getenv(env) or ''
+    return [key.strip() for key in keys.split(',') if key.strip()]
+
+
+def load_key_pools(path):
+    '''model family -> endpoint settings, from a --key_pools JSON file'''
+    with open(path, 'r', encoding='utf-8') as f:
+        pools = json.load(f)
+    unknown = set(pools) - set(API_KEY_ENVS)
+    if unknown:
+        raise ValueError(f"Unknown model families in {path}: {sorted(unknown)}, expected some of {list(API_KEY_ENVS)}")
+    return pools
+
+
+def build_pool(model_family, settings=None):
+    '''the pool of a family from its --key_pools settings, or from its environment keys'''
+    endpoints = []
+    for entry in settings or []:
+        api_key = entry.get('api_key') or (os.getenv(entry['api_key_env']) if entry.get('api_key_env') else None)
+        if entry.get('api_key_env') and not api_key:
+            logging.warning(f"{entry['api_key_env']} is not set, leaving it out of the {model_family} key pool")
+            continue
+        endpoints.append(Endpoint(model_family, api_key, entry.get('base_url'), entry.get('weight', 1)))
+    if not endpoints:
+        endpoints = [Endpoint(model_family, key) for key in _env_keys(model_family)] or [Endpoint(model_family)]
+    return KeyPool(model_family, endpoints)
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(model_family):
+    '''the key pool of a model family in this process'''
+    with _lock:
+        if model_family not in _pools:
+            path = os.getenv(KEY_POOLS_ENV)
+            settings = load_key_pools(path).get(model_family) if path else None
+            _pools[model_family] = build_pool(model_family, settings)
+        return _pools[model_family]
+
+
+@reset_after_fork
+def _reset_after_fork():
+    global _lock
+    _lock = threading.Lock()
+    for pool in _pools.values():
+        pool._lock = threading.Lock()
@@ -0,0 +1,31 @@
+import importlib
+import threading
+
+'''
+The provider SDKs (openai, anthropic, google-genai, ...) take a long time to import, and every platform script
+imports eva_models. Modules wrapped in LazyModule are only imported when one of their attributes is first used,
+so a session only pays for the SDK of the model family it actually talks to.
+'''
+
+_import_lock = threading.Lock()
+
+
+class LazyModule:
+    '''stand-in for a module, imported on first attribute access'''
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _import_lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
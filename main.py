@@ -1,11 +1,37 @@
 import argparse
-from paths import PathManager
+from paths import PathManager, OUTPUT_ROOT_ENV
 import os
 from auto_generation import Platform, PolishModel, TestSamplesGenerator
 import subprocess
 import logging
 import sys
+import time
 import multiprocessing
+import threading
+import traceback
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from worker_pool import platform_args, run_platform, init_worker
+from async_engine import AsyncEngine, parse_provider_concurrency, SERIAL_TASKS
+from job_queue import JobQueue, launcher_id, CLAIM_POLL_SECONDS
+from rate_limiter import start_scheduler_server, load_rate_limits, get_scheduler
+from durations import DurationStore
+from manifest import load_manifest
+from answers import build_answers
+from clients import latency_summary, BASE_URL_ENV
+from key_pool import KEY_POOLS_ENV, load_key_pools
+from response_cache import get_response_cache, CACHE_ENV, CACHE_MB_ENV, RUN_ID_ENV
+from cassettes import CASSETTE_ENV
+from streaming import STREAM_ENV, EARLY_STOP_ENV
+from prompt_cache import PROMPT_CACHE_ENV
+from ckpt import CHECKPOINT_TRACE_ENV
+from sample_fork import GAME_SAMPLE_WORKERS_ENV
+from sandbox import SOLUTION_TIMEOUT_ENV, SOLUTION_MEMORY_ENV, DEFAULT_TIMEOUT as DEFAULT_SOLUTION_TIMEOUT, DEFAULT_MEMORY_MB as DEFAULT_SOLUTION_MEMORY_MB
+from resilience import CALL_DEADLINE_ENV, CALL_RETRIES_ENV, HEDGE_ENV, DEFAULT_CALL_RETRIES
+from context_window import CONTEXT_POLICY_ENV, CONTEXT_BUDGET_ENV, POLICIES as CONTEXT_POLICIES, DEFAULT_BUDGET as DEFAULT_CONTEXT_BUDGET
+from batch import BatchRun, DEFAULT_POLL_SECONDS as DEFAULT_BATCH_POLL_SECONDS
+from progress import ProgressTracker, save_job_output, job_log_files
+from cluster import start_coordinator, wait_for_cluster, join_cluster, RemoteQueue, parse_shard
 
 '''if you want to add new model family and model name, please add them in both the following function and argparse choices.'''
 def get_model_name(model_family):
@@ -93,24 +119,23 @@ def map_model_name_to_api_name(model_name: str) -> str:
         raise ValueError(f"Unsupported model name: {model_name}")
 
 def run_evaluation(family, model, task_folder, eva_mode, n_runs, difficulty_folder, task_id_stem, \
-    k, history_path, max_turns, thinking_mode, platform_path):
-    command = [
-        'python',
-        platform_path / task_folder / difficulty_folder / f'{task_id_stem}_final.py',
+    k, history_path, max_turns, thinking_mode, platform_path, executor='subprocess', version=1):
+    platform_file = platform_path / task_folder / difficulty_folder / f'{task_id_stem}_final.py'
+    platform_arguments = platform_args(
         family,
         map_model_name_to_api_name(model),
         task_folder,
         eva_mode,
-        str(n_runs),
+        n_runs,
         difficulty_folder,
         task_id_stem,
-        str(k),
-        str(history_path),
-        str(max_turns),
-        str(1),
+        k,
+        history_path,
+        max_turns,
+        version,
         'evaluate',
-        str(thinking_mode)
-    ]
+        thinking_mode
+    )
 
     if thinking_mode:
         task_identifier = f"({model}_thinking) on {task_folder}/{difficulty_folder}/{task_id_stem}.json"
@@ -119,13 +144,208 @@ def run_evaluation(family, model, task_folder, eva_mode, n_runs, difficulty_fold
         task_identifier = f"({model}) on {task_folder}/{difficulty_folder}/{task_id_stem}.json"
         logging.info(f"Starting evaluation for {task_identifier}")
 
+    # grid sessions run side by side, so their output goes to logs/jobs/ (written as soon as the session ends) instead of the terminal
+    output, running_errors, return_code = timed_run_platform(executor, platform_file, platform_arguments, capture_output=True)
+    save_job_output(PathManager().logs_path, task_folder, difficulty_folder, task_id_stem, result_dir_name(dict(model_name=model, thinking_mode=thinking_mode)),
+                    version, output, running_errors)
+    return task_identifier, output, running_errors, return_code
+
+
+def run_evaluation_job(task_params):
+    '''run_evaluation for imap_unordered, the parameters come back with the result'''
+    return task_params, run_evaluation(*task_params)
+
+
+def timed_run_platform(executor, platform_file, platform_arguments, capture_output=False):
+    '''run_platform, recording the duration of successful sessions for longest-first ordering'''
+    start = time.time()
+    output, running_errors, return_code = run_platform(executor, platform_file, platform_arguments, capture_output)
+    if return_code == 0:
+        DurationStore().record(*platform_duration_key(platform_arguments), time.time() - start)
+    return output, running_errors, return_code
+
+
+def platform_duration_key(platform_arguments):
+    '''(model api name, thinking_mode, task, difficulty, task_id) of a platform_args list'''
+    return platform_arguments[1], platform_arguments[12], platform_arguments[2], platform_arguments[5], platform_arguments[6]
+
+
+def run_platform_job(job, capture_output=False):
+    '''job: (executor, platform file, platform arguments)'''
+    executor, platform_file, platform_arguments = job
+    logging.info(f"Evaluating {platform_arguments[2]}/{platform_arguments[5]}/{platform_arguments[6]}.json, run {platform_arguments[10]}")
+    return timed_run_platform(executor, platform_file, platform_arguments, capture_output)
+
+
+def job_params(job, args, paths):
+    '''run_evaluation arguments of a job claimed from the job queue'''
+    return (job['model_family'], job['model_name'], job['task'], job.get('eva_mode', args.eva_mode), job.get('n_runs', args.n_runs), job['difficulty'], job['task_id'],
+            job['k'], paths.history_path, job['max_turns'], bool(job['thinking_mode']), paths.platform_path, args.executor, job['run'])
+
+
+def result_dir_name(job):
+    '''folder the platform writes a job's results and history to, e.g. claude-3-7-sonnet-20250219_thinking'''
+    return map_model_name_to_api_name(job['model_name']) + ('_thinking' if job['thinking_mode'] else '')
+
+
+def drain_job_queue(queue, args, paths, num_slots):
+    '''claim and run jobs until nothing runnable is left, `num_slots` sessions at a time'''
+    owner = launcher_id()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(queue.lease_seconds / 3):
+            queue.renew(owner)
+
+    def slot(run_session):
+        while True:
+            claimed = queue.claim(owner)
+            if not claimed:
+                # leases of a killed launcher (a restarted one has a new owner) and jobs that may fail and be retried can still come back
+                wait = queue.reclaim_wait()
+                if wait is None:
+                    return
+                time.sleep(min(wait + 1, CLAIM_POLL_SECONDS))
+                continue
+            job = claimed[0]
+            try:
+                task_identifier, output, running_errors, return_code = run_session(job_params(job, args, paths))
+            except Exception:
+                running_errors, return_code = traceback.format_exc(), 1
+            status = queue.complete(job['id'], owner, return_code, running_errors)
+            logging.info(f"Job {job['id']} ({job['model_name']}{'_thinking' if job['thinking_mode'] else ''} on {job['task']}/{job['difficulty']}/{job['task_id']}, run {job['run']}): {status}")
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        if args.executor == 'async':
+            engine = AsyncEngine(args.max_sessions, parse_provider_concurrency(args.provider_concurrency))
+            num_slots = 1 if args.task in SERIAL_TASKS else args.max_sessions
+            # every slot takes a session thread for as long as it drains; the waits of its model calls run on the engine's offload pools
+            engine.run(slot, [(lambda params: run_evaluation(*params),)] * num_slots)
+        elif args.executor == 'worker':
+            with multiprocessing.Pool(processes=num_slots, initializer=init_worker) as pool:
+                with ThreadPool(num_slots) as threads:
+                    threads.map(slot, [lambda params: pool.apply(run_evaluation, params)] * num_slots)
+        else:
+            with ThreadPool(num_slots) as threads:
+                threads.map(slot, [lambda params: run_evaluation(*params)] * num_slots)
+    finally:
+        stop.set()
+    logging.info(f"Job queue {queue.path}: {queue.counts()}")
+
+
+def run_generated_platform(args, paths, task_folder, difficulty_folder, task_id_stem, version):
+    '''run version `version` of a freshly generated platform in generate mode, returns its running errors ('' on success)'''
+    logging.info(f"Generation: Running {task_id_stem}_v{version}.py")
     result = subprocess.run(
-        command,
-        capture_output=False,
-        text=True,
-        encoding='utf-8' 
+        [
+            'python', 
+            paths.platform_path / task_folder / difficulty_folder / f'{task_id_stem}_v{version}.py',
+            args.eva_model_family,
+            map_model_name_to_api_name(args.eva_model_name),
+            task_folder,
+            args.eva_mode,
+            str(args.n_runs),
+            difficulty_folder,
+            task_id_stem,
+            str(args.k),
+            paths.logs_path,
+            str(args.max_turns),
+            str(version),
+            'generate',
+            str(args.thinking_mode)
+        ], 
+        capture_output=True, 
+        text=True
+    )
+    return result.stderr if result.returncode != 0 else ''
+
+
+def finalize_platform(paths, task_folder, difficulty_folder, task_id_stem, version):
+    '''version `version` of a platform becomes its _final.py'''
+    os.rename(
+        paths.platform_path / task_folder / difficulty_folder / f'{task_id_stem}_v{version}.py',
+        paths.platform_path / task_folder / difficulty_folder / f'{task_id_stem}_final.py'
+    )
+
+
+def generate_in_batches(args, paths, missing_tests, missing_platforms):
+    '''steps 1 and 2 with the requests of each step submitted as one provider batch (--batch, see batch.py)'''
+    task_folder = args.task
+    test_sample_generator = TestSamplesGenerator(
+        task=task_folder, 
+        model_family=args.test_sample_generator_model_family, 
+        model_name=map_model_name_to_api_name(args.test_sample_generator_model_name),
+        max_turns=args.max_turns
     )
-    return task_identifier, result.stdout, result.stderr, result.returncode
+
+    def generate_tests(entries, version):
+        batch = BatchRun(test_sample_generator.model_family, test_sample_generator.model_name, args.batch_poll_seconds)
+        for entry in entries:
+            request = test_sample_generator.sample_request(entry['difficulty'], entry['task_id'], version)
+            if request is None:
+                test_sample_generator.save_samples(entry['difficulty'], entry['task_id'], None)
+            else:
+                batch.add((entry['difficulty'], entry['task_id']), test_sample_generator.system_prompt, **request)
+        answers = batch.run()
+        for (difficulty_folder, task_id_stem), response in answers.items():
+            logging.info(f"Saving test samples for {task_folder}/{difficulty_folder}/{task_id_stem}.json")
+            test_sample_generator.save_samples(difficulty_folder, task_id_stem, response)
+        return answers
+
+    # Step 1
+    # code gets its test samples for every platform version in step 2
+    if missing_tests:
+        generate_tests(missing_tests, None)
+
+    # Step 2
+    entries = {(entry['difficulty'], entry['task_id']): entry for entry in missing_platforms
+               if not os.path.exists(paths.platform_path / task_folder / entry['difficulty'] / f"{entry['task_id']}_final.py")}    # DO NOT overwrite the existing code
+    if not entries:
+        return
+    platform = Platform(
+        task=task_folder, 
+        platformgen_model_family=args.platformgen_model_family, 
+        platformgen_model_name=map_model_name_to_api_name(args.platformgen_model_name),
+    )
+    bug_fixer = PolishModel(
+        task=task_folder,
+        model_family=args.platformpolish_model_family,
+        model_name=map_model_name_to_api_name(args.platformpolish_model_name),
+    )
+    batch = BatchRun(platform.platformgen_model_family, platform.platformgen_model_name, args.batch_poll_seconds)
+    for difficulty_folder, task_id_stem in entries:
+        batch.add((difficulty_folder, task_id_stem), platform.platformgen_system_prompt, platform.instruction(difficulty_folder, task_id_stem), 0)
+    pending = []
+    for (difficulty_folder, task_id_stem), response in batch.run().items():
+        platform.save(difficulty_folder, task_id_stem, 1, response)
+        pending.append((difficulty_folder, task_id_stem))
+
+    loop_count = 1
+    while pending:
+        if args.task == 'code':
+            answered = generate_tests([entries[key] for key in pending], loop_count)
+            pending = [key for key in pending if key in answered]
+        running_errors = {key: run_generated_platform(args, paths, task_folder, *key, loop_count) for key in pending}
+        loop_count += 1
+        if loop_count > args.max_polish_times:
+            for key in pending:
+                finalize_platform(paths, task_folder, *key, loop_count-1)
+            break
+        triage = BatchRun(bug_fixer.model_family, bug_fixer.model_name, args.batch_poll_seconds)
+        for key in pending:
+            triage.add(key, bug_fixer.system_prompt, bug_fixer.triage_instruction(task_folder, *key, running_errors[key], loop_count), bug_fixer.temperature())
+        fixes = BatchRun(bug_fixer.model_family, bug_fixer.model_name, args.batch_poll_seconds)
+        for key, response in triage.run().items():
+            if 'correct' in response:
+                logging.info(f"Current platform code of {task_folder}/{key[0]}/{key[1]} is correct")
+                finalize_platform(paths, task_folder, *key, loop_count-1)
+            else:
+                fixes.add(key, bug_fixer.system_prompt, bug_fixer.fix_instruction(task_folder, *key, loop_count, response), bug_fixer.temperature(gemini_temperature=0))
+        pending = []
+        for (difficulty_folder, task_id_stem), response in fixes.run().items():
+            bug_fixer.save_fix(difficulty_folder, task_id_stem, loop_count, response)
+            pending.append((difficulty_folder, task_id_stem))
 
 
 def main():
@@ -149,6 +369,35 @@ def main():
     evaluator_group.add_argument('--eva_mode', type=str, default='normal', choices=['normal', 'concurrent'], help='Evaluation mode. If n_runs>1 or model_name=all, eva_model must be "concurrent"')
     evaluator_group.add_argument('--max_turns', type=int, default=10, help='when exceed max_turns, stop the interaction and start testing')
     evaluator_group.add_argument('--baseline_test', type=bool, default=False, help='baseline test')
+    evaluator_group.add_argument('--executor', type=str, default='subprocess', choices=['subprocess', 'worker', 'async'], help='How black-box sessions are run. "subprocess" starts a new interpreter per session, "worker" reuses long-lived processes that import the heavy modules once, "async" drives many sessions from one process with async LLM clients.')
+    evaluator_group.add_argument('--workers', type=int, default=None, help='Number of black-box sessions run in parallel (default: 15 when eva_model_family is all, otherwise 1). Ignored by --executor async.')
+    evaluator_group.add_argument('--max_sessions', type=int, default=256, help='Maximum number of concurrent black-box sessions with --executor async.')
+    evaluator_group.add_argument('--job_queue', type=str, default=None, help='SQLite file of a durable job queue. Jobs are skipped or resumed by their recorded status, and several launchers can drain the same queue.')
+    evaluator_group.add_argument('--rate_limits', type=str, default=None, help='JSON file with per-provider requests/tokens per minute, e.g. {"claude": {"rpm": 50, "tpm": 40000}}. Providers not listed keep the defaults in rate_limiter.py.')
+    evaluator_group.add_argument('--coordinator', type=str, default=None, help='HOST:PORT to serve the job queue on for workers on other hosts (see --join). Uses --job_queue, default cluster_jobs.db.')
+    evaluator_group.add_argument('--join', type=str, default=None, help='HOST:PORT of a coordinator. Lease and run its jobs with --workers sessions in parallel instead of enumerating a grid.')
+    evaluator_group.add_argument('--shard', type=str, default=None, help='i/N: with --join, run the jobs of shard i (of N) first, e.g. 0/4.')
+    evaluator_group.add_argument('--cluster_authkey', type=str, default=None, help='Shared secret of the coordinator and its workers, default $ORACLE_CLUSTER_AUTHKEY.')
+    evaluator_group.add_argument('--output_root', type=str, default=None, help='Folder logs/, history/ and results/ are written to (default: current folder).')
+    evaluator_group.add_argument('--response_cache', type=str, default=None, help='SQLite file caching the responses of temperature=0 requests (platform generation/polishing, deterministic sessions), so re-runs replay them instead of calling the provider again. Off by default.')
+    evaluator_group.add_argument('--response_cache_mb', type=int, default=1024, help='Size limit of --response_cache in MB; least recently used responses are evicted.')
+    evaluator_group.add_argument('--record_cassettes', type=str, default=None, help='Folder every provider exchange (sessions, platform generation/polishing, test samples) is recorded to, for replay by standin.py.')
+    evaluator_group.add_argument('--provider_base_url', type=str, default=None, help='Send every provider request to this URL instead, e.g. a local stand-in server: python standin.py --cassettes <folder>.')
+    evaluator_group.add_argument('--key_pools', type=str, default=None, help='JSON file with several API keys and/or base URLs per model family, spread over sessions by weight, e.g. {"qwen": [{"api_key_env": "ALIBABA_API_KEY", "weight": 3}, {"base_url": "http://localhost:8000/v1", "api_key": "EMPTY"}]} (see key_pool.py).')
+    evaluator_group.add_argument('--no_prompt_cache', action='store_true', help='Do not mark or store the conversation prefix for provider prompt caching (see prompt_cache.py).')
+    evaluator_group.add_argument('--build_answers', action='store_true', help='Before any session starts, precompute the expected answers of the test samples whose stored answers are missing or stale (see answers.py).')
+    evaluator_group.add_argument('--no_checkpoint_trace', action='store_true', help='Code task: compute the ground truth of every checkpoint question with its own run of the blackbox instead of one traced run per test sample (see ckpt.py).')
+    evaluator_group.add_argument('--solution_timeout', type=float, default=DEFAULT_SOLUTION_TIMEOUT, help='Physics simulation tasks: seconds of wall-clock and CPU time the sandboxed run of a model-written solution may take (see sandbox.py).')
+    evaluator_group.add_argument('--solution_memory_mb', type=int, default=DEFAULT_SOLUTION_MEMORY_MB, help='Physics simulation tasks: address space limit in MB of the sandboxed run of a model-written solution.')
+    evaluator_group.add_argument('--game_sample_workers', type=int, default=1, help='Game task: play up to this many test samples of a session at once, each on its own fork of the conversation after the exploration message (see sample_fork.py). Default 1 plays them one after another.')
+    evaluator_group.add_argument('--context_policy', type=str, default='full', choices=CONTEXT_POLICIES, help='Which past evaluation questions are resent: full (all), collapse_eval (none), budget (drop the oldest once a request exceeds --context_budget tokens). The exploration transcript is always sent in full.')
+    evaluator_group.add_argument('--context_budget', type=int, default=DEFAULT_CONTEXT_BUDGET, help='Token budget of requests with --context_policy budget.')
+    evaluator_group.add_argument('--call_deadline', type=float, default=None, help='Seconds a single LLM call may take before it is abandoned and retried (default: only the client timeout).')
+    evaluator_group.add_argument('--call_retries', type=int, default=DEFAULT_CALL_RETRIES, help='Retries of an LLM call after a transient failure (timeout, connection error, 5xx), with jittered backoff.')
+    evaluator_group.add_argument('--hedge', action='store_true', help="Send a duplicate request when a call has not answered within the model's observed p95 latency, and use whichever answer comes first.")
+    evaluator_group.add_argument('--stream', action='store_true', help='Stream every completion and log time to first token and tokens/s per session.')
+    evaluator_group.add_argument('--early_stop', action='store_true', help='With --stream, end interaction-phase answers of encryption and circuit as soon as a complete answer has arrived (see streaming.py).')
+    evaluator_group.add_argument('--provider_concurrency', type=str, default=None, help='Per-provider limit of in-flight LLM requests with --executor async, e.g. "gpt=64,claude=16,default=32".')
 
     platform_group = parser.add_argument_group('platform')
     platform_group.add_argument('--platformgen_model_family', type=str, default='gemini', choices=['gpt', 'claude', 'gemini'], help='Model family to generate platform.')  # thinking mode for claude
@@ -159,189 +408,204 @@ def main():
 
     test_group = parser.add_argument_group('test_sample_generator')
     test_group.add_argument('--test_sample_generator_model_family', type=str, default='gpt', choices=['gpt'], help='Model family to generate test sample.')
+    platform_group.add_argument('--batch', action='store_true', help="Submit the test sample, platform generation and polish requests of a whole task folder through the providers' batch APIs, one batch per step (see batch.py).")
+    platform_group.add_argument('--batch_poll_seconds', type=float, default=DEFAULT_BATCH_POLL_SECONDS, help='Seconds between status checks of a submitted batch.')
     test_group.add_argument('--test_sample_generator_model_name', type=str, default='gpt-4.1', choices=['gpt-4.1','gpt-4o'], help='Model name to generate test sample.')
 
     args = parser.parse_args()
 
+    if args.output_root:
+        os.environ[OUTPUT_ROOT_ENV] = args.output_root
+        paths = PathManager()
+    if args.response_cache:
+        # inherited by every session process; hits and misses are counted per ORACLE_RUN_ID
+        os.environ[CACHE_ENV] = args.response_cache
+        os.environ[CACHE_MB_ENV] = str(args.response_cache_mb)
+        os.environ.setdefault(RUN_ID_ENV, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    # inherited by every session process
+    os.environ[CONTEXT_POLICY_ENV] = args.context_policy
+    os.environ[CONTEXT_BUDGET_ENV] = str(args.context_budget)
+    os.environ[CALL_RETRIES_ENV] = str(args.call_retries)
+    os.environ[SOLUTION_TIMEOUT_ENV] = str(args.solution_timeout)
+    os.environ[SOLUTION_MEMORY_ENV] = str(args.solution_memory_mb)
+    os.environ[GAME_SAMPLE_WORKERS_ENV] = str(args.game_sample_workers)
+    if args.call_deadline:
+        os.environ[CALL_DEADLINE_ENV] = str(args.call_deadline)
+    if args.hedge:
+        os.environ[HEDGE_ENV] = '1'
+    if args.no_prompt_cache:
+        os.environ[PROMPT_CACHE_ENV] = '0'
+    if args.no_checkpoint_trace:
+        os.environ[CHECKPOINT_TRACE_ENV] = '0'
+    if args.stream:
+        os.environ[STREAM_ENV] = '1'
+        if args.early_stop:
+            os.environ[EARLY_STOP_ENV] = '1'
+    if args.record_cassettes:
+        os.environ[CASSETTE_ENV] = os.path.abspath(args.record_cassettes)
+    if args.provider_base_url:
+        os.environ[BASE_URL_ENV] = args.provider_base_url
+    if args.key_pools:
+        load_key_pools(args.key_pools)  # fail on a broken file before any session starts
+        os.environ[KEY_POOLS_ENV] = os.path.abspath(args.key_pools)
+    cluster_authkey = args.cluster_authkey or os.getenv('ORACLE_CLUSTER_AUTHKEY')
+
+    # cluster worker: run the coordinator's jobs and send their results back, nothing is generated or enumerated here
+    if args.join:
+        if not cluster_authkey:
+            raise ValueError("--join needs the coordinator's --cluster_authkey (or ORACLE_CLUSTER_AUTHKEY).")
+        join_cluster(args.join, cluster_authkey)
+        shard, num_shards = parse_shard(args.shard)
+        queue = RemoteQueue(args.join, cluster_authkey, result_dir_name, shard, num_shards)
+        drain_job_queue(queue, args, paths, args.workers or 15)
+        sys.exit(0)
+
+    # one rate-limit scheduler shared by every black-box session started from here (and by all workers of a cluster)
+    if args.coordinator:
+        if not cluster_authkey:
+            cluster_authkey = os.urandom(16).hex()
+            logging.info(f"Cluster authkey: {cluster_authkey}, pass it to the workers with --cluster_authkey")
+        args.job_queue = args.job_queue or 'cluster_jobs.db'
+        rate_limit_server = start_coordinator(args.coordinator, cluster_authkey, args.job_queue,
+                                              {'eva_mode': args.eva_mode, 'n_runs': args.n_runs}, load_rate_limits(args.rate_limits))
+    else:
+        rate_limit_server = start_scheduler_server(load_rate_limits(args.rate_limits))
+
+    # the black-boxes, their tests and platforms, listed once (see manifest.py)
+    manifest = load_manifest(paths)
+    manifest.report(args.task)
+
     # Step 0: A model must pass through baseline test first
     if args.baseline_test:
-        for task_folder in os.listdir(paths.platform_path):
-            if task_folder == 'code' or task_folder == 'encryption' or task_folder == 'physics':
-                if os.path.isdir(os.path.join(paths.platform_path, task_folder)):
-                    for task_id in os.listdir(paths.platform_path / task_folder / 'baseline'):
-                        if task_id.endswith('.py'):
-                            logging.info(f"Baseline test {task_folder}/{'baseline'}/{task_id}")
-                            result = subprocess.run(
-                                        [
-                                            'python', 
-                                            paths.platform_path / task_folder / 'baseline' / task_id,
-                                            args.eva_model_family,
-                                            map_model_name_to_api_name(args.eva_model_name),
-                                            task_folder,
-                                            args.eva_mode,
-                                            str(1),
-                                            'baseline',
-                                            task_id.replace('_final.py', ''),
-                                            str(0),
-                                            paths.history_path,
-                                            str(12),
-                                            str(1),
-                                            'evaluate',
-                                            str(args.thinking_mode)
-                                        ], 
-                                        capture_output=False, 
-                                        text=True
-                                    )
-                            running_errors = result.stderr if result.returncode != 0 else ''
-                            output = result.stdout
+        for task_folder in ['code', 'encryption', 'physics']:
+            for platform_file in manifest.baseline(task_folder):
+                task_id = os.path.basename(platform_file)
+                logging.info(f"Baseline test {task_folder}/{'baseline'}/{task_id}")
+                output, running_errors, return_code = run_platform(
+                    args.executor,
+                    paths.platform_path / task_folder / 'baseline' / task_id,
+                    platform_args(
+                        args.eva_model_family,
+                        map_model_name_to_api_name(args.eva_model_name),
+                        task_folder,
+                        args.eva_mode,
+                        1,
+                        'baseline',
+                        task_id.replace('_final.py', ''),
+                        0,
+                        paths.history_path,
+                        12,
+                        1,
+                        'evaluate',
+                        args.thinking_mode
+                    )
+                )
+                running_errors = running_errors if return_code != 0 else ''
         sys.exit(0)
     
     # Step 1: generate test samples by task
-    for task_folder in os.listdir(paths.task_path):
-        '''For code, generate test samples in step 2, so skip it here.'''
-        if task_folder != args.task or task_folder == 'code': continue
-        if os.path.isdir(os.path.join(paths.task_path, task_folder)):
-            test_sample_generator = TestSamplesGenerator(
-                task=task_folder, 
-                model_family=args.test_sample_generator_model_family, 
-                model_name=map_model_name_to_api_name(args.test_sample_generator_model_name),
-                max_turns=args.max_turns
+    '''For code, generate test samples in step 2, so skip it here.'''
+    missing_tests = [] if args.task == 'code' else manifest.missing(args.task, pieces=['test'])
+    missing_platforms = manifest.missing(args.task, pieces=['platform'])
+    if args.batch:
+        generate_in_batches(args, paths, missing_tests, missing_platforms)
+        missing_tests = missing_platforms = []
+    if missing_tests:
+        test_sample_generator = TestSamplesGenerator(
+            task=args.task, 
+            model_family=args.test_sample_generator_model_family, 
+            model_name=map_model_name_to_api_name(args.test_sample_generator_model_name),
+            max_turns=args.max_turns
+        )
+        for entry in missing_tests:
+            logging.info(f"Generating test samples for {entry['task']}/{entry['difficulty']}/{entry['task_id']}.json")
+            test_sample_generator.generate(
+                difficulty=entry['difficulty'], 
+                task_id=entry['task_id'],
+                version=None
             )
-            for difficulty_folder in os.listdir(paths.task_path / task_folder):
-                if os.path.isdir(os.path.join(paths.task_path / task_folder, difficulty_folder)):
-                    for task_id in os.listdir(paths.task_path / task_folder / difficulty_folder):
-                        '''For code, generate test samples in step 2, so skip it here.'''
-                        if task_id.endswith('.json') and not os.path.exists(paths.test_path / task_folder / difficulty_folder / task_id):
-                            logging.info(f"Generating test samples for {task_folder}/{difficulty_folder}/{task_id}")
+    
+    # Step 2: use LLM to generate black-box code and player-blackbox interaction platform simutaneously
+    if missing_platforms:
+        task_folder = args.task
+        platform = Platform(
+            task=task_folder, 
+            platformgen_model_family=args.platformgen_model_family, 
+            platformgen_model_name=map_model_name_to_api_name(args.platformgen_model_name),
+        )
+        bug_fixer = PolishModel(
+            task=task_folder,
+            model_family=args.platformpolish_model_family,
+            model_name=map_model_name_to_api_name(args.platformpolish_model_name),
+        )
+        for entry in missing_platforms:
+            difficulty_folder, task_id = entry['difficulty'], entry['task_id'] + '.json'
+            logging.info(f"Generating blackbox and platform for {task_folder}/{difficulty_folder}/{task_id}")
+            if not os.path.exists(paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_final.py'):    # DO NOT overwrite the existing code
+                loop_count = 1
+                platform.generate(
+                    difficulty=difficulty_folder, 
+                    task_id=task_id.replace('.json', ''),
+                    version=loop_count
+                )
+                '''For code, generate test samples here'''
+                if args.task == 'code':
+                    test_sample_generator = TestSamplesGenerator(
+                        task=task_folder, 
+                        model_family=args.test_sample_generator_model_family, 
+                        model_name=map_model_name_to_api_name(args.test_sample_generator_model_name),
+                    )
+                    logging.info(f"Generating test samples for {task_folder}/{difficulty_folder}/{task_id}_v{loop_count}")
+                    test_sample_generator.generate(
+                        difficulty=difficulty_folder, 
+                        task_id=task_id.replace('.json', ''),
+                        version=loop_count
+                    )
+                running_errors = run_generated_platform(args, paths, task_folder, difficulty_folder, task_id.replace('.json', ''), loop_count)
+                
+                while True:
+                    loop_count += 1
+                    if loop_count > args.max_polish_times:
+                        finalize_platform(paths, task_folder, difficulty_folder, task_id.replace('.json', ''), loop_count-1)
+                        break
+                    response = bug_fixer.polish(
+                        task=task_folder, 
+                        difficulty=difficulty_folder, 
+                        task_id=task_id.replace('.json', ''), 
+                        running_errors=running_errors,
+                        version=loop_count
+                    )
+                    
+                    if response == 'correct':
+                        finalize_platform(paths, task_folder, difficulty_folder, task_id.replace('.json', ''), loop_count-1)
+                        break
+                    else:
+                        if args.task == 'code':
+                            logging.info(f"Generating test samples for {task_folder}/{difficulty_folder}/{task_id}_v{loop_count}")
                             test_sample_generator.generate(
                                 difficulty=difficulty_folder, 
                                 task_id=task_id.replace('.json', ''),
-                                version=None
+                                version=loop_count
                             )
-    
-    # Step 2: use LLM to generate black-box code and player-blackbox interaction platform simutaneously
-    for task_folder in os.listdir(paths.task_path):
-        if task_folder != args.task: continue
-        if os.path.isdir(os.path.join(paths.task_path, task_folder)):
-            platform = Platform(
-                task=task_folder, 
-                platformgen_model_family=args.platformgen_model_family, 
-                platformgen_model_name=map_model_name_to_api_name(args.platformgen_model_name),
-            )
-            bug_fixer = PolishModel(
-                task=task_folder,
-                model_family=args.platformpolish_model_family,
-                model_name=map_model_name_to_api_name(args.platformpolish_model_name),
-            )
-            for difficulty_folder in os.listdir(paths.task_path / task_folder):
-                if os.path.isdir(os.path.join(paths.task_path / task_folder, difficulty_folder)):
-                    for task_id in os.listdir(paths.task_path / task_folder / difficulty_folder):
-                        if task_id.endswith('.json'):
-                            logging.info(f"Generating blackbox and platform for {task_folder}/{difficulty_folder}/{task_id}")
-                            if not os.path.exists(paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_final.py'):    # DO NOT overwrite the existing code
-                                loop_count = 1
-                                platform.generate(
-                                    difficulty=difficulty_folder, 
-                                    task_id=task_id.replace('.json', ''),
-                                    version=loop_count
-                                )
-                                '''For code, generate test samples here'''
-                                if args.task == 'code':
-                                    test_sample_generator = TestSamplesGenerator(
-                                        task=task_folder, 
-                                        model_family=args.test_sample_generator_model_family, 
-                                        model_name=map_model_name_to_api_name(args.test_sample_generator_model_name),
-                                    )
-                                    logging.info(f"Generating test samples for {task_folder}/{difficulty_folder}/{task_id}_v{loop_count}")
-                                    test_sample_generator.generate(
-                                        difficulty=difficulty_folder, 
-                                        task_id=task_id.replace('.json', ''),
-                                        version=loop_count
-                                    )
-                                logging.info(f"Generation: Running {task_id.replace('.json', '')}_v{loop_count}.py")
-                                result = subprocess.run(
-                                    [
-                                        'python', 
-                                        paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_v{loop_count}.py',
-                                        args.eva_model_family,
-                                        map_model_name_to_api_name(args.eva_model_name),
-                                        task_folder,
-                                        args.eva_mode,
-                                        str(args.n_runs),
-                                        difficulty_folder,
-                                        task_id.replace('.json', ''),
-                                        str(args.k),
-                                        paths.logs_path,
-                                        str(args.max_turns),
-                                        str(loop_count),
-                                        'generate',
-                                        str(args.thinking_mode)
-                                    ], 
-                                    capture_output=True, 
-                                    text=True
-                                )
-                                running_errors = result.stderr if result.returncode != 0 else ''
-                                
-                                while True:
-                                    loop_count += 1
-                                    if loop_count > args.max_polish_times:
-                                        os.rename(
-                                            paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_v{loop_count-1}.py',
-                                            paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_final.py'
-                                        )
-                                        break
-                                    response = bug_fixer.polish(
-                                        task=task_folder, 
-                                        difficulty=difficulty_folder, 
-                                        task_id=task_id.replace('.json', ''), 
-                                        running_errors=running_errors,
-                                        version=loop_count
-                                    )
-                                    
-                                    if response == 'correct':
-                                        os.rename(
-                                            paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_v{loop_count-1}.py',
-                                            paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_final.py'
-                                        )
-                                        break
-                                    else:
-                                        if args.task == 'code':
-                                            logging.info(f"Generating test samples for {task_folder}/{difficulty_folder}/{task_id}_v{loop_count}")
-                                            test_sample_generator.generate(
-                                                difficulty=difficulty_folder, 
-                                                task_id=task_id.replace('.json', ''),
-                                                version=loop_count
-                                            )
-                                        result = subprocess.run(
-                                            [
-                                                'python', 
-                                                paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_v{loop_count}.py',
-                                                args.eva_model_family,
-                                                map_model_name_to_api_name(args.eva_model_name),
-                                                task_folder,
-                                                args.eva_mode,
-                                                str(args.n_runs),
-                                                difficulty_folder,
-                                                task_id.replace('.json', ''),
-                                                str(args.k),
-                                                paths.logs_path,
-                                                str(args.max_turns),
-                                                str(loop_count),
-                                                'generate',
-                                                str(args.thinking_mode)
-                                            ], 
-                                            capture_output=True, 
-                                            text=True
-                                        )
-                                        running_errors = result.stderr if result.returncode != 0 else ''
+                        running_errors = run_generated_platform(args, paths, task_folder, difficulty_folder, task_id.replace('.json', ''), loop_count)
 
     # Step 3: benchmark models
+    # black-boxes still lacking a test or platform after steps 1-2 are reported and left out, before any session starts
+    manifest = load_manifest(paths)
+    incomplete = manifest.missing(args.task, pieces=['test', 'platform'])
+    for entry in incomplete:
+        logging.warning(f"Skipping {entry['task']}/{entry['difficulty']}/{entry['task_id']}: no {', '.join(entry['missing'])}")
+    runnable = [entry for entry in manifest.select(args.task) if entry not in incomplete]
+    if args.build_answers:
+        build_answers(runnable, paths)
     if args.eva_model_family == 'all':
         assert args.eva_mode == 'concurrent'
         if args.eva_model_name:
             raise ValueError(f"Model name {args.eva_model_name} is not valid when model family is set as all.")
 
         tasks_to_run = []
+        queue_jobs = []
+        durations = DurationStore()
         all_model_family = []
         for action in parser._actions:
             if action.dest == 'eva_model_family':
@@ -353,104 +617,175 @@ def main():
         for family in all_model_family:
             models = get_model_name(family)
             for model in models:
-                task_folder_path = paths.task_path / args.task
-                if not os.path.isdir(task_folder_path):
+                if not manifest.select(args.task):
                     logging.warning(f"Task folder {args.task} not found. Skipping.")
                     continue
 
-                for difficulty_folder in os.listdir(task_folder_path):
-                    difficulty_folder_path = task_folder_path / difficulty_folder
-                    if os.path.isdir(difficulty_folder_path):
-                        for task_id_file in os.listdir(difficulty_folder_path):
-                            if task_id_file.endswith('.json'):
-                                task_id_stem = task_id_file.replace('.json', '')
-                                if 'thinking' in model:
-                                    args.thinking_mode = True
-                                else:
-                                    args.thinking_mode = False
-                                task_params = (
-                                    family,
-                                    model.replace('_thinking', ''),
-                                    args.task, # task_folder
-                                    args.eva_mode,
-                                    args.n_runs,
-                                    difficulty_folder,
-                                    task_id_stem,
-                                    args.k,
-                                    paths.history_path,
-                                    args.max_turns,
-                                    args.thinking_mode,
-                                    paths.platform_path,
-                                )
-                                if args.thinking_mode:
-                                    if not os.path.exists(os.path.join('results', args.task, difficulty_folder, task_id_stem, map_model_name_to_api_name(model.replace('_thinking', ''))+'_thinking')):
-                                        tasks_to_run.append(task_params)
-                                else:
-                                    if not os.path.exists(os.path.join('results', args.task, difficulty_folder, task_id_stem, map_model_name_to_api_name(model))):
-                                        tasks_to_run.append(task_params)
+                for entry in runnable:
+                    difficulty_folder, task_id_stem = entry['difficulty'], entry['task_id']
+                    if 'thinking' in model:
+                        args.thinking_mode = True
+                    else:
+                        args.thinking_mode = False
+                    task_params = (
+                        family,
+                        model.replace('_thinking', ''),
+                        args.task, # task_folder
+                        args.eva_mode,
+                        args.n_runs,
+                        difficulty_folder,
+                        task_id_stem,
+                        args.k,
+                        paths.history_path,
+                        args.max_turns,
+                        args.thinking_mode,
+                        paths.platform_path,
+                        args.executor,
+                    )
+                    if args.job_queue:
+                        for run in range(1, args.n_runs+1):
+                            queue_jobs.append(dict(model_family=family, model_name=model.replace('_thinking', ''), thinking_mode=args.thinking_mode,
+                                                   task=args.task, difficulty=difficulty_folder, task_id=task_id_stem, run=run, k=args.k, max_turns=args.max_turns,
+                                                   priority=durations.estimate(map_model_name_to_api_name(model.replace('_thinking', '')), args.thinking_mode, args.task, difficulty_folder, task_id_stem)))
+                    elif args.thinking_mode:
+                        if not os.path.exists(os.path.join(paths.result_path, args.task, difficulty_folder, task_id_stem, map_model_name_to_api_name(model.replace('_thinking', ''))+'_thinking')):
+                            tasks_to_run.append(task_params)
+                    else:
+                        if not os.path.exists(os.path.join(paths.result_path, args.task, difficulty_folder, task_id_stem, map_model_name_to_api_name(model))):
+                            tasks_to_run.append(task_params)
 
+        # longest jobs first, so the pool does not wait on a few long thinking/hard sessions at the end
+        tasks_to_run = durations.longest_first(tasks_to_run, key=lambda task_params: (
+            map_model_name_to_api_name(task_params[1]), task_params[10], task_params[2], task_params[5], task_params[6]))
         print(tasks_to_run)
-        if not tasks_to_run:
+        if args.job_queue:
+            queue = JobQueue(args.job_queue)
+            logging.info(f"Added {queue.enqueue(queue_jobs)} of {len(queue_jobs)} jobs to {args.job_queue}, queue status: {queue.counts()}")
+            if args.coordinator:
+                wait_for_cluster(rate_limit_server)
+            else:
+                drain_job_queue(queue, args, paths, args.workers or 15)
+        elif not tasks_to_run:
             logging.info("No tasks found to evaluate.")
         else:
-            num_processes = 15
+            num_processes = args.workers or 15
             logging.info(f"\nCollected {len(tasks_to_run)} tasks. Starting evaluation using {num_processes} concurrent processes...")
-            with multiprocessing.Pool(processes=num_processes) as pool:
-                results = pool.starmap(run_evaluation, tasks_to_run)
+            # results stream in completion order, with a progress line per finished session
+            results = []
+            def report(finished):
+                task_params, (task_identifier, output, running_errors, return_code) = finished
+                results.append(finished)
+                stderr_file = job_log_files(paths.logs_path, task_params[2], task_params[5], task_params[6],
+                                            result_dir_name(dict(model_name=task_params[1], thinking_mode=task_params[10])), 1)[1]   # these jobs use run_evaluation's default version
+                tracker.log(task_params[0], task_identifier, return_code, stderr_file)
+            tracker = ProgressTracker(len(tasks_to_run))
+            tracker.report_every()
+            try:
+                if args.executor == 'async':
+                    def tracked_job(task_params):
+                        tracker.started(task_params[0])
+                        return run_evaluation_job(task_params)
+                    engine = AsyncEngine(args.max_sessions, parse_provider_concurrency(args.provider_concurrency))
+                    engine.run(tracked_job, [(task_params,) for task_params in tasks_to_run], task_of=lambda job: job[0][2], on_done=report)
+                else:
+                    initializer = init_worker if args.executor == 'worker' else None
+                    with multiprocessing.Pool(processes=num_processes, initializer=initializer) as pool:
+                        # one thread per process hands out the jobs, so a job is counted as running when a process actually takes it
+                        def tracked_job(task_params):
+                            tracker.started(task_params[0])
+                            return pool.apply(run_evaluation_job, (task_params,))
+                        with ThreadPool(num_processes) as threads:
+                            for finished in threads.imap_unordered(tracked_job, tasks_to_run):   # one job at a time keeps the longest-first order
+                                report(finished)
+            finally:
+                tracker.stop()
 
             print("\n--- All evaluations completed. Final Results: ---")
-            for task_identifier, output, running_errors, return_code in results:
-                print("=" * 80)
-                print(f"Task: {task_identifier}")
-                print(f"Return Code: {return_code}")
-                print("-" * 20 + " STDOUT " + "-" * 20)
-                print(output)
-                if running_errors:
-                    print("-" * 20 + " STDERR " + "-" * 20)
+            print(tracker.line())
+            for task_params, (task_identifier, output, running_errors, return_code) in results:
+                if return_code != 0:
+                    print(f"FAILED (return code {return_code}): {task_identifier}")
                     print(running_errors)
-                print("=" * 80 + "\n")
+            print(f"Session stdout/stderr: {paths.logs_path / 'jobs'}")
+            logging.info(f"Rate-limit scheduler: {get_scheduler().stats()}")
+            if args.executor == 'async':
+                logging.info(f"Request latency (cold/warm connections): {latency_summary()}")
         # merge results
         
     else:
         # benchmark models
+        jobs = []
+        queue_jobs = []
+        durations = DurationStore()
         for i in range(args.n_runs):
-            for task_folder in os.listdir(paths.task_path):
-                if task_folder != args.task: continue
-                if os.path.isdir(os.path.join(paths.task_path, task_folder)):
-                    for difficulty_folder in os.listdir(paths.task_path / task_folder):
-                        if args.difficulty != None and difficulty_folder != args.difficulty: continue
-                        if os.path.isdir(os.path.join(paths.task_path / task_folder, difficulty_folder)):
-                            for task_id in os.listdir(paths.task_path / task_folder / difficulty_folder):
-                                if task_id.endswith('.json'):
-                                    if args.task_id != None:
-                                        if task_id != args.task_id:
-                                            continue
-                                    logging.info(f"Evaluating {task_folder}/{difficulty_folder}/{task_id}")
-                                    result = subprocess.run(
-                                                [
-                                                    'python', 
-                                                    paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_final.py',
-                                                    args.eva_model_family,
-                                                    map_model_name_to_api_name(args.eva_model_name),
-                                                    task_folder,
-                                                    args.eva_mode,
-                                                    str(args.n_runs),
-                                                    difficulty_folder,
-                                                    task_id.replace('.json', ''),
-                                                    str(args.k),
-                                                    paths.history_path,
-                                                    str(args.max_turns),
-                                                    str(i+1),
-                                                    'evaluate',
-                                                    str(args.thinking_mode)
-                                                ], 
-                                                capture_output=False, 
-                                                text=True
-                                            )
-                                    running_errors = result.stderr if result.returncode != 0 else ''
-                                    print(running_errors)
-                                    output = result.stdout
-                                    print(output)
+            for entry in runnable:
+                if args.difficulty != None and entry['difficulty'] != args.difficulty: continue
+                if args.task_id != None and entry['task_id'] + '.json' != args.task_id: continue
+                task_folder, difficulty_folder, task_id = entry['task'], entry['difficulty'], entry['task_id'] + '.json'
+                if args.job_queue:
+                    queue_jobs.append(dict(model_family=args.eva_model_family, model_name=args.eva_model_name, thinking_mode=args.thinking_mode,
+                                           task=task_folder, difficulty=difficulty_folder, task_id=task_id.replace('.json', ''), run=i+1, k=args.k, max_turns=args.max_turns,
+                                           priority=durations.estimate(map_model_name_to_api_name(args.eva_model_name), args.thinking_mode, task_folder, difficulty_folder, task_id.replace('.json', ''))))
+                    continue
+                jobs.append((
+                    args.executor,
+                    paths.platform_path / task_folder / difficulty_folder / f'{task_id.replace(".json", "")}_final.py',
+                    platform_args(
+                        args.eva_model_family,
+                        map_model_name_to_api_name(args.eva_model_name),
+                        task_folder,
+                        args.eva_mode,
+                        args.n_runs,
+                        difficulty_folder,
+                        task_id.replace('.json', ''),
+                        args.k,
+                        paths.history_path,
+                        args.max_turns,
+                        i+1,
+                        'evaluate',
+                        args.thinking_mode
+                    )
+                ))
+
+        if args.executor == 'async' or (args.workers and args.workers > 1):
+            # longest jobs first when sessions run in parallel
+            jobs = durations.longest_first(jobs, key=lambda job: platform_duration_key(job[2]))
+
+        if args.job_queue:
+            queue = JobQueue(args.job_queue)
+            logging.info(f"Added {queue.enqueue(queue_jobs)} of {len(queue_jobs)} jobs to {args.job_queue}, queue status: {queue.counts()}")
+            if args.coordinator:
+                wait_for_cluster(rate_limit_server)
+            else:
+                drain_job_queue(queue, args, paths, args.workers or 1)
+        elif args.executor == 'async':
+            engine = AsyncEngine(args.max_sessions, parse_provider_concurrency(args.provider_concurrency))
+            results = engine.run(run_platform, jobs, task_of=lambda job: job[2][2])
+            for output, running_errors, return_code in results:
+                running_errors = running_errors if return_code != 0 else ''
+                print(running_errors)
+                print(output)
+        elif args.workers and args.workers > 1:
+            # sessions (including the n_runs repetitions) run concurrently, output is still printed in job order
+            if args.executor == 'worker':
+                pool = multiprocessing.Pool(processes=args.workers, initializer=init_worker)
+            else:
+                pool = ThreadPool(args.workers)
+            with pool:
+                # captured, otherwise the sessions write to the terminal at the same time and nothing is left to print in order
+                for output, running_errors, return_code in pool.imap(partial(run_platform_job, capture_output=True), jobs):
+                    running_errors = running_errors if return_code != 0 else ''
+                    print(running_errors)
+                    print(output)
+        else:
+            for job in jobs:
+                output, running_errors, return_code = run_platform_job(job)
+                running_errors = running_errors if return_code != 0 else ''
+                print(running_errors)
+                print(output)
+
+    if get_response_cache() is not None:
+        logging.info(f"Response cache ({os.environ[RUN_ID_ENV]}): {get_response_cache().stats()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+import logging
+from paths import PathManager
+
+'''
+Index of every black-box: (task, difficulty, task_id) with its task JSON, test JSON and `_final.py` platform, their
+content hashes, and which of the three are missing.
+
+Walking task/, test/ and platforms/ is done once and cached in logs/manifest.json. The cache is valid as long as no
+directory of the three trees changed its mtime (adding, removing or renaming a file does that) and every indexed file
+still has the size and mtime it was hashed with (an in-place edit changes neither directory); content hashes are only
+recomputed for files whose size or mtime changed. Pass refresh=True to rebuild from scratch.
+'''
+
+MANIFEST_VERSION = 1
+PIECES = ['task', 'test', 'platform']
+
+
+def _sha1(file):
+    with open(file, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _subdirs(path):
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)) and name != '__pycache__')
+
+
+class Manifest:
+    def __init__(self, entries, baselines):
+        self.entries = entries
+        self.baselines = baselines
+
+    def select(self, task=None, difficulty=None, task_id=None):
+        '''entries in (task, difficulty, task_id) order, filtered by any of the three'''
+        return [entry for entry in self.entries
+                if (task is None or entry['task'] == task)
+                and (difficulty is None or entry['difficulty'] == difficulty)
+                and (task_id is None or entry['task_id'] == task_id)]
+
+    def missing(self, task=None, difficulty=None, task_id=None, pieces=PIECES):
+        '''entries lacking any of `pieces`'''
+        return [entry for entry in self.select(task, difficulty, task_id) if set(entry['missing']) & set(pieces)]
+
+    def baseline(self, task):
+        '''platform files of the baseline black-boxes of a task'''
+        return self.baselines.get(task, [])
+
+    def report(self, task=None, difficulty=None, task_id=None):
+        '''log what is missing, before any model is called'''
+        missing = self.missing(task, difficulty, task_id)
+        for entry in missing:
+            logging.warning(f"Manifest: {entry['task']}/{entry['difficulty']}/{entry['task_id']} has no {', '.join(entry['missing'])}")
+        logging.info(f"Manifest: {len(self.select(task, difficulty, task_id))} black-boxes, {len(missing)} incomplete")
+        return missing
+
+
+class ManifestBuilder:
+    def __init__(self, paths=None, cache_file=None):
+        self.paths = paths or PathManager()
+        self.cache_file = str(cache_file or self.paths.logs_path / 'manifest.json')
+
+    def directory_mtimes(self):
+        '''mtime of every directory whose listing the manifest depends on'''
+        mtimes = {}
+        for root in (self.paths.task_path, self.paths.test_path, self.paths.platform_path):
+            if not os.path.isdir(root):
+                continue
+            mtimes[str(root)] = os.stat(root).st_mtime_ns
+            for task in _subdirs(root):
+                mtimes[str(root / task)] = os.stat(root / task).st_mtime_ns
+                for difficulty in _subdirs(root / task):
+                    mtimes[str(root / task / difficulty)] = os.stat(root / task / difficulty).st_mtime_ns
+        return mtimes
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('version') == MANIFEST_VERSION:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def build(self, old_files=None):
+        '''walk the three trees; `old_files` (path -> [mtime_ns, size, sha1]) lets unchanged files keep their hash'''
+        old_files = old_files or {}
+        files = {}
+
+        def fingerprint(file):
+            if not os.path.isfile(file):
+                return None
+            stat = os.stat(file)
+            old = old_files.get(str(file))
+            if old is not None and old[0] == stat.st_mtime_ns and old[1] == stat.st_size:
+                files[str(file)] = old
+            else:
+                files[str(file)] = [stat.st_mtime_ns, stat.st_size, _sha1(file)]
+            return files[str(file)][2]
+
+        entries = []
+        for task in _subdirs(self.paths.task_path):
+            for difficulty in _subdirs(self.paths.task_path / task):
+                for task_file in sorted(os.listdir(self.paths.task_path / task / difficulty)):
+                    if not task_file.endswith('.json'):
+                        continue
+                    task_id = task_file[:-len('.json')]
+                    entry = {
+                        'task': task, 'difficulty': difficulty, 'task_id': task_id,
+                        'task_file': str(self.paths.task_path / task / difficulty / task_file),
+                        'test_file': str(self.paths.test_path / task / difficulty / task_file),
+                        'platform_file': str(self.paths.platform_path / task / difficulty / f'{task_id}_final.py'),
+                    }
+                    entry['hashes'] = {piece: fingerprint(entry[f'{piece}_file']) for piece in PIECES}
+                    entry['missing'] = [piece for piece in PIECES if entry['hashes'][piece] is None]
+                    entries.append(entry)
+
+        baselines = {}
+        for task in _subdirs(self.paths.platform_path):
+            if os.path.isdir(self.paths.platform_path / task / 'baseline'):
+                baselines[task] = [str(self.paths.platform_path / task / 'baseline' / name)
+                                   for name in sorted(os.listdir(self.paths.platform_path / task / 'baseline')) if name.endswith('.py')]
+        return entries, baselines, files
+
+    def files_unchanged(self, files):
+        '''every file of the cache (path -> [mtime_ns, size, sha1]) still has the mtime and size it was hashed with'''
+        for file, (mtime_ns, size, _) in files.items():
+            try:
+                stat = os.stat(file)
+            except OSError:
+                return False
+            if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+                return False
+        return True
+
+    def load(self, refresh=False):
+        mtimes = self.directory_mtimes()
+        cache = None if refresh else self.load_cache()
+        if cache is not None and cache['directories'] == mtimes and self.files_unchanged(cache['files']):
+            return Manifest(cache['entries'], cache['baselines'])
+
+        entries, baselines, files = self.build(cache['files'] if cache is not None else None)
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = f"{self.cache_file}.{os.getpid()}.tmp"   # several launchers may rebuild at once
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'directories': mtimes, 'files': files, 'entries': entries, 'baselines': baselines}, f)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            logging.warning(f"Could not write the manifest cache {self.cache_file}: {e}")
+        return Manifest(entries, baselines)
+
+
+def load_manifest(paths=None, refresh=False):
+    return ManifestBuilder(paths).load(refresh)
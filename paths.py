@@ -1,9 +1,14 @@
+import os
 from pathlib import Path
 
+# where logs/, history/ and results/ are written, '.' by default. A cluster worker sets it (main.py --output_root) so its local copies do not mix with the coordinator's tree.
+OUTPUT_ROOT_ENV = 'ORACLE_OUTPUT_ROOT'
+
 class PathManager:
     def __init__(self):
         self.base_path = '.'
         self.base_path = Path(self.base_path)
+        self.output_path = Path(os.getenv(OUTPUT_ROOT_ENV, self.base_path))
 
         # paths for test
         self.test_path = self.base_path / 'test'
@@ -14,14 +19,17 @@ class PathManager:
         # paths for platform
         self.platform_path = self.base_path / 'platforms'
 
+        # paths for precomputed answers of the test samples
+        self.answer_path = self.base_path / 'answers'
+
         # paths for logs
-        self.logs_path = self.base_path / 'logs'
+        self.logs_path = self.output_path / 'logs'
         
         # paths for interaction history
-        self.history_path = self.base_path / 'history'
+        self.history_path = self.output_path / 'history'
 
         # paths for results
-        self.result_path = self.base_path / 'results'
+        self.result_path = self.output_path / 'results'
 
         # paths for baseline
         self.baseline_path = self.base_path / 'baseline'
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import time
+import logging
+import threading
+
+'''
+Live progress of a grid: one line per finished session with done/failed/running counts, throughput and ETA,
+plus failures per model family so a failing provider shows up in the first minutes rather than at the end.
+Sessions are counted as running from the moment they start, and the line is also logged every PROGRESS_SECONDS,
+so a provider whose sessions are stuck or slow shows up (as running sessions of that family) before the next one ends.
+'''
+
+PROGRESS_SECONDS = 60
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def job_log_files(logs_path, task, difficulty, task_id, name, version):
+    '''(stdout file, stderr file) of one session under logs/jobs/'''
+    stem = os.path.join(logs_path, 'jobs', task, difficulty, task_id, f"{name}_run{version}")
+    return stem + '.stdout', stem + '.stderr'
+
+
+def save_job_output(logs_path, task, difficulty, task_id, name, version, output, running_errors):
+    '''write what a session printed as soon as it ends; returns the stderr file'''
+    stdout_file, stderr_file = job_log_files(logs_path, task, difficulty, task_id, name, version)
+    os.makedirs(os.path.dirname(stderr_file), exist_ok=True)
+    with open(stdout_file, 'w', encoding='utf-8') as f:
+        f.write(output or '')
+    with open(stderr_file, 'w', encoding='utf-8') as f:
+        f.write(running_errors or '')
+    return stderr_file
+
+
+class ProgressTracker:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.running_by_family = {}
+        self.failed_by_family = {}
+        self.start = time.time()
+        self.lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def started(self, family):
+        with self.lock:
+            self.running_by_family[family] = self.running_by_family.get(family, 0) + 1
+
+    def finish(self, family, return_code):
+        with self.lock:
+            if self.running_by_family.get(family):
+                self.running_by_family[family] -= 1
+            if return_code == 0:
+                self.done += 1
+            else:
+                self.failed += 1
+                self.failed_by_family[family] = self.failed_by_family.get(family, 0) + 1
+
+    def line(self):
+        with self.lock:
+            finished = self.done + self.failed
+            running = sum(self.running_by_family.values())
+            elapsed = time.time() - self.start
+            per_minute = finished / elapsed * 60 if elapsed > 0 else 0
+            eta = format_duration((self.total - finished) / per_minute * 60) if per_minute > 0 else '?'
+            failures = ', '.join(f"{family} {n}" for family, n in sorted(self.failed_by_family.items()))
+            running_families = ', '.join(f"{family} {n}" for family, n in sorted(self.running_by_family.items()) if n)
+            return (f"[{finished}/{self.total}] done {self.done}, failed {self.failed}{f' ({failures})' if failures else ''}, "
+                    f"running {running}{f' ({running_families})' if running_families else ''}, {per_minute:.1f} sessions/min, "
+                    f"elapsed {format_duration(elapsed)}, ETA {eta}")
+
+    def log(self, family, task_identifier, return_code, log_file=None):
+        '''record a finished session and print the progress line'''
+        self.finish(family, return_code)
+        status = 'ok' if return_code == 0 else f"FAILED (return code {return_code}, see {log_file})"
+        logging.info(f"{self.line()} | {task_identifier}: {status}")
+
+    def report_every(self, seconds=PROGRESS_SECONDS):
+        '''log the progress line every `seconds` until stop()'''
+        def tick():
+            while not self._stopped.wait(seconds):
+                logging.info(self.line())
+        threading.Thread(target=tick, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import logging
+from lazy_imports import LazyModule
+from clients import get_client
+from response_cache import canonicalize
+from cassettes import conversation_texts
+
+'''
+Provider prompt caching for the growing prefix of multi-turn sessions.
+
+Every turn resends the system prompt, the task intro and all earlier turns. The request is rewritten just before
+it is sent (the response cache and the cassettes still key on the plain request) so providers can serve that prefix
+from their prompt cache:
+
+* claude: cache_control breakpoints after the system prompt and on the newest message. Each turn reads the whole
+  conversation so far from the cache and only writes its own new turn.
+* gpt: caching is automatic for prompts over 1024 tokens; a prompt_cache_key derived from the session opening
+  routes every run of the same black-box to the same cache.
+* gemini: the conversation before the newest message is stored as cached content once it is long enough to be
+  cached, and refreshed after every REFRESH_TOKENS new tokens. Requests then only carry the uncached tail.
+
+qwen, deepseek and llama (OpenRouter) cache prefixes automatically. For every family, split_input_tokens() reads
+the cached and uncached input tokens off the provider's usage, so sessions can report their cache hit rate.
+Prompt caching is on by default; main.py --no_prompt_cache sets ORACLE_PROMPT_CACHE=0.
+'''
+
+genai_types = LazyModule('google.genai.types')
+
+PROMPT_CACHE_ENV = 'ORACLE_PROMPT_CACHE'
+EPHEMERAL = {'type': 'ephemeral'}
+
+GEMINI_MIN_TOKENS = {'pro': 4096, 'default': 1024}     # smallest prefix Gemini accepts as cached content
+REFRESH_TOKENS = 2048       # re-cache the gemini prefix once this many tokens have been added after it
+GEMINI_CACHE_TTL = 900      # seconds; sessions are short, so caches are left to expire
+
+
+def prompt_cache_enabled():
+    return os.getenv(PROMPT_CACHE_ENV, '1') != '0'
+
+
+def anthropic_breakpoints(request):
+    '''copy of a messages request with cache breakpoints on the system prompt and on the newest message'''
+    request = dict(request)
+    if isinstance(request.get('system'), str) and request['system']:
+        request['system'] = [{'type': 'text', 'text': request['system'], 'cache_control': EPHEMERAL}]
+    messages = list(request['messages'])
+    last = dict(messages[-1])
+    if isinstance(last['content'], str):
+        content = [{'type': 'text', 'text': last['content']}]
+    else:
+        content = [dict(block) for block in last['content']]
+    content[-1] = dict(content[-1], cache_control=EPHEMERAL)
+    last['content'] = content
+    messages[-1] = last
+    request['messages'] = messages
+    return request
+
+
+def openai_cache_key(request):
+    '''copy of a gpt request with a prompt_cache_key shared by every session that opens the same way'''
+    texts = conversation_texts(request)[:2]     # system prompt and task intro
+    key = hashlib.sha256(json.dumps([request.get('model'), texts], ensure_ascii=False).encode('utf-8')).hexdigest()[:32]
+    # sent as extra_body, which every version of the openai SDK passes through
+    return dict(request, extra_body=dict(request.get('extra_body') or {}, prompt_cache_key=key))
+
+
+def _estimate_tokens(texts):
+    return sum(len(text) for text in texts) // 4
+
+
+def _fingerprint(contents):
+    return hashlib.sha256(json.dumps(canonicalize(contents), sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class GeminiPrefixCache:
+    '''explicit cached content for one gemini session: the conversation up to, not including, the newest message'''
+    def __init__(self, model_name, client=None):
+        self.model_name = model_name
+        self.client = client        # the session's client: cached content belongs to the API key that created it
+        self.name = None
+        self.length = 0             # number of messages in the cached prefix
+        self.fingerprint = None
+        self.tokens = 0
+        self.disabled = False
+        self.min_tokens = GEMINI_MIN_TOKENS['pro'] if 'pro' in model_name else GEMINI_MIN_TOKENS['default']
+
+    def _matches(self, contents):
+        return self.name is not None and len(contents) > self.length and _fingerprint(contents[:self.length]) == self.fingerprint
+
+    def _create(self, prefix, config):
+        client = self.client or get_client('gemini')
+        try:
+            cache = client.caches.create(
+                model=self.model_name,
+                config=genai_types.CreateCachedContentConfig(
+                    contents=prefix,
+                    system_instruction=config.system_instruction,
+                    ttl=f'{GEMINI_CACHE_TTL}s',
+                )
+            )
+        except Exception as e:
+            # e.g. a model without explicit caching; the session goes on uncached (gemini 2.5 still caches implicitly)
+            logging.warning(f"Gemini prompt cache disabled for this session: {e}")
+            self.disabled = True
+            return
+        old_name, self.name = self.name, cache.name
+        self.length = len(prefix)
+        self.fingerprint = _fingerprint(prefix)
+        if old_name is not None:
+            try:
+                client.caches.delete(name=old_name)
+            except Exception:
+                pass    # it expires after GEMINI_CACHE_TTL anyway
+
+    def apply(self, request):
+        '''the request to send: the cached prefix replaced by a reference to it, when there is one'''
+        contents, config = request['contents'], request['config']
+        if self.disabled or len(contents) < 2:
+            return request
+        prefix = contents[:-1]
+        prefix_tokens = _estimate_tokens(conversation_texts({'contents': prefix})) + _estimate_tokens([config.system_instruction or ''])
+        if self._matches(contents):
+            if prefix_tokens - self.tokens >= REFRESH_TOKENS:
+                self._create(prefix, config)
+                self.tokens = prefix_tokens
+        elif prefix_tokens >= self.min_tokens:
+            # no cache yet, or the prefix changed (a filtered format mistake): cache the conversation so far
+            self._create(prefix, config)
+            self.tokens = prefix_tokens
+        if self.disabled or not self._matches(contents):
+            return request
+        config = config.model_copy(update={'cached_content': self.name, 'system_instruction': None})
+        return dict(request, contents=contents[self.length:], config=config)
+
+
+def _get(usage, name):
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+def split_input_tokens(model_family, usage):
+    '''(cached, uncached) input tokens in a provider's usage report, None if it does not say'''
+    if usage is None:
+        return None
+    if model_family == 'claude':
+        if _get(usage, 'input_tokens') is None:
+            return None
+        cached = _get(usage, 'cache_read_input_tokens') or 0
+        return cached, _get(usage, 'input_tokens') + (_get(usage, 'cache_creation_input_tokens') or 0)
+    if model_family == 'gemini':
+        total = _get(usage, 'prompt_token_count')
+        if total is None:
+            return None
+        cached = _get(usage, 'cached_content_token_count') or 0
+        return cached, total - cached
+    if model_family == 'deepseek' and _get(usage, 'prompt_cache_hit_tokens') is not None:
+        return _get(usage, 'prompt_cache_hit_tokens'), _get(usage, 'prompt_cache_miss_tokens') or 0
+    total, details = _get(usage, 'prompt_tokens'), _get(usage, 'prompt_tokens_details')
+    if total is None:   # openai responses API
+        total, details = _get(usage, 'input_tokens'), _get(usage, 'input_tokens_details')
+    if total is None:
+        return None
+    cached = (_get(details, 'cached_tokens') if details is not None else 0) or 0
+    return cached, total - cached
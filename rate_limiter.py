@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+from multiprocessing.managers import BaseManager
+
+'''
+Central per-provider rate-limit scheduler.
+
+Every ReasoningLLM.normal_output call asks the scheduler for permission before it talks to a provider:
+    * each provider has a requests-per-minute and a tokens-per-minute token bucket
+    * a 429 (or Retry-After header) pauses the provider and shrinks its effective rate, which then recovers
+      slowly with every successful call
+    * sessions waiting on the same provider are served least-served-first, so a chatty session cannot starve the others
+
+main.py serves one scheduler for all platform processes through a multiprocessing manager; processes find it via
+the ORACLE_RATE_LIMIT_ADDRESS / ORACLE_RATE_LIMIT_AUTHKEY environment variables. Without them a process-local
+scheduler is used.
+'''
+
+# rpm: requests per minute, tpm: tokens per minute, None means unlimited. Override with --rate_limits <json file>.
+DEFAULT_RATE_LIMITS = {
+    'gpt': {'rpm': 5000, 'tpm': 2000000},
+    'claude': {'rpm': 1000, 'tpm': 400000},
+    'gemini': {'rpm': 1000, 'tpm': 1000000},
+    'qwen': {'rpm': 600, 'tpm': 1000000},
+    'deepseek': {'rpm': None, 'tpm': None},
+    'llama': {'rpm': 600, 'tpm': None},
+}
+
+MIN_RATE_SCALE = 0.1     # never throttle a provider below 10% of its configured quota
+RATE_RECOVERY = 0.05     # rate scale regained per successful call after a 429
+BASE_BACKOFF = 2.0       # seconds, doubled for every consecutive 429 without Retry-After
+MAX_BACKOFF = 60.0
+
+ADDRESS_ENV = 'ORACLE_RATE_LIMIT_ADDRESS'
+AUTHKEY_ENV = 'ORACLE_RATE_LIMIT_AUTHKEY'
+
+
+class RateLimited(Exception):
+    '''raised for HTTP 429 responses of providers called without an SDK (e.g. OpenRouter)'''
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.status_code = 429
+        self.retry_after = retry_after
+
+
+def is_rate_limited(error):
+    return getattr(error, 'status_code', None) == 429 or getattr(error, 'code', None) == 429
+
+
+def retry_after(error):
+    '''seconds to wait according to the provider (SDK exception or raw HTTP response), None if it did not say'''
+    if getattr(error, 'retry_after', None) is not None:
+        return error.retry_after
+    headers = getattr(error, 'headers', None)
+    if headers is None:
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms') is not None:
+            return float(headers.get('retry-after-ms')) / 1000
+        if headers.get('retry-after') is not None:
+            return float(headers.get('retry-after'))
+    except ValueError:  # HTTP-date form, fall back to our own backoff
+        return None
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now, scale):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity * scale / 60)
+        self.updated = now
+
+    def wait_time(self, amount, scale):
+        '''seconds until `amount` tokens are available, amounts larger than the bucket only need a full bucket'''
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) * 60 / (self.capacity * scale)
+
+
+class ProviderLimiter:
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.rate_scale = 1.0
+        self.paused_until = 0
+        self.consecutive_limited = 0
+        self.condition = threading.Condition()
+        self.queue = []     # heap of (times served, arrival) tickets
+        self.served = {}
+        self.arrivals = itertools.count()
+        self.num_requests = 0
+        self.num_limited = 0
+        self.total_wait = 0
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def _wait_time(self, tokens, now):
+        wait = max(0, self.paused_until - now)
+        for bucket in self._buckets():
+            bucket.refill(now, self.rate_scale)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, self.rate_scale))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, self.rate_scale))
+        return wait
+
+    def acquire(self, session_id, tokens):
+        start = time.monotonic()
+        with self.condition:
+            ticket = (self.served.get(session_id, 0), next(self.arrivals))
+            heapq.heappush(self.queue, ticket)
+            while True:
+                if self.queue[0] == ticket:
+                    wait = self._wait_time(tokens, time.monotonic())
+                    if wait <= 0:
+                        break
+                    self.condition.wait(wait)
+                else:
+                    self.condition.wait()
+            heapq.heappop(self.queue)
+            if self.requests is not None:
+                self.requests.tokens -= 1
+            if self.tokens is not None:
+                self.tokens.tokens -= tokens
+            self.served[session_id] = self.served.get(session_id, 0) + 1
+            self.num_requests += 1
+            self.total_wait += time.monotonic() - start
+            self.condition.notify_all()
+        return time.monotonic() - start
+
+    def record(self, estimated_tokens, used_tokens):
+        '''settle the estimate taken in acquire() against the usage the provider reported'''
+        with self.condition:
+            if self.tokens is not None and used_tokens is not None:
+                self.tokens.tokens -= used_tokens - estimated_tokens
+            self.consecutive_limited = 0
+            self.rate_scale = min(1.0, self.rate_scale + RATE_RECOVERY)
+
+    def on_rate_limited(self, retry_after=None):
+        with self.condition:
+            self.num_limited += 1
+            self.consecutive_limited += 1
+            self.rate_scale = max(MIN_RATE_SCALE, self.rate_scale / 2)
+            if retry_after is None:
+                retry_after = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (self.consecutive_limited - 1))
+                retry_after *= random.uniform(1, 1.5)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.condition.notify_all()
+        return retry_after
+
+    def stats(self):
+        with self.condition:
+            return {'requests': self.num_requests, 'rate_limited': self.num_limited, 'rate_scale': round(self.rate_scale, 3),
+                    'waiting': len(self.queue), 'total_wait': round(self.total_wait, 2)}
+
+
+class RateLimitScheduler:
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_RATE_LIMITS)
+        self.limits.update(limits or {})
+        self.providers = {}
+        self.lock = threading.Lock()
+
+    def provider(self, model_family):
+        with self.lock:
+            if model_family not in self.providers:
+                limit = self.limits.get(model_family, {})
+                self.providers[model_family] = ProviderLimiter(limit.get('rpm'), limit.get('tpm'))
+            return self.providers[model_family]
+
+    def acquire(self, model_family, session_id, tokens):
+        '''block until the provider has quota for one request of roughly `tokens` tokens, returns the seconds waited'''
+        return self.provider(model_family).acquire(session_id, tokens)
+
+    def record(self, model_family, estimated_tokens, used_tokens):
+        self.provider(model_family).record(estimated_tokens, used_tokens)
+
+    def on_rate_limited(self, model_family, retry_after=None):
+        '''returns the pause applied to the provider'''
+        wait = self.provider(model_family).on_rate_limited(retry_after)
+        logging.warning(f"{model_family} is rate limited, pausing it for {wait:.1f}s")
+        return wait
+
+    def stats(self):
+        with self.lock:
+            families = list(self.providers)
+        return {family: self.provider(family).stats() for family in families}
+
+
+def load_rate_limits(path):
+    '''json file of the form {"claude": {"rpm": 50, "tpm": 40000}, ...}'''
+    if path is None:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_server_scheduler = None
+_local_scheduler = None
+_local_lock = threading.Lock()
+
+
+def _init_server(limits):
+    global _server_scheduler
+    _server_scheduler = RateLimitScheduler(limits)
+
+
+def _get_server_scheduler():
+    return _server_scheduler
+
+
+class SchedulerManager(BaseManager):
+    pass
+
+
+SchedulerManager.register('get_scheduler', callable=_get_server_scheduler)
+
+
+def start_scheduler_server(limits=None):
+    '''serve one scheduler for this process and every process started from it'''
+    authkey = os.urandom(16)
+    manager = SchedulerManager(address=('127.0.0.1', 0), authkey=authkey)
+    manager.start(initializer=_init_server, initargs=(limits,))
+    host, port = manager.address
+    os.environ[ADDRESS_ENV] = f"{host}:{port}"
+    os.environ[AUTHKEY_ENV] = authkey.hex()
+    logging.info(f"Rate-limit scheduler serving on {host}:{port}")
+    return manager
+
+
+def get_scheduler():
+    '''the shared scheduler if main.py started one, otherwise a process-local scheduler'''
+    global _local_scheduler
+    with _local_lock:
+        if _local_scheduler is None:
+            address = os.getenv(ADDRESS_ENV)
+            if address:
+                host, port = address.rsplit(':', 1)
+                manager = SchedulerManager(address=(host, int(port)), authkey=bytes.fromhex(os.getenv(AUTHKEY_ENV)))
+                manager.connect()
+                _local_scheduler = manager.get_scheduler()
+            else:
+                _local_scheduler = RateLimitScheduler()
+        return _local_scheduler
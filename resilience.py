@@ -0,0 +1,193 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from fork_reset import reset_after_fork
+
+'''
+Deadlines, bounded retries and hedging for single provider calls.
+
+A stuck provider call used to hold its session (and its pool worker) until the SDK gave up after minutes, and any
+transient error (connection reset, 5xx, overloaded) ended the whole session. ReasoningLLM now wraps every call:
+
+* a per-call deadline (main.py --call_deadline, ORACLE_CALL_DEADLINE), after which the call counts as failed
+* bounded retries of transient failures with jittered exponential backoff (--call_retries, ORACLE_CALL_RETRIES)
+* optional hedging (--hedge, ORACLE_HEDGE): when no answer has arrived after the p95 latency this process has
+  observed for the model, the same request is sent again (after taking rate-limit quota for it like any other
+  request) and whichever answer comes first is used
+
+Every retry and hedge is written into the metadata of the assistant turn in the session history. Sync sessions
+cannot cancel the slower copy of a hedged call, it runs to completion in the background; async sessions cancel it.
+Sync calls run on a shared thread pool, and the deadline and hedge delay count from the moment a call starts running
+there, so time spent queued behind abandoned calls is not charged against the call.
+'''
+
+CALL_DEADLINE_ENV = 'ORACLE_CALL_DEADLINE'
+CALL_RETRIES_ENV = 'ORACLE_CALL_RETRIES'
+HEDGE_ENV = 'ORACLE_HEDGE'
+
+DEFAULT_CALL_RETRIES = 3
+BACKOFF_BASE = 2        # seconds before the first retry, doubled for every further one
+BACKOFF_CAP = 60
+MIN_HEDGE_SAMPLES = 20  # calls of a model observed before its p95 is trusted as the hedge delay
+LATENCY_WINDOW = 500    # latest calls per model the p95 is computed over
+HEDGE_WORKERS = 256     # abandoned sync calls hold their thread until the SDK gives up
+QUEUE_POLL_SECONDS = 1
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def call_deadline():
+    deadline = os.getenv(CALL_DEADLINE_ENV)
+    return float(deadline) if deadline else None
+
+
+def call_retries():
+    return int(os.getenv(CALL_RETRIES_ENV, DEFAULT_CALL_RETRIES))
+
+
+def is_transient(error):
+    '''worth retrying: a missed deadline, a timeout or connection error, or a 408/5xx answer'''
+    if isinstance(error, (DeadlineExceeded, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int) and (status == 408 or status >= 500):
+        return True
+    name = type(error).__name__
+    return any(word in name for word in ['Timeout', 'Connection', 'ServerError', 'Unavailable', 'Overloaded'])
+
+
+def backoff(failures):
+    '''seconds to wait before retry number `failures` (1, 2, ...), jittered so sessions do not retry in lockstep'''
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (failures - 1)) * random.uniform(0.5, 1.5)
+
+
+_latencies = {}     # model_name -> deque of seconds
+_lock = threading.Lock()
+
+
+def record_call_latency(model_name, seconds):
+    with _lock:
+        _latencies.setdefault(model_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(model_name):
+    '''p95 latency observed for the model when hedging is on and enough calls were seen, else None'''
+    if not os.getenv(HEDGE_ENV):
+        return None
+    with _lock:
+        values = sorted(_latencies.get(model_name, ()))
+    if len(values) < MIN_HEDGE_SAMPLES:
+        return None
+    return values[int(len(values) * 0.95)]
+
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='oracle-call')
+        return _executor
+
+
+@reset_after_fork
+def _reset_after_fork():
+    global _executor, _lock
+    _executor = None
+    _lock = threading.Lock()
+    _latencies.clear()
+
+
+def _wait_after_start(futures, started, seconds):
+    '''wait() for the first of `futures` until `seconds` after the first call began running; time queued for a pool thread does not count'''
+    while not started:
+        done, pending = wait(futures, timeout=QUEUE_POLL_SECONDS, return_when=FIRST_COMPLETED)
+        if done:
+            return done, pending
+    remaining = None if seconds is None else max(0, seconds - (time.monotonic() - started[0]))
+    return wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+
+
+def call_with_deadline(send, deadline=None, hedge_after=None, events=None, acquire=None):
+    '''send() within `deadline` seconds, hedged with a second send() after `hedge_after` seconds; acquire() takes the rate-limit quota of the hedged send'''
+    if deadline is None and hedge_after is None:
+        return send()
+    events = events if events is not None else []
+    started = []
+
+    def run():
+        started.append(time.monotonic())
+        return send()
+
+    def run_hedge():
+        if acquire is not None:
+            acquire()
+        return send()
+
+    futures = [_pool().submit(run)]
+    if hedge_after is not None and (deadline is None or hedge_after < deadline):
+        done, _ = _wait_after_start(futures, started, hedge_after)
+        if not done:
+            events.append({'event': 'hedge', 'after_seconds': round(hedge_after, 2)})
+            logging.info(f"No answer after {hedge_after:.1f}s (p95), sending a hedged request")
+            futures.append(_pool().submit(run_hedge))
+    pending, error = set(futures), None
+    while pending:
+        done, pending = _wait_after_start(pending, started, deadline)
+        if not done:
+            raise DeadlineExceeded(f"no answer within the {deadline}s call deadline")
+        for future in done:
+            if future.exception() is None:
+                if len(futures) > 1:
+                    events.append({'event': 'hedge_answered', 'by': 'hedge' if future is futures[1] else 'original'})
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _ahedge(send, acquire):
+    if acquire is not None:
+        await acquire()
+    return await send()
+
+
+async def acall_with_deadline(send, deadline=None, hedge_after=None, events=None, acquire=None):
+    '''call_with_deadline for coroutine functions `send` and `acquire`; the slower copy of a hedged call is cancelled'''
+    if deadline is None and hedge_after is None:
+        return await send()
+    events = events if events is not None else []
+    start = time.monotonic()
+    tasks = [asyncio.ensure_future(send())]
+    try:
+        if hedge_after is not None and (deadline is None or hedge_after < deadline):
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                events.append({'event': 'hedge', 'after_seconds': round(hedge_after, 2)})
+                logging.info(f"No answer after {hedge_after:.1f}s (p95), sending a hedged request")
+                tasks.append(asyncio.ensure_future(_ahedge(send, acquire)))
+        pending, error = set(tasks), None
+        while pending:
+            remaining = None if deadline is None else max(0, deadline - (time.monotonic() - start))
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"no answer within the {deadline}s call deadline")
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1:
+                        events.append({'event': 'hedge_answered', 'by': 'hedge' if task is tasks[1] else 'original'})
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
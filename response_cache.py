@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from async_engine import offload
+
+'''
+Disk-backed, content-addressed cache of deterministic LLM responses.
+
+Only requests sent with temperature=0 are cached. The key is a sha256 of the provider, the model and the
+canonicalised request (messages, system prompt, sampling parameters), plus the early-stop policy the answer was cut
+by (streaming.py), so re-running a grid after a grading fix, or iterating on a platform in generate mode, replays
+identical turns from disk instead of paying for them again.
+The cache is bounded in size and evicts the least recently used entries.
+
+It is opt-in: main.py --response_cache <file> sets ORACLE_RESPONSE_CACHE (and ORACLE_RUN_ID, under which hits
+and misses are counted), which every session process inherits.
+'''
+
+CACHE_ENV = 'ORACLE_RESPONSE_CACHE'
+CACHE_MB_ENV = 'ORACLE_RESPONSE_CACHE_MB'
+RUN_ID_ENV = 'ORACLE_RUN_ID'
+DEFAULT_CACHE_MB = 1024
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model_family TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE TABLE IF NOT EXISTS run_stats (
+    run_id TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+'''
+
+
+def canonicalize(value):
+    '''plain, key-sorted JSON-able form of a request, SDK objects (gemini Content, configs) included'''
+    if hasattr(value, 'model_dump'):
+        return canonicalize(value.model_dump(mode='json', exclude_none=True))
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def is_deterministic(request):
+    '''temperature=0, either as a request parameter or in a gemini config'''
+    request = canonicalize(request)
+    config = request.get('config') or {}
+    return request.get('temperature') == 0 or config.get('temperature') == 0
+
+
+class ResponseCache:
+    def __init__(self, path, max_mb=DEFAULT_CACHE_MB, run_id=None):
+        self.path = str(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.run_id = run_id or os.getenv(RUN_ID_ENV) or 'default'
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=60000')
+            yield conn
+        finally:
+            conn.close()
+
+    def key(self, model_family, request, stop=None):
+        '''`stop` names the early-stop policy of a cut-off answer, so it is never replayed where the full answer is needed'''
+        fields = {'model_family': model_family, 'request': canonicalize(request)}
+        if stop is not None:
+            fields['stop'] = stop
+        canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _count(self, conn, column, amount=1):
+        conn.execute(f'INSERT INTO run_stats (run_id, {column}) VALUES (?, ?) '
+                     f'ON CONFLICT (run_id) DO UPDATE SET {column} = {column} + excluded.{column}', (self.run_id, amount))
+
+    def get(self, key):
+        '''the cached value, None on a miss'''
+        with self._connect() as conn:
+            row = conn.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self._count(conn, 'misses')
+                return None
+            conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._count(conn, 'hits')
+        return json.loads(row[0])
+
+    def put(self, key, model_family, value):
+        value = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)', (key, model_family, value, len(value), now, now))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            evicted = 0
+            # least recently used first, never the entry just written
+            for old_key, size in conn.execute('SELECT key, size FROM responses WHERE key != ? ORDER BY last_used', (key,)).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM responses WHERE key = ?', (old_key,))
+                total -= size
+                evicted += 1
+            if evicted:
+                self._count(conn, 'evictions', evicted)
+            conn.execute('COMMIT')
+
+    def stats(self, run_id=None):
+        '''hits, misses, hit rate and evictions of a run, plus the current size of the cache'''
+        with self._connect() as conn:
+            row = conn.execute('SELECT hits, misses, evictions FROM run_stats WHERE run_id = ?', (run_id or self.run_id,)).fetchone()
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        hits, misses, evictions = row if row is not None else (0, 0, 0)
+        return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+                'evictions': evictions, 'entries': entries, 'size_mb': round(size / 1024 / 1024, 2)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    '''the cache configured through ORACLE_RESPONSE_CACHE, None when caching is off'''
+    global _cache
+    path = os.getenv(CACHE_ENV)
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            _cache = ResponseCache(path, float(os.getenv(CACHE_MB_ENV, DEFAULT_CACHE_MB)))
+        return _cache
+
+
+def cached_completion(model_family, request, complete, stop=None):
+    '''complete() answers `request` (cut by the early-stop policy `stop`); deterministic requests are answered from the cache when it is enabled'''
+    cache = get_response_cache()
+    if cache is None or not is_deterministic(request):
+        return complete()
+    key = cache.key(model_family, request, stop)
+    value = cache.get(key)
+    if value is not None:
+        logging.info(f"Response cache hit ({model_family}, {request.get('model')})")
+        return value
+    value = complete()
+    cache.put(key, model_family, value)
+    return value
+
+
+async def acached_completion(model_family, request, complete, stop=None):
+    '''cached_completion for a coroutine function `complete`; the disk access is kept off the event loop and off the session threads'''
+    cache = get_response_cache()
+    if cache is None or not is_deterministic(request):
+        return await complete()
+    key = cache.key(model_family, request, stop)
+    value = await offload(cache.get, key)
+    if value is not None:
+        logging.info(f"Response cache hit ({model_family}, {request.get('model')})")
+        return value
+    value = await complete()
+    await offload(cache.put, key, model_family, value)
+    return value
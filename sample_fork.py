@@ -0,0 +1,37 @@
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Concurrent test samples of the game task.
+
+evaluate plays every game sample from the same point of the conversation, the messages as they were before the opening
+exploration message: max_turns exploration games, then failure_num+1 scored games. The samples never see each other, yet they
+used to be played one after another, each a long chain of sequential requests. With main.py --game_sample_workers N
+(ORACLE_GAME_SAMPLE_WORKERS) the session is forked per sample (ReasoningLLM.fork) and up to N samples are played at
+once in threads. A fork has its own messages, history and per-call state, its own provider adapter (which caches the
+wire messages of the last request and must not be used by two threads) and plays against a fresh copy of the platform
+module, because black-boxes keep state at module level (e.g. `blackbox.mode`). Only the client, the key pool endpoint
+and the rate-limit session are shared. Scores come back in sample order and the histories of the forks are
+appended to the session in that order, so the saved history reads as if the samples had been played one by one.
+
+Inside the async engine the threads run in a copy of the session's context, so their requests are still awaited on
+the engine's event loop.
+'''
+
+GAME_SAMPLE_WORKERS_ENV = 'ORACLE_GAME_SAMPLE_WORKERS'
+
+
+def game_sample_workers():
+    return max(1, int(os.getenv(GAME_SAMPLE_WORKERS_ENV) or 1))
+
+
+def map_samples(play, items, workers):
+    '''play(item) for every item, up to `workers` at a time; the results are in the order of items'''
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [play(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix='oracle-sample') as executor:
+        # one context per thread: a context cannot be entered by two threads at once
+        futures = [executor.submit(contextvars.copy_context().run, play, item) for item in items]
+        return [future.result() for future in futures]
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import logging
+import subprocess
+
+'''
+Isolated executor for the `solution` code models write for the physics simulation tasks (double_pendulum,
+harmonic_friction, ball_air_resistance).
+
+evaluate used to exec the model's code in its own process and call solution(t) for every sample time, often twice,
+so an infinite loop or a huge allocation hung or killed the whole worker. run_solution starts a child interpreter
+instead, with limits on CPU time and address space (resource.setrlimit, where the platform has it) and a
+wall-clock timeout. The child execs the code once, calls solution(t) for all requested times in one batch and sends
+back the coordinates, per call the seconds it took and the error it raised, if any. Anything the code prints is
+discarded.
+
+The limits come from main.py --solution_timeout and --solution_memory_mb (ORACLE_SOLUTION_TIMEOUT,
+ORACLE_SOLUTION_MEMORY_MB); the CPU limit equals the timeout.
+'''
+
+SOLUTION_TIMEOUT_ENV = 'ORACLE_SOLUTION_TIMEOUT'
+SOLUTION_MEMORY_ENV = 'ORACLE_SOLUTION_MEMORY_MB'
+DEFAULT_TIMEOUT = 60        # seconds, wall clock and CPU
+DEFAULT_MEMORY_MB = 2048
+RESULT_MARKER = '@@SOLUTION_RESULT@@'
+# one BLAS thread: every thread of a threaded BLAS reserves its own buffers, which counts against the address space limit
+CHILD_ENV = {'OPENBLAS_NUM_THREADS': '1', 'OMP_NUM_THREADS': '1', 'MKL_NUM_THREADS': '1'}
+
+
+def solution_timeout():
+    return float(os.getenv(SOLUTION_TIMEOUT_ENV) or DEFAULT_TIMEOUT)
+
+
+def solution_memory_mb():
+    return int(os.getenv(SOLUTION_MEMORY_ENV) or DEFAULT_MEMORY_MB)
+
+
+class SolutionError(Exception):
+    pass
+
+
+class SolutionRun:
+    def __init__(self, error=None, calls=None):
+        self.error = error          # the code could not be run at all (syntax error, no solution, a limit was hit)
+        self.calls = calls or []    # per time: {'value': ..., 'error': str or None, 'seconds': float}
+
+    def value(self, i):
+        return self.calls[i]['value']
+
+    def call_error(self, i):
+        return self.calls[i]['error']
+
+    def seconds(self):
+        return [call['seconds'] for call in self.calls]
+
+
+def plain(value):
+    '''JSON-able copy of a value (what solution returned, a stored answer); numpy scalars and arrays become python numbers and lists'''
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {str(key): plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    return value
+
+
+def run_solution(code, times, timeout=None, memory_mb=None):
+    '''exec `code` in a sandboxed child process and call its solution(t) for every t in `times`'''
+    timeout = timeout or solution_timeout()
+    memory_mb = memory_mb or solution_memory_mb()
+    payload = json.dumps({'code': code, 'times': list(times), 'cpu_seconds': int(timeout) + 1, 'memory_mb': memory_mb})
+    try:
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], input=payload, capture_output=True,
+                                text=True, encoding='utf-8', timeout=timeout, env=dict(os.environ, **CHILD_ENV))
+    except subprocess.TimeoutExpired:
+        return SolutionRun(error=f"the code did not finish within {timeout:.0f} seconds")
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            reply = json.loads(line[len(RESULT_MARKER):])
+            return SolutionRun(reply['error'], reply['calls'])
+    if result.returncode < 0:
+        return SolutionRun(error=f"the code was stopped after exceeding the CPU time ({timeout:.0f}s) or memory ({memory_mb} MB) limit")
+    stderr = result.stderr.strip().splitlines()
+    return SolutionRun(error=stderr[-1] if stderr else f"the code exited with status {result.returncode}")
+
+
+def _limit_resources(cpu_seconds, memory_mb):
+    try:
+        import resource
+    except ImportError:     # not on this platform, only the wall-clock timeout applies
+        return
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    memory = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    except (ValueError, OSError):
+        logging.warning("Could not limit the address space of the solution sandbox")
+
+
+def _child():
+    '''child side of run_solution: payload on stdin, one marked JSON line on stdout'''
+    import io
+    payload = json.loads(sys.stdin.read())
+    _limit_resources(payload['cpu_seconds'], payload['memory_mb'])
+    out, sys.stdout = sys.stdout, io.StringIO()     # prints of the model's code are not part of the result
+    reply = {'error': None, 'calls': []}
+    try:
+        scope = {}
+        exec(payload['code'], scope, scope)
+        solution = scope.get('solution')
+        if not callable(solution):
+            raise NameError("name 'solution' is not defined")
+    except BaseException as e:
+        reply['error'] = str(e) or type(e).__name__
+        solution = None
+    if solution is not None:
+        for t in payload['times']:
+            start = time.perf_counter()
+            try:
+                value, error = plain(solution(t)), None
+                json.dumps(value)
+            except BaseException as e:
+                value, error = None, str(e) or type(e).__name__
+            reply['calls'].append({'value': value, 'error': error, 'seconds': time.perf_counter() - start})
+    out.write(RESULT_MARKER + json.dumps(reply) + '\n')
+    out.flush()
+
+
+if __name__ == "__main__" and sys.argv[1:] == ['--child']:
+    _child()
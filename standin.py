@@ -0,0 +1,424 @@
+'''
+Local stand-in for the LLM providers, so whole main.py grids run offline (CI, profiling the harness).
+
+It speaks the wire formats the evaluation uses: OpenAI chat completions and responses (gpt, qwen, deepseek),
+Anthropic messages (claude), Gemini generateContent and OpenRouter chat completions (llama). Answers come from
+cassettes recorded with main.py --record_cassettes (see cassettes.py), and conversations that were never recorded
+are answered by a scripted policy: a fixed reply, or a function `policy(model, texts)` in a python file that returns
+the response text or (response text, thinking texts). Every answer is delayed by --latency_ms (+- --jitter_ms).
+Requests asking for a stream get the answer as word-sized server-sent events.
+
+    python standin.py --cassettes cassettes/ --port 8765 --latency_ms 300
+    python main.py --provider_base_url http://127.0.0.1:8765 ...
+
+The batch APIs main.py --batch uses (see batch.py) are served too: OpenAI files + batches, Anthropic message
+batches and Gemini batchGenerateContent with inline requests. A batch is answered request by request in the
+background, so clients see it in progress before it ends.
+
+GET /stats returns the number of replayed, scripted and unanswerable requests.
+'''
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import logging
+import threading
+import importlib.util
+from itertools import count
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cassettes import load_cassettes, cassette_key, conversation_texts
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def fixed_policy(reply):
+    def policy(model, texts):
+        return reply
+    return policy
+
+
+def load_policy(spec):
+    '''"path/to/file.py:function" -> the function'''
+    path, name = spec.rsplit(':', 1)
+    module_spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+class StandIn:
+    '''answers a conversation from the cassettes, or from the policy when it was never recorded'''
+    def __init__(self, cassettes=None, policy=None, latency_ms=0, jitter_ms=0):
+        self.cassettes = cassettes or {}
+        self.policy = policy
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stats = {'replayed': 0, 'scripted': 0, 'unanswered': 0}
+        self._replays = {}      # key -> counter, repeated conversations cycle through their recordings
+        self.cached_contents = {}   # gemini cachedContents/<id> -> {'contents': [...], 'systemInstruction': ...}
+        self.files = {}     # openai file id -> bytes (batch input and output files)
+        self.batches = {}   # batch id -> the batch object as its API returns it
+        self._lock = threading.Lock()
+
+    def run_batch(self, batch, requests, render, finish):
+        '''answer `requests` [(custom_id, model, body)] in the background; finish(batch, [(custom_id, rendered answer or None)]) ends the batch'''
+        def work():
+            results = []
+            for custom_id, model, body in requests:
+                answer = self.answer(model, body)
+                results.append((custom_id, render(model, body, *answer) if answer is not None else None))
+            with self._lock:
+                finish(batch, results)
+        self.batches[batch.get('id') or batch['name']] = batch
+        threading.Thread(target=work, daemon=True).start()
+        return batch
+
+    def answer(self, model, request):
+        '''(response text, thinking texts) for a request body, None if neither a cassette nor the policy answers it'''
+        key = cassette_key(model, request)
+        with self._lock:
+            recordings = self.cassettes.get(key)
+            if recordings:
+                entry = recordings[next(self._replays.setdefault(key, count())) % len(recordings)]
+                self.stats['replayed'] += 1
+                answer = entry['response'], entry['thoughts']
+            elif self.policy is not None:
+                self.stats['scripted'] += 1
+                answer = None
+            else:
+                self.stats['unanswered'] += 1
+                return None
+        if answer is None:
+            answer = self.policy(model, conversation_texts(request))
+            if isinstance(answer, str):
+                answer = answer, []
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        return answer
+
+
+def _usage(request, text):
+    prompt = sum(len(t) for t in conversation_texts(request)) // 4
+    return prompt, len(text or '') // 4
+
+
+def chat_completion(model, request, text, thoughts):
+    prompt, completion = _usage(request, text)
+    message = {'role': 'assistant', 'content': text}
+    if thoughts:
+        message['reasoning_content'] = ''.join(thoughts)
+    return {'id': f'chatcmpl-{uuid.uuid4().hex}', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': message, 'finish_reason': 'stop', 'logprobs': None}],
+            'usage': {'prompt_tokens': prompt, 'completion_tokens': completion, 'total_tokens': prompt + completion}}
+
+
+def _pieces(text):
+    '''the text split into word-sized deltas, so streaming clients see more than one chunk'''
+    return [piece for piece in re.findall(r'\S*\s*', text or '') if piece] or ['']
+
+
+def _sse(events, named=False):
+    if named:   # anthropic names every event
+        return ''.join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events)
+    return ''.join(f'data: {json.dumps(event)}\n\n' for event in events)
+
+
+def chat_completion_chunks(model, request, text, thoughts):
+    '''server-sent events of a streamed chat completion: the thinking first, then the answer'''
+    chunk_id = f'chatcmpl-{uuid.uuid4().hex}'
+    deltas = [{'role': 'assistant', 'reasoning_content': thought} for thought in thoughts] + [{'role': 'assistant', 'content': piece} for piece in _pieces(text)]
+    events = []
+    for i, delta in enumerate(deltas):
+        events.append({'id': chunk_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                       'choices': [{'index': 0, 'delta': delta, 'finish_reason': 'stop' if i == len(deltas) - 1 else None}]})
+    if (request.get('stream_options') or {}).get('include_usage'):
+        prompt, completion = _usage(request, text)
+        events.append({'id': chunk_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [],
+                       'usage': {'prompt_tokens': prompt, 'completion_tokens': completion, 'total_tokens': prompt + completion}})
+    return _sse(events) + 'data: [DONE]\n\n'
+
+
+def openai_response_events(model, request, text, thoughts):
+    response = openai_response(model, request, text, thoughts)
+    events = [{'type': 'response.created', 'sequence_number': 0, 'response': dict(response, status='in_progress', output=[])}]
+    for piece in _pieces(text):
+        events.append({'type': 'response.output_text.delta', 'sequence_number': len(events), 'item_id': response['output'][0]['id'],
+                       'output_index': 0, 'content_index': 0, 'delta': piece})
+    events.append({'type': 'response.completed', 'sequence_number': len(events), 'response': response})
+    return _sse(events)
+
+
+def anthropic_message_events(model, request, text, thoughts):
+    message = anthropic_message(model, request, text, thoughts)
+    events = [{'type': 'message_start', 'message': dict(message, content=[], stop_reason=None, usage=dict(message['usage'], output_tokens=0))}]
+    for index, block in enumerate(message['content']):
+        if block['type'] == 'thinking':
+            events.append({'type': 'content_block_start', 'index': index, 'content_block': {'type': 'thinking', 'thinking': '', 'signature': ''}})
+            events.append({'type': 'content_block_delta', 'index': index, 'delta': {'type': 'thinking_delta', 'thinking': block['thinking']}})
+        else:
+            events.append({'type': 'content_block_start', 'index': index, 'content_block': {'type': 'text', 'text': ''}})
+            events += [{'type': 'content_block_delta', 'index': index, 'delta': {'type': 'text_delta', 'text': piece}} for piece in _pieces(text)]
+        events.append({'type': 'content_block_stop', 'index': index})
+    events.append({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None}, 'usage': {'output_tokens': message['usage']['output_tokens']}})
+    events.append({'type': 'message_stop'})
+    return _sse(events, named=True)
+
+
+def gemini_response_chunks(model, request, text, thoughts):
+    response = gemini_response(model, request, text, thoughts)
+    chunks = [{'candidates': [{'content': {'role': 'model', 'parts': [{'text': thought, 'thought': True}]}, 'index': 0}]} for thought in thoughts]
+    chunks += [{'candidates': [{'content': {'role': 'model', 'parts': [{'text': piece}]}, 'index': 0}]} for piece in _pieces(text)]
+    chunks[-1] = dict(chunks[-1], usageMetadata=response['usageMetadata'])
+    chunks[-1]['candidates'][0]['finishReason'] = 'STOP'
+    return _sse(chunks)
+
+
+def openai_response(model, request, text, thoughts):
+    prompt, completion = _usage(request, text)
+    return {'id': f'resp_{uuid.uuid4().hex}', 'object': 'response', 'created_at': int(time.time()), 'model': model, 'status': 'completed',
+            'output': [{'type': 'message', 'id': f'msg_{uuid.uuid4().hex}', 'role': 'assistant', 'status': 'completed',
+                        'content': [{'type': 'output_text', 'text': text, 'annotations': []}]}],
+            'usage': {'input_tokens': prompt, 'output_tokens': completion, 'total_tokens': prompt + completion}}
+
+
+def anthropic_message(model, request, text, thoughts):
+    prompt, completion = _usage(request, text)
+    content = [{'type': 'thinking', 'thinking': thought, 'signature': ''} for thought in thoughts] + [{'type': 'text', 'text': text}]
+    return {'id': f'msg_{uuid.uuid4().hex}', 'type': 'message', 'role': 'assistant', 'model': model, 'content': content,
+            'stop_reason': 'end_turn', 'stop_sequence': None, 'usage': {'input_tokens': prompt, 'output_tokens': completion}}
+
+
+def gemini_response(model, request, text, thoughts):
+    prompt, completion = _usage(request, text)
+    parts = [{'text': thought, 'thought': True} for thought in thoughts] + [{'text': text}]
+    return {'candidates': [{'content': {'role': 'model', 'parts': parts}, 'finishReason': 'STOP', 'index': 0}],
+            'usageMetadata': {'promptTokenCount': prompt, 'candidatesTokenCount': completion, 'totalTokenCount': prompt + completion},
+            'modelVersion': model}
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def multipart_file(body, content_type):
+    '''the content of the "file" field of a multipart/form-data body (openai files.create)'''
+    boundary = content_type.split('boundary=')[-1].strip('"').encode('utf-8')
+    for part in body.split(b'--' + boundary):
+        head, _, content = part.partition(b'\r\n\r\n')
+        if b'name="file"' in head:
+            return content[:-2] if content.endswith(b'\r\n') else content
+    return b''
+
+
+def openai_batch(standin, request):
+    '''POST /v1/batches: every line of the input file is one chat completions request'''
+    lines = [json.loads(line) for line in standin.files[request['input_file_id']].decode('utf-8').splitlines() if line.strip()]
+    batch = {'id': f'batch_{uuid.uuid4().hex}', 'object': 'batch', 'endpoint': request.get('endpoint'), 'errors': None,
+             'input_file_id': request['input_file_id'], 'completion_window': request.get('completion_window', '24h'),
+             'status': 'in_progress', 'output_file_id': None, 'error_file_id': None, 'created_at': int(time.time()),
+             'in_progress_at': int(time.time()), 'completed_at': None, 'request_counts': {'total': len(lines), 'completed': 0, 'failed': 0}}
+
+    def finish(batch, results):
+        output = []
+        for custom_id, body in results:
+            if body is not None:
+                output.append({'id': f'batch_req_{uuid.uuid4().hex}', 'custom_id': custom_id, 'error': None,
+                               'response': {'status_code': 200, 'request_id': uuid.uuid4().hex, 'body': body}})
+            else:
+                output.append({'id': f'batch_req_{uuid.uuid4().hex}', 'custom_id': custom_id, 'error': None,
+                               'response': {'status_code': 404, 'request_id': uuid.uuid4().hex, 'body': {'error': {'message': 'no recorded response for this conversation'}}}})
+        file_id = f'file-{uuid.uuid4().hex}'
+        standin.files[file_id] = ''.join(json.dumps(line) + '\n' for line in output).encode('utf-8')
+        failed = sum(body is None for _, body in results)
+        batch.update(status='completed', output_file_id=file_id, completed_at=int(time.time()),
+                     request_counts={'total': len(results), 'completed': len(results) - failed, 'failed': failed})
+
+    return standin.run_batch(batch, [(line['custom_id'], line['body'].get('model'), line['body']) for line in lines], chat_completion, finish)
+
+
+def anthropic_batch(standin, request):
+    '''POST /v1/messages/batches'''
+    requests = request.get('requests') or []
+    batch = {'id': f'msgbatch_{uuid.uuid4().hex}', 'type': 'message_batch', 'processing_status': 'in_progress', 'results_url': None,
+             'request_counts': {'processing': len(requests), 'succeeded': 0, 'errored': 0, 'canceled': 0, 'expired': 0},
+             'created_at': _now(), 'expires_at': _now(), 'ended_at': None, 'archived_at': None, 'cancel_initiated_at': None}
+
+    def finish(batch, results):
+        batch['results'] = []
+        for custom_id, message in results:
+            if message is not None:
+                batch['results'].append({'custom_id': custom_id, 'result': {'type': 'succeeded', 'message': message}})
+            else:
+                batch['results'].append({'custom_id': custom_id, 'result': {'type': 'errored', 'error': {'type': 'error', 'error': {
+                    'type': 'not_found_error', 'message': 'no recorded response for this conversation'}}}})
+        errored = sum(message is None for _, message in results)
+        batch.update(processing_status='ended', ended_at=_now(),
+                     request_counts={'processing': 0, 'succeeded': len(results) - errored, 'errored': errored, 'canceled': 0, 'expired': 0})
+
+    return standin.run_batch(batch, [(entry['custom_id'], entry['params'].get('model'), entry['params']) for entry in requests], anthropic_message, finish)
+
+
+def gemini_batch(standin, model, request):
+    '''POST /v1beta/models/<model>:batchGenerateContent with inline requests; answered in order, as the gemini client expects'''
+    batch_config = request.get('batch') or {}
+    inlined = ((batch_config.get('inputConfig') or {}).get('requests') or {}).get('requests') or []
+    name = f'batches/{uuid.uuid4().hex}'
+    batch = {'name': name, 'metadata': {'@type': 'type.googleapis.com/google.ai.generativelanguage.v1beta.GenerateContentBatch', 'name': name,
+                                        'model': f'models/{model}', 'displayName': batch_config.get('displayName'),
+                                        'state': 'BATCH_STATE_RUNNING', 'createTime': _now(), 'updateTime': _now()}}
+
+    def finish(batch, results):
+        responses = {'inlinedResponses': [{'response': response} if response is not None else
+                                          {'error': {'code': 404, 'message': 'no recorded response for this conversation'}} for _, response in results]}
+        batch['metadata'].update(state='BATCH_STATE_SUCCEEDED', endTime=_now(), updateTime=_now(), output={'inlinedResponses': responses})
+        batch.update(done=True, response={'@type': 'type.googleapis.com/google.ai.generativelanguage.v1beta.GenerateContentBatchOutput', 'inlinedResponses': responses})
+
+    requests = [(str(i), model, entry.get('request', entry)) for i, entry in enumerate(inlined)]
+    return standin.run_batch(batch, requests, gemini_response, finish)
+
+
+STREAMED = {chat_completion: chat_completion_chunks, openai_response: openai_response_events,
+            anthropic_message: anthropic_message_events, gemini_response: gemini_response_chunks}
+
+
+def make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'    # keep-alive, like the real endpoints
+
+        def _send(self, status, body, content_type='application/json'):
+            body = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split('?')[0].rstrip('/')
+            if path == '/stats':
+                self._send(200, standin.stats)
+            elif path.startswith('/v1/files/') and path.endswith('/content'):
+                self._send(200, standin.files.get(path.split('/')[-2], b'').decode('utf-8'), 'application/octet-stream')
+            elif path.startswith('/v1/messages/batches/') and path.endswith('/results'):
+                batch = standin.batches.get(path.split('/')[-2]) or {}
+                self._send(200, ''.join(json.dumps(line) + '\n' for line in batch.get('results', [])), 'application/binary')
+            elif path.rsplit('/', 1)[-1] in standin.batches or 'batches/' + path.rsplit('/', 1)[-1] in standin.batches:
+                batch_id = path.rsplit('/', 1)[-1]
+                with standin._lock:
+                    batch = dict(standin.batches.get(batch_id) or standin.batches['batches/' + batch_id])
+                batch.pop('results', None)
+                if batch.get('type') == 'message_batch' and batch['processing_status'] == 'ended':
+                    batch['results_url'] = f"http://{self.headers.get('Host')}/v1/messages/batches/{batch_id}/results"
+                self._send(200, batch)
+            else:
+                self._send(404, {'error': {'message': f'unknown path {self.path}'}})
+
+        def do_DELETE(self):
+            standin.cached_contents.pop('cachedContents/' + self.path.split('?')[0].rsplit('/', 1)[-1], None)
+            self._send(200, {})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            path = self.path.split('?')[0]
+            if path.endswith('/files'):
+                file_id = f'file-{uuid.uuid4().hex}'
+                standin.files[file_id] = multipart_file(body, self.headers.get('Content-Type', ''))
+                self._send(200, {'id': file_id, 'object': 'file', 'bytes': len(standin.files[file_id]), 'created_at': int(time.time()),
+                                 'filename': 'batch.jsonl', 'purpose': 'batch', 'status': 'processed'})
+                return
+            request = json.loads(body or b'{}')
+            if path.endswith('/batches') and path.startswith('/v1/messages'):
+                self._send(200, anthropic_batch(standin, request))
+                return
+            if path.endswith('/batches'):
+                self._send(200, openai_batch(standin, request))
+                return
+            if ':batchGenerateContent' in path:
+                self._send(200, gemini_batch(standin, path.rsplit('/', 1)[-1].split(':')[0], request))
+                return
+            stream = bool(request.get('stream'))
+            if path.endswith('/cachedContents'):
+                # gemini explicit prompt caching (prompt_cache.py): keep the prefix, requests then refer to it by name
+                name = f'cachedContents/{uuid.uuid4().hex}'
+                standin.cached_contents[name] = {'contents': request.get('contents') or [], 'systemInstruction': request.get('systemInstruction')}
+                self._send(200, {'name': name, 'model': request.get('model')})
+                return
+            if request.get('cachedContent') in standin.cached_contents:
+                cached = standin.cached_contents[request['cachedContent']]
+                request = dict(request, contents=cached['contents'] + (request.get('contents') or []), systemInstruction=cached['systemInstruction'])
+            if ':generateContent' in path or ':streamGenerateContent' in path:
+                # /v1beta/models/<model>:generateContent, streamed as server-sent events with :streamGenerateContent?alt=sse
+                model, render = path.rsplit('/', 1)[-1].split(':')[0], gemini_response
+                stream = ':streamGenerateContent' in path
+            elif path.endswith('/chat/completions'):
+                model, render = request.get('model'), chat_completion
+            elif path.endswith('/responses'):
+                model, render = request.get('model'), openai_response
+            elif path.endswith('/messages'):
+                model, render = request.get('model'), anthropic_message
+            else:
+                self._send(404, {'error': {'message': f'unknown path {path}'}})
+                return
+            answer = standin.answer(model, request)
+            if answer is None:
+                logging.warning(f"No cassette for a {model} conversation ({path}) and no policy")
+                self._send(404, {'error': {'type': 'not_found', 'message': 'no recorded response for this conversation'}})
+                return
+            text, thoughts = answer
+            if stream:
+                self._send(200, STREAMED[render](model, request, text, thoughts), 'text/event-stream')
+            else:
+                self._send(200, render(model, request, text, thoughts))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_standin(standin, host='127.0.0.1', port=0):
+    '''serve `standin` from a background thread, returns (server, base url)'''
+    server = ThreadingHTTPServer((host, port), make_handler(standin))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI/Anthropic/Gemini/OpenRouter stand-in serving recorded or scripted responses')
+    parser.add_argument('--cassettes', type=str, default=None, help='cassette file or folder written by main.py --record_cassettes')
+    parser.add_argument('--policy', type=str, default=None, help='path/to/file.py:function answering conversations without a cassette')
+    parser.add_argument('--reply', type=str, default=None, help='fixed reply to conversations without a cassette (when no --policy is given)')
+    parser.add_argument('--latency_ms', type=float, default=0)
+    parser.add_argument('--jitter_ms', type=float, default=0)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    cassettes = load_cassettes(args.cassettes) if args.cassettes else {}
+    if args.policy:
+        policy = load_policy(args.policy)
+    elif args.reply is not None:
+        policy = fixed_policy(args.reply)
+    else:
+        policy = None
+    if not cassettes and policy is None:
+        sys.exit('Nothing to serve: pass --cassettes, --policy or --reply')
+    standin = StandIn(cassettes, policy, args.latency_ms, args.jitter_ms)
+
+    server, url = start_standin(standin, args.host, args.port)
+    logging.info(f"Stand-in serving {len(cassettes)} recorded conversations at {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        logging.info(f"Stand-in stats: {standin.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import time
+from clients import openrouter_url, REQUEST_TIMEOUT
+from rate_limiter import retry_after, RateLimited
+
+'''
+Streaming completions for every model family.
+
+With ORACLE_STREAM set (main.py --stream), ReasoningLLM asks every provider for a streamed completion and
+collects it with a StreamCollector, which records the time to the first token and the output tokens per second
+of each turn. With ORACLE_EARLY_STOP set as well (main.py --early_stop), tasks listed in EARLY_STOP_PREDICATES
+close the stream as soon as the predicate sees a complete answer, e.g. the first line for encryption, where the
+platforms only use player_output.strip().split('\n')[0]. Early stop is never applied while a session is being
+evaluated, so scoring always sees the full answer.
+
+The provider-specific parts are the event generators below: they turn a provider stream into ('text', str),
+('thought', str), ('usage', total tokens) and ('input_usage', the provider's usage report) events.
+'''
+
+STREAM_ENV = 'ORACLE_STREAM'
+EARLY_STOP_ENV = 'ORACLE_EARLY_STOP'
+
+
+def streaming_enabled():
+    return bool(os.getenv(STREAM_ENV))
+
+
+def early_stop_enabled():
+    return bool(os.getenv(EARLY_STOP_ENV))
+
+
+def first_line_complete(text):
+    '''a non-empty first line has been terminated'''
+    stripped = text.lstrip()
+    return '\n' in stripped and stripped.split('\n')[0].strip() != ''
+
+
+def bit_list_complete(text):
+    '''a bracketed list of 0/1 bits, the input the circuit platforms look for, has been closed'''
+    return re.search(r'\[\s*[01](\s*,?\s*[01])*\s*\]', text) is not None
+
+
+EARLY_STOP_PREDICATES = {
+    'encryption': first_line_complete,
+    'circuit': bit_list_complete,
+}
+
+
+class StreamCollector:
+    '''accumulates a streamed completion and its timing; add() returns True once the stop predicate is met'''
+    def __init__(self, stop=None):
+        self.stop = stop
+        self.text = ''
+        self.thought = ''
+        self.total_tokens = None
+        self.input_usage = None     # usage report with the cached/uncached input tokens, see prompt_cache.split_input_tokens
+        self.stopped_early = False
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.end = None
+
+    def add(self, kind, value):
+        if kind == 'usage':
+            self.total_tokens = value
+            return False
+        if kind == 'input_usage':
+            self.input_usage = value
+            return False
+        if not value:
+            return False
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        if kind == 'thought':
+            self.thought += value
+            return False
+        self.text += value
+        if self.stop is not None and self.stop(self.text):
+            self.stopped_early = True
+            return True
+        return False
+
+    def finish(self):
+        self.end = time.perf_counter()
+        return self
+
+    def result(self, empty_response=None):
+        '''(response text, thinking texts) in the shape ReasoningLLM._parse_response returns'''
+        text = self.text if self.text or empty_response is None else empty_response
+        return text, [self.thought] if self.thought else []
+
+    def metrics(self):
+        '''time to first token, output tokens per second (estimated from the text at ~4 characters per token)'''
+        end = self.end or time.perf_counter()
+        output_tokens = (len(self.text) + len(self.thought)) // 4
+        ttft = self.first_token - self.start if self.first_token is not None else None
+        generation = end - self.first_token if self.first_token is not None else 0
+        return {'ttft': ttft, 'seconds': end - self.start, 'output_tokens': output_tokens,
+                'tokens_per_sec': output_tokens / generation if generation > 0 else None, 'early_stop': self.stopped_early}
+
+
+def _chat_delta_events(chunk):
+    events = []
+    if getattr(chunk, 'usage', None) is not None:
+        events += [('usage', chunk.usage.total_tokens), ('input_usage', chunk.usage)]
+    if chunk.choices:
+        delta = chunk.choices[0].delta
+        events.append(('thought', getattr(delta, 'reasoning_content', None)))
+        events.append(('text', delta.content))
+    return events
+
+
+def _response_event(event):
+    if event.type == 'response.output_text.delta':
+        return [('text', event.delta)]
+    if event.type == 'response.completed' and event.response.usage is not None:
+        return [('usage', event.response.usage.total_tokens), ('input_usage', event.response.usage)]
+    return []
+
+
+def _anthropic_event(event, usage):
+    if event.type == 'message_start':
+        usage['input'] = event.message.usage.input_tokens
+        return [('input_usage', event.message.usage)]
+    elif event.type == 'message_delta' and event.usage is not None:
+        return [('usage', usage.get('input', 0) + event.usage.output_tokens)]
+    elif event.type == 'content_block_delta':
+        if event.delta.type == 'text_delta':
+            return [('text', event.delta.text)]
+        if event.delta.type == 'thinking_delta':
+            return [('thought', event.delta.thinking)]
+    return []
+
+
+def _gemini_events(chunk):
+    events = []
+    if chunk.usage_metadata is not None and chunk.usage_metadata.total_token_count is not None:
+        events += [('usage', chunk.usage_metadata.total_token_count), ('input_usage', chunk.usage_metadata)]
+    if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+        for part in chunk.candidates[0].content.parts:
+            events.append(('thought' if part.thought else 'text', part.text))
+    return events
+
+
+def _openrouter_events(line):
+    '''one server-sent event line of an OpenRouter stream'''
+    if not line or not line.startswith('data:'):
+        return []     # blank separators and ': OPENROUTER PROCESSING' keep-alive comments
+    payload = line[len('data:'):].strip()
+    if payload == '[DONE]':
+        return []
+    chunk = json.loads(payload)
+    events = []
+    if chunk.get('usage'):
+        events += [('usage', chunk['usage'].get('total_tokens')), ('input_usage', chunk['usage'])]
+    if chunk.get('choices'):
+        events.append(('text', chunk['choices'][0].get('delta', {}).get('content')))
+    return events
+
+
+def _collect(collector, events):
+    return any([collector.add(kind, value) for kind, value in events])
+
+
+def stream_completion(model_family, model_name, client, request, headers, stop=None):
+    '''stream one request with the sync client of `model_family`, returns the finished StreamCollector'''
+    collector = StreamCollector(stop)
+    if model_family == 'gemini':
+        for chunk in client.models.generate_content_stream(**request):
+            if _collect(collector, _gemini_events(chunk)):
+                break
+    elif model_family == 'llama':
+        response = client.post(openrouter_url(), data=json.dumps(dict(request, stream=True)), headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+        try:
+            if response.status_code == 429:
+                raise RateLimited(f"OpenRouter rate limited {model_name}", retry_after(response))
+            if response.status_code >= 500:
+                response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if _collect(collector, _openrouter_events(line)):
+                    break
+        finally:
+            response.close()
+    else:
+        if model_family == 'claude':
+            stream, usage = client.messages.create(**request, stream=True), {}
+            handle = lambda event: _anthropic_event(event, usage)
+        elif model_family == 'gpt' and 'gpt' not in model_name:
+            stream, handle = client.responses.create(**request, stream=True), _response_event
+        else:   # gpt chat models, qwen and deepseek share the openai chat completions stream
+            stream = client.chat.completions.create(**dict(request, stream=True, stream_options={'include_usage': True}))
+            handle = _chat_delta_events
+        try:
+            for event in stream:
+                if _collect(collector, handle(event)):
+                    break
+        finally:
+            stream.close()
+    return collector.finish()
+
+
+async def astream_completion(model_family, model_name, client, request, headers, stop=None):
+    '''stream_completion with the async client of `model_family`'''
+    collector = StreamCollector(stop)
+    if model_family == 'gemini':
+        async for chunk in await client.models.generate_content_stream(**request):
+            if _collect(collector, _gemini_events(chunk)):
+                break
+    elif model_family == 'llama':
+        async with client.stream('POST', openrouter_url(), content=json.dumps(dict(request, stream=True)), headers=headers) as response:
+            if response.status_code == 429:
+                raise RateLimited(f"OpenRouter rate limited {model_name}", retry_after(response))
+            if response.status_code >= 500:
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if _collect(collector, _openrouter_events(line)):
+                    break
+    else:
+        if model_family == 'claude':
+            stream, usage = await client.messages.create(**request, stream=True), {}
+            handle = lambda event: _anthropic_event(event, usage)
+        elif model_family == 'gpt' and 'gpt' not in model_name:
+            stream, handle = await client.responses.create(**request, stream=True), _response_event
+        else:
+            stream = await client.chat.completions.create(**dict(request, stream=True, stream_options={'include_usage': True}))
+            handle = _chat_delta_events
+        try:
+            async for event in stream:
+                if _collect(collector, handle(event)):
+                    break
+        finally:
+            await stream.close()
+    return collector.finish()
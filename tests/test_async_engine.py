@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_engine import AsyncEngine, current_engine, offload
+
+'''
+Regression test of the async engine's executors: with more sessions than --max_sessions, every session thread is
+busy waiting for its model call, so a call that offloads blocking work (the rate-limit wait, the response cache) must
+not need a session thread. It used to deadlock on the first call.
+'''
+
+TIMEOUT_SECONDS = 30
+
+
+class FakePlayer:
+    model_family = 'gpt'
+
+    async def _acall_model(self):
+        await offload(time.sleep, 0.01, pool='rate_limit')     # scheduler.acquire
+        await offload(time.sleep, 0.01)                         # response cache lookup
+        await asyncio.to_thread(time.sleep, 0.01)               # the loop's default executor is free as well
+        return 'ok', []
+
+
+def session(i):
+    player = FakePlayer()
+    answers = [current_engine().call(player)[0] for _ in range(2)]
+    return i, answers
+
+
+def run_with_timeout(engine, jobs):
+    result = {}
+    runner = threading.Thread(target=lambda: result.update(value=engine.run(session, jobs)), daemon=True)
+    runner.start()
+    runner.join(TIMEOUT_SECONDS)
+    assert not runner.is_alive(), f"the engine did not finish {len(jobs)} sessions within {TIMEOUT_SECONDS}s"
+    return result['value']
+
+
+def test_more_sessions_than_slots_each_making_calls():
+    engine = AsyncEngine(max_sessions=2)
+    jobs = [(i,) for i in range(8)]
+    assert run_with_timeout(engine, jobs) == [(i, ['ok', 'ok']) for i in range(8)]
+
+
+def test_slots_filling_every_session_thread():
+    # drain_job_queue starts max_sessions slots that each run many sessions back to back
+    engine = AsyncEngine(max_sessions=4)
+    jobs = [(i,) for i in range(4)]
+    assert run_with_timeout(engine, jobs) == [(i, ['ok', 'ok']) for i in range(4)]
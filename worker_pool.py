@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import logging
+import itertools
+import subprocess
+import traceback
+import importlib
+import importlib.util
+import threading
+import contextvars
+from io import StringIO
+from pathlib import Path
+
+'''
+Three ways of running a black-box session:
+    * subprocess: start `python <task_id>_final.py ...` for every session (the original behaviour)
+    * worker: a long-lived process imports eva_models and the provider SDKs once, then loads
+      platform modules and calls their `main(...)` entry point in a loop
+    * async: like worker, but many sessions share one process and one event loop (see async_engine.py)
+'''
+
+# modules the platform scripts pull in; importing them once per worker is the whole point of worker mode.
+# eva_models loads the provider SDKs lazily, so they are listed explicitly.
+PRELOAD_MODULES = ['eva_models', 'ckpt', 'openai', 'anthropic', 'google.genai', 'requests', 'httpx', 'numpy', 'scipy.integrate']
+
+_module_counter = itertools.count()
+
+
+def platform_args(model_family, model_name, task, eva_mode, n_runs, difficulty, task_id, failure_num, output_dir, max_turns, version, mode, thinking_mode):
+    '''positional arguments of the platform `main(...)`, typed the same way as the `__main__` block of the platform scripts'''
+    return [model_family, model_name, task, eva_mode, int(n_runs), difficulty, task_id, int(failure_num),
+            str(output_dir), int(max_turns), int(version), mode, bool(thinking_mode)]
+
+
+def run_subprocess(platform_file, args, capture_output=False):
+    command = ['python', platform_file] + [str(arg) for arg in args]
+    result = subprocess.run(
+        command,
+        capture_output=capture_output,
+        text=True,
+        encoding='utf-8'
+    )
+    return result.stdout, result.stderr, result.returncode
+
+
+def init_worker():
+    '''Pool initializer: pay the import cost of the heavy modules once per worker process.'''
+    oracle_path = os.path.dirname(os.path.abspath(__file__))
+    if oracle_path not in sys.path:
+        sys.path.insert(0, oracle_path)
+    start = time.perf_counter()
+    for module_name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError as e:
+            logging.warning(f"Worker {os.getpid()} could not preload {module_name}: {e}")
+    logging.info(f"Worker {os.getpid()} ready in {time.perf_counter() - start:.2f}s")
+
+
+def load_platform(platform_file):
+    '''
+    Execute a platform file as a brand-new module. Platforms keep state at module level
+    (e.g. `vars` in the code platforms, `blackbox.original_n`), so a module is never reused across sessions.
+    '''
+    module_name = f"{Path(platform_file).stem}_{os.getpid()}_{next(_module_counter)}"
+    spec = importlib.util.spec_from_file_location(module_name, str(platform_file))
+    if spec is None:
+        raise ImportError(f"Could not load platform {platform_file}.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# buffer the output of the session running in the current context goes to, None to print it
+_session_output = contextvars.ContextVar('oracle_session_output', default=None)
+_stdout_lock = threading.Lock()
+
+
+class SessionStdout:
+    '''
+    sys.stdout of an in-process executor. redirect_stdout would swap the stdout of the whole process, but with
+    --executor async many sessions share it, so writes go to the buffer of the session (context) that made them and
+    fall through to the real stdout otherwise. Threads started by a session in a copy of its context (sample_fork.py)
+    write to the session's buffer as well.
+    '''
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = _session_output.get()
+        return buffer.write(text) if buffer is not None else self.stream.write(text)
+
+    def flush(self):
+        if _session_output.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _install_session_stdout():
+    with _stdout_lock:
+        if not isinstance(sys.stdout, SessionStdout):
+            sys.stdout = SessionStdout(sys.stdout)
+
+
+def run_inprocess(platform_file, args, capture_output=False):
+    '''Run one session inside the current (warm) interpreter. Mirrors the (stdout, stderr, returncode) of run_subprocess.'''
+    from ckpt import reset_debugger_state
+
+    running_errors = ''
+    returncode = 0
+    if capture_output:
+        _install_session_stdout()
+    token = _session_output.set(StringIO() if capture_output else None)
+    try:
+        module = load_platform(platform_file)
+        module.main(*args)
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        running_errors = traceback.format_exc()
+        returncode = 1
+        logging.error(f"Session {platform_file} failed:\n{running_errors}")
+    finally:
+        if args[2] == 'code':
+            reset_debugger_state()
+        buffer = _session_output.get()
+        _session_output.reset(token)
+    return (buffer.getvalue() if buffer is not None else None), running_errors, returncode
+
+
+def run_platform(executor, platform_file, args, capture_output=False):
+    if executor == 'subprocess':
+        return run_subprocess(platform_file, args, capture_output)
+    elif executor in ('worker', 'async'):
+        return run_inprocess(platform_file, args, capture_output)
+    else:
+        raise ValueError(f"Unknown executor: {executor}")